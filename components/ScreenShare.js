@@ -5,16 +5,24 @@ import { Button } from "./ui/button";
 import { ScrollArea } from "./ui/scroll-area";
 import { Card, CardContent, CardHeader, CardTitle } from "./ui/card";
 import { useWebSocket } from "./WebSocketProvider";
-import { Base64 } from "js-base64";
-import { Send, Play, Square } from "lucide-react";
+import { Send, Play, Square, Monitor } from "lucide-react";
 import Carousel from "./ui/carousel";
 
+// Screen frames are captured at the rate the backend forwards them (INBOUND_IMAGE_FPS)
+// and at most at the size it keeps (SCREEN_MAX_SIZE); it drops unchanged ones.
+const SCREEN_FRAME_INTERVAL_MS = 1000;
+const SCREEN_MAX_SIZE = 1024;
+const SCREEN_JPEG_QUALITY = 0.8;
+
 const ScreenShare = () => {
   const audioContextRef = useRef(null);
   const audioStreamRef = useRef(null);
   const audioWorkletNodeRef = useRef(null);
   const chatScrollRef = useRef(null);
+  const screenStreamRef = useRef(null);
+  const screenTimerRef = useRef(null);
   const [isSharing, setIsSharing] = useState(false);
+  const [isScreenSharing, setIsScreenSharing] = useState(false);
   const [audioLevel, setAudioLevel] = useState(0);
   const [inputText, setInputText] = useState("");
   const [messages, setMessages] = useState([
@@ -27,7 +35,9 @@ const ScreenShare = () => {
   ]);
   const {
     sendMessage,
-    sendMediaChunk,
+    sendAudioChunk,
+    sendImageChunk,
+    lastImage,
     isConnected,
     playbackAudioLevel,
     lastTranscription,
@@ -203,11 +213,7 @@ const ScreenShare = () => {
         setAudioLevel(level);
 
         if (pcmData) {
-          const base64Data = Base64.fromUint8Array(new Uint8Array(pcmData));
-          sendMediaChunk({
-            mime_type: "audio/pcm",
-            data: base64Data,
-          });
+          sendAudioChunk(pcmData);
         }
       };
 
@@ -223,7 +229,60 @@ const ScreenShare = () => {
     }
   };
 
+  // Screen share: JPEG frames go out as binary FRAME_IMAGE_JPEG frames in binary mode
+  const stopScreenShare = () => {
+    if (screenTimerRef.current) {
+      clearInterval(screenTimerRef.current);
+      screenTimerRef.current = null;
+    }
+    if (screenStreamRef.current) {
+      screenStreamRef.current.getTracks().forEach((track) => track.stop());
+      screenStreamRef.current = null;
+    }
+    setIsScreenSharing(false);
+  };
+
+  const startScreenShare = async () => {
+    if (screenStreamRef.current) return;
+
+    try {
+      const stream = await navigator.mediaDevices.getDisplayMedia({ video: true });
+      screenStreamRef.current = stream;
+      stream.getVideoTracks()[0].addEventListener("ended", stopScreenShare);
+
+      const video = document.createElement("video");
+      video.muted = true;
+      video.srcObject = stream;
+      await video.play();
+
+      const canvas = document.createElement("canvas");
+      screenTimerRef.current = setInterval(() => {
+        if (!video.videoWidth) return;
+        const scale = Math.min(1, SCREEN_MAX_SIZE / Math.max(video.videoWidth, video.videoHeight));
+        canvas.width = Math.round(video.videoWidth * scale);
+        canvas.height = Math.round(video.videoHeight * scale);
+        canvas.getContext("2d").drawImage(video, 0, 0, canvas.width, canvas.height);
+        canvas.toBlob(
+          async (blob) => {
+            if (blob) {
+              sendImageChunk(await blob.arrayBuffer(), "image/jpeg");
+            }
+          },
+          "image/jpeg",
+          SCREEN_JPEG_QUALITY
+        );
+      }, SCREEN_FRAME_INTERVAL_MS);
+
+      setIsScreenSharing(true);
+    } catch (err) {
+      console.error("Error starting screen share:", err);
+      stopScreenShare();
+    }
+  };
+
   const endConversation = () => {
+    stopScreenShare();
+
     if (audioStreamRef.current) {
       audioStreamRef.current.getTracks().forEach((track) => track.stop());
       audioStreamRef.current = null;
@@ -337,6 +396,18 @@ const ScreenShare = () => {
     };
   }, []);
 
+  // Tool images delivered as binary frames (binary protocol mode)
+  useEffect(() => {
+    if (!lastImage) return;
+    const setters = {
+      wordcloud: setWordCloudImg,
+      barchart: setBarChartImg,
+      linechart: setLineChartImg,
+      piechart: setPieChartImg,
+    };
+    setters[lastImage.kind]?.(lastImage.src);
+  }, [lastImage]);
+
   return (
     <div className="h-full flex flex-col">
       {/* Chat Messages */}
@@ -494,6 +565,16 @@ const ScreenShare = () => {
               )}
             </Button>
 
+            <Button
+              onClick={isScreenSharing ? stopScreenShare : startScreenShare}
+              disabled={!isConnected}
+              variant={isScreenSharing ? "destructive" : "outline"}
+              className="flex items-center gap-2 text-xs"
+            >
+              <Monitor size={14} />
+              {isScreenSharing ? "Stop Screen" : "Share Screen"}
+            </Button>
+
             {isSharing && (
               <Button
                 onClick={fullDisconnect}
@@ -7,11 +7,39 @@ import React, {
   useCallback,
 } from "react";
 import { Base64 } from "js-base64";
+import {
+  PROTOCOL_BINARY,
+  FRAME_AUDIO_PCM,
+  FRAME_AUDIO_OPUS,
+  IMAGE_FRAME_KINDS,
+  encodeFrame,
+  decodeFrame,
+  mediaFrameType,
+} from "../lib/binary-protocol";
+import { OpusPlayer, opusPlaybackSupported } from "../lib/opus-player";
 
 const WebSocketContext = createContext(null);
 
 const RECONNECT_TIMEOUT = 5000; // 5 seconds
 const CONNECTION_TIMEOUT = 30000; // 30 seconds
+const CLIENT_ID_KEY = "live-api-client-id";
+
+// Stable id for this browser, so the backend resumes this client's Gemini session
+// (and nobody else's) when the connection drops.
+const getClientId = () => {
+  try {
+    let clientId = window.localStorage.getItem(CLIENT_ID_KEY);
+    if (!clientId) {
+      clientId = window.crypto?.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      window.localStorage.setItem(CLIENT_ID_KEY, clientId);
+    }
+    return clientId;
+  } catch (error) {
+    return null;
+  }
+};
 
 export const WebSocketProvider = ({
   children,
@@ -28,6 +56,7 @@ export const WebSocketProvider = ({
   const [lastTranscription, setLastTranscription] = useState(null);
   const [lastTextMessage, setLastTextMessage] = useState(null);
   const [lastAudioData, setLastAudioData] = useState(null);
+  const [lastImage, setLastImage] = useState(null);
   const wsRef = useRef(null);
   const reconnectTimeoutRef = useRef();
   const connectionTimeoutRef = useRef();
@@ -35,6 +64,11 @@ export const WebSocketProvider = ({
   const audioBufferQueueRef = useRef([]);
   const currentAudioSourceRef = useRef(null);
   const reconnectAttemptsRef = useRef(0);
+  // Set once the backend acknowledges the binary frame protocol
+  const binaryModeRef = useRef(false);
+  // Set once the backend agrees to send reply audio as a WebM/Opus stream
+  const opusPlayerRef = useRef(null);
+  const imageUrlsRef = useRef({});
 
   // Flag to track intentional disconnections
   const isIntentionalDisconnect = useRef(false);
@@ -55,6 +89,9 @@ export const WebSocketProvider = ({
 
     // Clear audio buffer queue
     audioBufferQueueRef.current = [];
+    if (opusPlayerRef.current) {
+      opusPlayerRef.current.skip();
+    }
 
     // Reset playback audio level
     setPlaybackAudioLevel(0);
@@ -100,6 +137,12 @@ export const WebSocketProvider = ({
     setLastTranscription(null);
     setLastTextMessage(null);
     setLastAudioData(null);
+    setLastImage(null);
+    binaryModeRef.current = false;
+    if (opusPlayerRef.current) {
+      opusPlayerRef.current.close();
+      opusPlayerRef.current = null;
+    }
 
     // Reset reconnection attempts
     reconnectAttemptsRef.current = 0;
@@ -148,6 +191,12 @@ export const WebSocketProvider = ({
     }
 
     try {
+      binaryModeRef.current = false;
+      // Every connection starts a new WebM stream
+      if (opusPlayerRef.current) {
+        opusPlayerRef.current.close();
+        opusPlayerRef.current = null;
+      }
       const ws = new WebSocket(url);
       wsRef.current = ws;
       console.log("WebSocket created:", url);
@@ -181,6 +230,9 @@ export const WebSocketProvider = ({
           setup: setup,
           use_case_id: localUseCaseId,
           tools: tools,
+          protocol: PROTOCOL_BINARY,
+          audio_format: opusPlaybackSupported() ? "opus" : "pcm",
+          client_id: getClientId(),
         });
 
         if (startAutomatically) {
@@ -209,9 +261,30 @@ export const WebSocketProvider = ({
 
       ws.onmessage = async (event) => {
         try {
+          if (event.data instanceof ArrayBuffer) {
+            handleBinaryFrame(event.data);
+            return;
+          }
+
           const data = JSON.parse(event.data);
           console.log("Received message:", data);
 
+          if (data.protocol === PROTOCOL_BINARY) {
+            binaryModeRef.current = true;
+          }
+
+          if (data.audio_format === "opus" && !opusPlayerRef.current) {
+            opusPlayerRef.current = new OpusPlayer(data.mime_type);
+          }
+
+          if (data.audio_opus && opusPlayerRef.current) {
+            opusPlayerRef.current.append(Base64.toUint8Array(data.audio_opus));
+          }
+
+          if (data.interrupted && opusPlayerRef.current) {
+            opusPlayerRef.current.skip();
+          }
+
           if (data.text) {
             setLastTextMessage(data.text);
           }
@@ -278,6 +351,32 @@ export const WebSocketProvider = ({
     }
   };
 
+  // Binary frames carry raw 24kHz PCM or WebM/Opus audio, or PNG tool images (see lib/binary-protocol.js)
+  const handleBinaryFrame = (buffer) => {
+    const { type, payload } = decodeFrame(buffer);
+    if (type === FRAME_AUDIO_PCM) {
+      audioBufferQueueRef.current.push({ data: [payload] });
+      return;
+    }
+    if (type === FRAME_AUDIO_OPUS) {
+      if (opusPlayerRef.current) {
+        opusPlayerRef.current.append(payload);
+      }
+      return;
+    }
+    const kind = IMAGE_FRAME_KINDS[type];
+    if (kind) {
+      if (imageUrlsRef.current[kind]) {
+        URL.revokeObjectURL(imageUrlsRef.current[kind]);
+      }
+      const src = URL.createObjectURL(new Blob([payload], { type: "image/png" }));
+      imageUrlsRef.current[kind] = src;
+      setLastImage({ kind, src });
+    } else {
+      console.warn("Unknown binary frame type:", type);
+    }
+  };
+
   const handleToolCalls = async (toolCallRequests) => {
     try {
       let toolPromises = [];
@@ -491,8 +590,15 @@ export const WebSocketProvider = ({
     }
   };
 
+  // Base64 media chunks; in binary mode known media types go out as binary frames instead
   const sendMediaChunk = (chunk) => {
-    if (wsRef.current?.readyState === WebSocket.OPEN) {
+    if (wsRef.current?.readyState !== WebSocket.OPEN) {
+      return;
+    }
+    const frameType = mediaFrameType(chunk.mime_type);
+    if (binaryModeRef.current && frameType !== undefined) {
+      wsRef.current.send(encodeFrame(frameType, Base64.toUint8Array(chunk.data)));
+    } else {
       wsRef.current.send(
         JSON.stringify({
           realtime_input: {
@@ -503,11 +609,45 @@ export const WebSocketProvider = ({
     }
   };
 
+  // Send microphone PCM as a binary frame when negotiated, base64 JSON otherwise
+  const sendAudioChunk = (pcmBuffer) => {
+    if (wsRef.current?.readyState !== WebSocket.OPEN) {
+      return;
+    }
+    if (binaryModeRef.current) {
+      wsRef.current.send(encodeFrame(FRAME_AUDIO_PCM, pcmBuffer));
+    } else {
+      sendMediaChunk({
+        mime_type: "audio/pcm",
+        data: Base64.fromUint8Array(new Uint8Array(pcmBuffer)),
+      });
+    }
+  };
+
+  // Send a screen image (JPEG bytes) as a FRAME_IMAGE_JPEG frame when negotiated, base64 JSON otherwise
+  const sendImageChunk = (imageBuffer, mimeType = "image/jpeg") => {
+    if (wsRef.current?.readyState !== WebSocket.OPEN) {
+      return;
+    }
+    const frameType = mediaFrameType(mimeType);
+    if (binaryModeRef.current && frameType !== undefined) {
+      wsRef.current.send(encodeFrame(frameType, imageBuffer));
+    } else {
+      sendMediaChunk({
+        mime_type: mimeType,
+        data: Base64.fromUint8Array(new Uint8Array(imageBuffer)),
+      });
+    }
+  };
+
   return (
     <WebSocketContext.Provider
       value={{
         sendMessage,
         sendMediaChunk,
+        sendAudioChunk,
+        sendImageChunk,
+        lastImage,
         lastTranscription,
         lastTextMessage,
         lastAudioData,
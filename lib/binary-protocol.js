@@ -0,0 +1,50 @@
+// Binary WebSocket frames shared with live-api-backend/protocol.py.
+// Frame layout: | version (1 byte) | frame type (1 byte) | raw payload ... |
+
+export const PROTOCOL_BINARY = "binary-v1";
+export const VERSION = 1;
+export const HEADER_SIZE = 2;
+
+export const FRAME_AUDIO_PCM = 0x01;
+export const FRAME_IMAGE_JPEG = 0x02;
+export const FRAME_IMAGE_PNG = 0x03;
+export const FRAME_IMAGE_WEBP = 0x04;
+// WebM/Opus reply audio (server to client only, see lib/opus-player.js)
+export const FRAME_AUDIO_OPUS = 0x05;
+
+// Rendered tool images sent by the backend, keyed like the JSON messages.
+export const IMAGE_FRAME_KINDS = {
+  0x10: "wordcloud",
+  0x11: "barchart",
+  0x12: "linechart",
+  0x13: "piechart",
+};
+
+const MEDIA_FRAME_TYPES = {
+  "audio/pcm": FRAME_AUDIO_PCM,
+  "image/jpeg": FRAME_IMAGE_JPEG,
+  "image/png": FRAME_IMAGE_PNG,
+  "image/webp": FRAME_IMAGE_WEBP,
+};
+
+export function mediaFrameType(mimeType) {
+  return MEDIA_FRAME_TYPES[mimeType];
+}
+
+export function encodeFrame(frameType, payload) {
+  const bytes = payload instanceof Uint8Array ? payload : new Uint8Array(payload);
+  const frame = new Uint8Array(HEADER_SIZE + bytes.length);
+  frame[0] = VERSION;
+  frame[1] = frameType;
+  frame.set(bytes, HEADER_SIZE);
+  return frame.buffer;
+}
+
+export function decodeFrame(buffer) {
+  const header = new Uint8Array(buffer, 0, HEADER_SIZE);
+  if (header[0] !== VERSION) {
+    throw new Error(`Unsupported binary frame version ${header[0]}`);
+  }
+  // slice() copies the payload into its own aligned ArrayBuffer (needed for Int16Array).
+  return { type: header[1], payload: buffer.slice(HEADER_SIZE) };
+}
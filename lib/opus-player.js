@@ -0,0 +1,72 @@
+// Plays the WebM/Opus reply stream from live-api-backend/audio_egress.py.
+// Chunks are appended to a MediaSource as they arrive; the stream's timestamps only
+// count audio, so playback simply waits for more data between replies.
+
+export const OPUS_MIME_TYPE = 'audio/webm; codecs="opus"';
+
+export function opusPlaybackSupported() {
+  return (
+    typeof window !== "undefined" &&
+    typeof window.MediaSource !== "undefined" &&
+    window.MediaSource.isTypeSupported(OPUS_MIME_TYPE)
+  );
+}
+
+export class OpusPlayer {
+  constructor(mimeType = OPUS_MIME_TYPE) {
+    this.mimeType = mimeType;
+    this.pending = [];
+    this.sourceBuffer = null;
+    this.mediaSource = new MediaSource();
+    this.audio = new Audio();
+    this.audio.src = URL.createObjectURL(this.mediaSource);
+    this.mediaSource.addEventListener("sourceopen", () => {
+      this.sourceBuffer = this.mediaSource.addSourceBuffer(this.mimeType);
+      this.sourceBuffer.addEventListener("updateend", () => this.flush());
+      this.flush();
+    });
+  }
+
+  append(chunk) {
+    this.pending.push(chunk instanceof Uint8Array ? chunk : new Uint8Array(chunk));
+    this.flush();
+  }
+
+  flush() {
+    const buffer = this.sourceBuffer;
+    if (!buffer || buffer.updating || this.pending.length === 0) {
+      return;
+    }
+    const total = this.pending.reduce((sum, chunk) => sum + chunk.length, 0);
+    const data = new Uint8Array(total);
+    let offset = 0;
+    for (const chunk of this.pending) {
+      data.set(chunk, offset);
+      offset += chunk.length;
+    }
+    this.pending = [];
+    try {
+      buffer.appendBuffer(data);
+    } catch (error) {
+      console.error("Error appending Opus audio:", error);
+      return;
+    }
+    if (this.audio.paused) {
+      this.audio.play().catch((error) => console.warn("Opus playback blocked:", error));
+    }
+  }
+
+  // Drop what is buffered but not yet heard (used when the reply is interrupted).
+  skip() {
+    const buffered = this.audio.buffered;
+    if (buffered.length > 0) {
+      this.audio.currentTime = buffered.end(buffered.length - 1);
+    }
+  }
+
+  close() {
+    this.audio.pause();
+    URL.revokeObjectURL(this.audio.src);
+    this.pending = [];
+  }
+}
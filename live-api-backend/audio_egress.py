@@ -0,0 +1,180 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import shutil
+import time
+
+from metrics import AUDIO_ENCODE_DELAY
+from protocol import FRAME_AUDIO_OPUS, encode_frame
+
+logger = logging.getLogger(__name__)
+
+# Compressed audio toward the browser.
+# Gemini speaks 16-bit mono PCM at 24kHz: 48 kB/s raw, 64 kB/s as base64 JSON. A
+# client whose setup message has {"audio_format": "opus"} gets it as a WebM/Opus
+# stream instead (about 3-4 kB/s at the default 24 kbit/s), which the browser plays
+# through MediaSource. Each session has one long-lived ffmpeg process that is fed the
+# PCM as it arrives and whose output is forwarded as soon as ffmpeg writes it; the
+# stream's timestamps only count audio, so pauses between turns need no special care.
+#
+# The encoder pipeline holds back the last ~190ms of audio until more input arrives.
+# At the end of a reply, or when no PCM has come for OPUS_MAX_LATENCY_MS (a stall),
+# OPUS_FLUSH_PAD_MS of silence is written to push the tail out, so no audio waits in
+# the encoder much longer than OPUS_MAX_LATENCY_MS. The padding is heard as a short
+# pause after the reply.
+
+AUDIO_PCM = "pcm"
+AUDIO_OPUS = "opus"
+OPUS_MIME_TYPE = 'audio/webm; codecs="opus"'
+
+FFMPEG = os.environ.get("FFMPEG", "ffmpeg")
+OPUS_BITRATE = os.environ.get("OPUS_BITRATE", "24k")
+# libopus complexity 0-10; 5 costs about half the CPU of 10 for nearly the same size on speech.
+OPUS_COMPLEXITY = int(os.environ.get("OPUS_COMPLEXITY", 5))
+OPUS_FRAME_MS = int(os.environ.get("OPUS_FRAME_MS", 20))
+OPUS_MAX_LATENCY_MS = float(os.environ.get("OPUS_MAX_LATENCY_MS", 200))
+OPUS_FLUSH_PAD_MS = int(os.environ.get("OPUS_FLUSH_PAD_MS", 200))
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+
+
+def opus_available():
+    return shutil.which(FFMPEG) is not None
+
+
+def wants_opus(config_data):
+    return isinstance(config_data, dict) and config_data.get("audio_format") == AUDIO_OPUS
+
+
+def opus_sender(websocket, binary):
+    """on_data callback sending WebM bytes as binary frames, or base64 in {"audio_opus": ...}."""
+    async def send(chunk):
+        if binary:
+            await websocket.send(encode_frame(FRAME_AUDIO_OPUS, chunk))
+        else:
+            await websocket.send(json.dumps({"audio_opus": base64.b64encode(chunk).decode("utf-8")}))
+    return send
+
+
+async def start_opus_encoder(websocket, binary):
+    """A running OpusEncoder for this client, or None when ffmpeg cannot be started."""
+    if not opus_available():
+        return None
+    try:
+        return await OpusEncoder(opus_sender(websocket, binary)).start()
+    except OSError as e:
+        logger.warning("Could not start the Opus encoder: %s", e)
+        return None
+
+
+def ffmpeg_args(sample_rate=SAMPLE_RATE, bitrate=OPUS_BITRATE, frame_ms=OPUS_FRAME_MS, complexity=OPUS_COMPLEXITY):
+    return [
+        FFMPEG, "-hide_banner", "-loglevel", "error", "-nostdin",
+        # Raw PCM in, no probing or input buffering.
+        "-fflags", "nobuffer", "-probesize", "32", "-analyzeduration", "0",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", "-frame_duration", str(frame_ms),
+        "-compression_level", str(complexity),
+        # One cluster per packet, written as soon as it is muxed.
+        "-f", "webm", "-live", "1", "-cluster_time_limit", str(frame_ms), "-flush_packets", "1",
+        "pipe:1",
+    ]
+
+
+class OpusEncoder:
+    """Streams PCM through one ffmpeg process; on_data(chunk) is awaited for every piece of WebM output."""
+
+    def __init__(self, on_data, sample_rate=SAMPLE_RATE, bitrate=OPUS_BITRATE,
+                 max_latency_ms=OPUS_MAX_LATENCY_MS, flush_pad_ms=OPUS_FLUSH_PAD_MS):
+        self.on_data = on_data
+        self.args = ffmpeg_args(sample_rate, bitrate)
+        self.max_latency = max_latency_ms / 1000
+        self.pad = b"\x00" * (int(sample_rate * flush_pad_ms / 1000) * SAMPLE_WIDTH)
+        self._process = None
+        self._reader = None
+        self._flush_timer = None
+        # Time of the oldest write whose output has not been seen yet.
+        self._waiting_since = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.flushes = 0
+
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            *self.args, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL)
+        self._reader = asyncio.create_task(self._read(self._process.stdout))
+        return self
+
+    async def write(self, pcm):
+        if self._process is None or self._process.stdin.is_closing():
+            return
+        if self._waiting_since is None:
+            self._waiting_since = time.monotonic()
+        self.bytes_in += len(pcm)
+        if await self._send(pcm):
+            self._arm_flush()
+
+    async def flush(self):
+        """Push out audio still held by the encoder by following it with silence."""
+        self._cancel_flush()
+        if self._process is None or self._process.stdin.is_closing():
+            return
+        self.flushes += 1
+        await self._send(self.pad)
+
+    async def _send(self, data):
+        try:
+            self._process.stdin.write(data)
+            await self._process.stdin.drain()
+            return True
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.warning("Opus encoder stopped taking input: %s", e)
+            return False
+
+    def _arm_flush(self):
+        self._cancel_flush()
+        loop = asyncio.get_running_loop()
+        self._flush_timer = loop.call_later(self.max_latency, lambda: asyncio.ensure_future(self.flush()))
+
+    def _cancel_flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    async def _read(self, stdout):
+        try:
+            while True:
+                chunk = await stdout.read(65536)
+                if not chunk:
+                    return
+                if self._waiting_since is not None:
+                    AUDIO_ENCODE_DELAY.observe(time.monotonic() - self._waiting_since)
+                    self._waiting_since = None
+                self.bytes_out += len(chunk)
+                await self.on_data(chunk)
+        except Exception as e:
+            logger.warning("Opus output stopped: %s", e)
+
+    async def close(self, timeout=2.0):
+        """Encode what was written, deliver the rest of the stream and stop ffmpeg."""
+        self._cancel_flush()
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+            await asyncio.wait_for(asyncio.shield(self._reader), timeout)
+            await asyncio.wait_for(process.wait(), timeout)
+        except (asyncio.TimeoutError, OSError):
+            pass
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            self._reader.cancel()
+
+    def stats(self):
+        return {"bytes_in": self.bytes_in, "bytes_out": self.bytes_out, "flushes": self.flushes}
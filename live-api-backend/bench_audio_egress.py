@@ -0,0 +1,92 @@
+"""Bytes per second and CPU per voice session: raw PCM / base64 JSON vs. streaming Opus.
+
+    python bench_audio_egress.py [--sessions 4] [--seconds 10] [--speed 4]
+
+CPU is reported as a percentage of one core per second of audio, including ffmpeg.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import resource
+import time
+
+import numpy as np
+
+from audio_egress import OpusEncoder, SAMPLE_RATE, opus_available
+
+CHUNK_MS = 40
+
+
+def speech_like_pcm(seconds, seed=0):
+    # Voiced harmonics with a syllable-rate envelope and some noise: compresses like speech, unlike silence.
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 3.5 * t), 0, None)
+    signal = 0.25 * voice * envelope + 0.02 * rng.normal(size=len(t))
+    return (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def chunks(pcm):
+    size = SAMPLE_RATE * CHUNK_MS // 1000 * 2
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+
+def bench_pcm(pcm, sessions):
+    start = time.process_time()
+    binary = json_bytes = 0
+    for _ in range(sessions):
+        for chunk in chunks(pcm):
+            binary += 2 + len(chunk)
+            json_bytes += len(json.dumps({"audio": base64.b64encode(chunk).decode("utf-8")}))
+    return binary / sessions, json_bytes / sessions, time.process_time() - start
+
+
+async def bench_opus(pcm, sessions, speed):
+    async def discard(chunk):
+        pass
+
+    def cpu():
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return time.process_time() + children.ru_utime + children.ru_stime
+
+    start = cpu()
+    encoders = [await OpusEncoder(discard).start() for _ in range(sessions)]
+
+    async def feed(encoder):
+        for chunk in chunks(pcm):
+            await encoder.write(chunk)
+            await asyncio.sleep(CHUNK_MS / 1000 / speed)
+        await encoder.flush()
+
+    await asyncio.gather(*(feed(e) for e in encoders))
+    for encoder in encoders:
+        await encoder.close()
+    return sum(e.bytes_out for e in encoders) / sessions, cpu() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--speed", type=float, default=4.0, help="feed rate as a multiple of real time")
+    args = parser.parse_args()
+
+    pcm = speech_like_pcm(args.seconds)
+    audio_seconds = args.seconds * args.sessions
+    binary, json_bytes, pcm_cpu = bench_pcm(pcm, args.sessions)
+    print(f"{'egress':<12} {'kB/s':>8} {'cpu %':>8}")
+    print(f"{'pcm binary':<12} {binary / args.seconds / 1000:>8.1f} {0.0:>8.2f}")
+    print(f"{'pcm json':<12} {json_bytes / args.seconds / 1000:>8.1f} {pcm_cpu / audio_seconds * 100:>8.2f}")
+    if not opus_available():
+        print("opus: ffmpeg not found (set FFMPEG)")
+        return
+    opus_bytes, opus_cpu = asyncio.run(bench_opus(pcm, args.sessions, args.speed))
+    print(f"{'opus webm':<12} {opus_bytes / args.seconds / 1000:>8.1f} {opus_cpu / audio_seconds * 100:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Renders per second: per-call pyplot figures vs. the reusable chart engine.
+
+    python bench_chart_engine.py [--seconds 3] [--threads 4]
+"""
+import argparse
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from chart_engine import ChartEngine
+
+
+def pyplot_render(kind, nums):
+    # The original live_api.py path: a new pyplot figure per chart.
+    fig, ax = plt.subplots(figsize=(4, 2))
+    if kind == "barchart":
+        ax.bar(range(1, len(nums) + 1), nums, color="#4f46e5")
+        ax.set_title("Bar Chart")
+    elif kind == "linechart":
+        ax.plot(range(1, len(nums) + 1), nums, marker="o", color="#059669")
+        ax.set_title("Line Chart")
+    else:
+        ax.pie(nums, labels=[str(i + 1) for i in range(len(nums))], autopct="%1.1f%%")
+        ax.set_title("Pie Chart")
+    buf = io.BytesIO()
+    plt.tight_layout()
+    fig.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def run(render, kind, seconds, threads):
+    rng = random.Random(0)
+    datasets = [[rng.uniform(1, 100) for _ in range(8)] for _ in range(32)]
+    count = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+
+    def worker(offset):
+        n = 0
+        while time.perf_counter() < deadline:
+            render(kind, datasets[(offset + n) % len(datasets)])
+            n += 1
+        return n
+
+    if threads == 1:
+        count = worker(0)
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            count = sum(pool.map(worker, range(threads)))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    engine = ChartEngine()
+    print(f"{'chart':<10} {'pyplot/s':>10} {'engine/s':>10} {'speedup':>8}")
+    for kind in ("barchart", "linechart", "piechart"):
+        # pyplot is not thread-safe, so the baseline always runs single-threaded.
+        baseline = run(pyplot_render, kind, args.seconds, 1)
+        pooled = run(engine.render, kind, args.seconds, args.threads)
+        print(f"{kind:<10} {baseline:>10.1f} {pooled:>10.1f} {pooled / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
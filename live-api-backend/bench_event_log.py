@@ -0,0 +1,68 @@
+"""Cost of recording conversation context: appending transcription fragments to the event
+log vs. writing each one into the JSON memory store, and replaying the last minutes of a
+long log by time range vs. reading the whole log.
+
+    python bench_event_log.py [--fragments 20000] [--context-entries 200] [--replay-seconds 300]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from event_log import EventLog, EventLogReader
+from memory import MemoryStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fragments", type=int, default=20000, help="transcription fragments to record")
+    parser.add_argument("--context-entries", type=int, default=200, help="entries already in the JSON memory")
+    parser.add_argument("--replay-seconds", type=float, default=300, help="window replayed on reconnect")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EventLog(os.path.join(tmp, "log"))
+        started = time.perf_counter()
+        for i in range(args.fragments):
+            log.append("transcription", speaker="Gemini", text=f" fragment {i} of the reply", finished=False)
+            if i % 50 == 0:
+                log.flush()  # what the background writer does every EVENT_LOG_FLUSH_INTERVAL
+        log.close()
+        per_append = (time.perf_counter() - started) / args.fragments
+        segments = EventLogReader(log.directory).segments()
+        size = sum(os.path.getsize(p) for p in segments)
+        print(f"event log: {per_append * 1e6:.1f} us per fragment, {size / 1e6:.1f} MB in {len(segments)} segments")
+
+        # The alternative: every fragment goes into the context section of memory_store.json.
+        store = MemoryStore(os.path.join(tmp, "memory_store.json"), flush_interval=3600)
+        store.update(lambda mem: mem["context"].update({f"old {i}": "x" * 200 for i in range(args.context_entries)}))
+        sample = min(args.fragments, 500)
+        started = time.perf_counter()
+        for i in range(sample):
+            store.update(lambda mem, i=i: mem["context"].__setitem__("current turn", f"fragment {i}"))
+            store.flush()
+        per_rewrite = (time.perf_counter() - started) / sample
+        store.close()
+        print(f"JSON memory rewrite per fragment: {per_rewrite * 1e6:.1f} us "
+              f"({args.context_entries} context entries)")
+
+        reader = EventLogReader(log.directory)
+        last = json.loads(open(segments[-1], "rb").read().splitlines()[-1])["t"]
+        first = json.loads(open(segments[0], "rb").readline())["t"]
+        # Spread the fragments over the session length a real conversation would take (~4/s).
+        span = args.fragments / 4
+        since = last - (last - first) * min(args.replay_seconds / span, 1.0)
+        started = time.perf_counter()
+        window = sum(1 for _ in reader.events(start=since))
+        ranged = time.perf_counter() - started
+        started = time.perf_counter()
+        total = sum(1 for e in reader.events() if e["t"] >= since)
+        full = time.perf_counter() - started
+        assert window == total
+        print(f"replay last {args.replay_seconds:.0f} s ({window} events): time range {ranged * 1000:.1f} ms, "
+              f"full scan {full * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
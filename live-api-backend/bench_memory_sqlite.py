@@ -0,0 +1,55 @@
+"""Insert throughput and lookup latency of the SQLite memory store.
+
+    python bench_memory_sqlite.py [--users 10000] [--keys 1000] [--lookups 20000] [--db /tmp/bench_memory.db]
+
+The defaults write 10M rows (a few GB on disk); scale --users down for a quick run.
+"""
+import argparse
+import os
+import random
+import time
+
+from memory_sqlite import SQLiteMemoryStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--db", default="/tmp/bench_memory.db")
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    store = SQLiteMemoryStore(args.db, flush_interval=3600, batch_size=10 ** 9)
+
+    start = time.perf_counter()
+    for user in range(args.users):
+        store.set_items(f"user{user}", "knowledge", {f"key{k}": {"value": k} for k in range(args.keys)})
+        store.flush()
+    elapsed = time.perf_counter() - start
+    rows = args.users * args.keys
+    print(f"insert: {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+    latencies = []
+    for _ in range(args.lookups):
+        namespace = f"user{random.randrange(args.users)}"
+        key = f"key{random.randrange(args.keys)}"
+        t = time.perf_counter()
+        store.get_item(namespace, "knowledge", key)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"lookup: p50 {p50:.1f}us  p99 {p99:.1f}us over {args.lookups:,} random keys")
+
+    t = time.perf_counter()
+    store.page("user0", "knowledge", limit=100)
+    print(f"page of 100: {(time.perf_counter() - t) * 1e3:.2f}ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
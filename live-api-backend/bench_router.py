@@ -0,0 +1,77 @@
+"""Messages per second through the tool router vs. the old if/elif intent chain.
+
+    python bench_router.py [--messages 200000]
+"""
+import argparse
+import re
+import time
+
+from tools import registry
+
+MESSAGES = [
+    "what is the time?",
+    "weather in paris",
+    "calculate 12*(3+4)",
+    "go to next",
+    "turn on light 1",
+    "word cloud: the quick brown fox jumps over the lazy dog",
+    "bar chart: 1,2,3,4",
+    "pie chart: 5, 10, 20",
+    "tell me something interesting about octopuses",
+    "can you summarise our conversation so far",
+]
+
+
+def legacy_route(text_content):
+    # The intent checks send_to_gemini() used to run for every text message.
+    if "time" in text_content:
+        return "current_time"
+    elif re.search(r"weather(?: in ([a-zA-Z\s]+))?", text_content):
+        return "weather"
+    elif "calculate" in text_content or re.search(r"^\s*\d+[\d\s\+\-\*\/\(\)\.]*$", text_content):
+        if (calc_match := re.search(r"calculate (.+)", text_content)):
+            calc_match.group(1)
+        return "calculator"
+    elif any(word in text_content for word in ["next", "go to next", "forward"]):
+        return "carousel"
+    elif any(word in text_content for word in ["previous", "prev", "go to previous", "back"]):
+        return "carousel"
+    elif re.search(r"turn (on|off) (light 1|light 2|fan)", text_content):
+        return "button"
+    elif "word cloud" in text_content:
+        re.search(r"(?:word cloud|generate word cloud)(?: for|:)?\s*(.*)", text_content)
+        return "wordcloud"
+    elif "bar chart" in text_content:
+        re.search(r"bar chart[:\s]+([\d,\s\.]+)", text_content)
+        return "barchart"
+    elif "line chart" in text_content:
+        re.search(r"line chart[:\s]+([\d,\s\.]+)", text_content)
+        return "linechart"
+    elif "pie chart" in text_content:
+        re.search(r"pie chart[:\s]+([\d,\s\.]+)", text_content)
+        return "piechart"
+    return None
+
+
+def run(route, count):
+    n = len(MESSAGES)
+    start = time.perf_counter()
+    for i in range(count):
+        route(MESSAGES[i % n])
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    registry.route(MESSAGES[0])  # compile the combined matcher
+    legacy = run(legacy_route, args.messages)
+    routed = run(registry.route, args.messages)
+    print(f"legacy if/elif chain: {legacy:>12,.0f} msg/s")
+    print(f"tool registry router: {routed:>12,.0f} msg/s ({routed / legacy:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
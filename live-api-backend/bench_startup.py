@@ -0,0 +1,94 @@
+"""Startup cost of live_api.py: import time per module (python -X importtime) and
+time from process start to the first accepted WebSocket.
+
+    python bench_startup.py [--top 15] [--runs 3]
+
+Runs against fake Gemini (FAKE_GEMINI=1) with throwaway session/memory databases.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from websockets.sync.client import connect
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def server_env(state_dir, **extra):
+    env = dict(os.environ, FAKE_GEMINI="1", LOG_LEVEL="WARNING", DRAIN_TIMEOUT="1",
+               SESSION_DB=os.path.join(state_dir, "sessions.db"), MEMORY_DB=os.path.join(state_dir, "memory.db"),
+               EVENT_LOG_DIR=os.path.join(state_dir, "event_logs"))
+    env.update(extra)
+    return env
+
+
+def import_times(module="live_api", env=None):
+    """(total seconds, [(cumulative seconds, self seconds, module name), ...]) for importing module."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1e6, int(own) / 1e6, name.rstrip()))
+    total = next(cumulative for cumulative, _, name in rows if name.strip() == module)
+    return total, rows
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_accept(env=None, timeout=30.0):
+    """Seconds from starting live_api.py until a WebSocket handshake with it succeeds."""
+    port = _free_port()
+    env = dict(env or os.environ, LIVE_API_HOST="127.0.0.1", LIVE_API_PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "live_api.py"], cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                with connect(f"ws://127.0.0.1:{port}", open_timeout=timeout):
+                    return time.perf_counter() - started
+            except (ConnectionRefusedError, OSError):
+                if process.poll() is not None or time.perf_counter() - started > timeout:
+                    raise RuntimeError("live_api.py did not start")
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = server_env(state_dir)
+        total, rows = import_times(env=env)
+        print(f"import live_api: {total * 1000:.0f} ms")
+        print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for cumulative, own, name in sorted(rows, reverse=True)[1:args.top + 1]:
+            print(f"{cumulative * 1000:>14.1f} {own * 1000:>8.1f}  {name}")
+        for prewarm in ("0", "1"):
+            times = [time_to_first_accept(server_env(state_dir, LIVE_API_PREWARM=prewarm)) for _ in range(args.runs)]
+            print(f"first accepted WebSocket (LIVE_API_PREWARM={prewarm}): "
+                  f"median {statistics.median(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
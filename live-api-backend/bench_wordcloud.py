@@ -0,0 +1,80 @@
+"""Word cloud costs: a new WordCloud + process_text + matplotlib per request vs. the
+streaming WordCounter and warm WordCloudEngine, and a conversation cloud counted per
+transcription fragment vs. tokenizing the whole history when it is drawn.
+
+    python bench_wordcloud.py [--words 20000] [--renders 10] [--fragments 20000]
+"""
+import argparse
+import io
+import random
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from wordcloud import WordCloud
+
+from word_counts import ConversationCloud, word_frequencies
+from wordcloud_engine import WordCloudEngine
+
+VOCABULARY = ("rain sunlight rainbow light colour prism water droplet sky cloud weather storm "
+              "the a and of to in is it that photosynthesis plant leaf energy green chlorophyll").split()
+
+
+def transcript(words, seed=0):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def old_render(text):
+    # The original path: a fresh WordCloud for the counts and another for the layout,
+    # drawn through a pyplot figure.
+    frequencies = WordCloud(width=400, height=200, background_color="white").process_text(text)
+    wc = WordCloud(width=400, height=200, background_color="white").generate_from_frequencies(frequencies)
+    fig, ax = plt.subplots(figsize=(4, 2))
+    ax.imshow(wc.to_array(), interpolation="bilinear")
+    ax.axis("off")
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=20000, help="transcript length")
+    parser.add_argument("--renders", type=int, default=10)
+    parser.add_argument("--fragments", type=int, default=20000, help="transcription fragments in the conversation")
+    args = parser.parse_args()
+
+    text = transcript(args.words)
+    engine = WordCloudEngine()
+    engine.warm()
+    old_render(text)
+    print(f"{args.words} words, mean of {args.renders} renders")
+    print(f"  tokenize  process_text {timed(lambda: WordCloud().process_text(text), args.renders) * 1000:7.1f} ms"
+          f"   WordCounter {timed(lambda: word_frequencies(text), args.renders) * 1000:7.1f} ms")
+    print(f"  render    old path     {timed(lambda: old_render(text), args.renders) * 1000:7.1f} ms"
+          f"   engine      {timed(lambda: engine.render(word_frequencies(text)), args.renders) * 1000:7.1f} ms")
+
+    fragments = [" " + transcript(4, seed=i) for i in range(args.fragments)]
+    history = "".join(fragments)
+    conversation = ConversationCloud()
+    started = time.perf_counter()
+    for fragment in fragments:
+        conversation.add("Gemini", fragment)
+    per_fragment = (time.perf_counter() - started) / len(fragments)
+    print(f"conversation of {len(fragments)} fragments: {per_fragment * 1e6:.1f} us to count each fragment")
+    print(f"  counts at render time  process_text(history) {timed(lambda: WordCloud().process_text(history), args.renders) * 1000:7.1f} ms"
+          f"   ConversationCloud {timed(conversation.frequencies, args.renders) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+import ast
+import functools
+import math
+import os
+import time
+
+import numpy as np
+
+from render_pool import render_pool, RenderPoolError
+
+# Calculator engine.
+# Expressions are parsed once into a tree of small Python closures (an interpreter
+# over a whitelist of AST nodes; nothing is passed to eval) and kept in an LRU cache,
+# so a repeated expression costs only its evaluation. Every operation is bounded:
+# integer powers and products are checked against CALC_MAX_BITS before they are
+# computed, nesting against CALC_MAX_DEPTH (both the compiler and the closures it
+# builds recurse, so this stays well under Python's recursion limit), factorial
+# against CALC_MAX_FACTORIAL, arrays against CALC_MAX_ARRAY elements, and each
+# evaluation against a step count and a wall-clock budget. Lists are NumPy float
+# arrays, so "mean([1, 2, 3])" or "[1, 2] * 3 + 1" work element-wise.
+# Several statements separated by ";" may assign variables: "r = 2; pi * r**2".
+# Expressions whose estimated cost exceeds CALC_INLINE_COST (large ranges, long
+# programs) are evaluated in the render process pool instead of on the event loop.
+
+CALC_MAX_LENGTH = int(os.environ.get("CALC_MAX_LENGTH", 2000))
+CALC_MAX_NODES = int(os.environ.get("CALC_MAX_NODES", 1000))
+CALC_MAX_DEPTH = int(os.environ.get("CALC_MAX_DEPTH", 100))
+CALC_MAX_BITS = int(os.environ.get("CALC_MAX_BITS", 10_000))
+CALC_MAX_FACTORIAL = int(os.environ.get("CALC_MAX_FACTORIAL", 1000))
+CALC_MAX_ARRAY = int(os.environ.get("CALC_MAX_ARRAY", 1_000_000))
+CALC_MAX_STEPS = int(os.environ.get("CALC_MAX_STEPS", 100_000))
+CALC_TIME_BUDGET = float(os.environ.get("CALC_TIME_BUDGET", 0.05))
+CALC_WORKER_TIME_BUDGET = float(os.environ.get("CALC_WORKER_TIME_BUDGET", 2.0))
+CALC_INLINE_COST = int(os.environ.get("CALC_INLINE_COST", 10_000))
+CALC_CACHE_SIZE = int(os.environ.get("CALC_CACHE_SIZE", 512))
+# Values shown for an array result
+CALC_MAX_SHOWN = 10
+
+INVALID = "Invalid or unsafe expression."
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+
+
+class CalculatorError(ValueError):
+    pass
+
+
+class Budget:
+    """Step and wall-clock allowance of one evaluation."""
+
+    def __init__(self, max_steps=CALC_MAX_STEPS, seconds=CALC_TIME_BUDGET):
+        self.max_steps = max_steps
+        self.deadline = time.perf_counter() + seconds
+        self.steps = 0
+
+    def step(self, value):
+        if isinstance(value, np.ndarray):
+            if value.size > CALC_MAX_ARRAY:
+                raise CalculatorError(f"Arrays are limited to {CALC_MAX_ARRAY} values")
+            self.steps += 1 + value.size // 1024
+        else:
+            self.steps += 1
+        if self.steps > self.max_steps:
+            raise CalculatorError("Expression is too expensive to evaluate")
+        if self.steps % 32 == 0 and time.perf_counter() > self.deadline:
+            raise CalculatorError("Expression took too long to evaluate")
+        return value
+
+
+# --- Bounded operations ---
+def _is_array(value):
+    return isinstance(value, np.ndarray)
+
+
+def _is_int(value):
+    return isinstance(value, int)
+
+
+def _check_bits(bits):
+    if bits > CALC_MAX_BITS:
+        raise CalculatorError("Result is too large")
+
+
+def _real(value):
+    if isinstance(value, complex):
+        raise CalculatorError("Result is not a real number")
+    return value
+
+
+def _pow(a, b):
+    if _is_array(a) or _is_array(b):
+        with np.errstate(all="ignore"):
+            return np.power(np.asarray(a, dtype=np.float64), b)
+    if _is_int(a) and _is_int(b) and b >= 0:
+        if abs(a) > 1:
+            _check_bits(b * (abs(a).bit_length() - 1))
+        return a ** b
+    try:
+        return _real(float(a) ** b)
+    except OverflowError:
+        raise CalculatorError("Result is too large")
+
+
+def _mul(a, b):
+    if _is_int(a) and _is_int(b):
+        _check_bits(abs(a).bit_length() + abs(b).bit_length())
+    return a * b
+
+
+def _vector(op):
+    def apply(a, b):
+        if _is_array(a) or _is_array(b):
+            try:
+                with np.errstate(all="ignore"):
+                    return op(np.asarray(a, dtype=np.float64), b)
+            except ValueError as e:
+                raise CalculatorError(f"Arrays do not match: {e}")
+        return op(a, b)
+    return apply
+
+
+BINARY_OPS = {
+    ast.Add: _vector(lambda a, b: a + b),
+    ast.Sub: _vector(lambda a, b: a - b),
+    ast.Mult: _vector(_mul),
+    ast.Div: _vector(lambda a, b: a / b),
+    ast.FloorDiv: _vector(lambda a, b: a // b),
+    ast.Mod: _vector(lambda a, b: a % b),
+    ast.Pow: _pow,
+}
+UNARY_OPS = {
+    ast.UAdd: lambda a: +a,
+    ast.USub: lambda a: -a,
+}
+
+
+# --- Functions ---
+def _elementwise(scalar_fn, array_fn):
+    def apply(*args):
+        if any(_is_array(a) for a in args):
+            with np.errstate(all="ignore"):
+                return array_fn(*args)
+        try:
+            return _real(scalar_fn(*args))
+        except OverflowError:
+            raise CalculatorError("Result is too large")
+    return apply
+
+
+def _values(args):
+    if len(args) == 1 and _is_array(args[0]):
+        return args[0]
+    return _array(args)
+
+
+def _reduction(array_fn, scalar_fn=None):
+    def apply(*args):
+        if not args:
+            raise CalculatorError("Expected at least one value")
+        if scalar_fn is not None and not any(_is_array(a) for a in args):
+            return scalar_fn(args)
+        values = _values(args)
+        if values.size == 0:
+            raise CalculatorError("Expected at least one value")
+        return array_fn(values)
+    return apply
+
+
+def _log(x, base=None):
+    if base is None:
+        return math.log(x)
+    return math.log(x, base)
+
+
+def _array_log(x, base=None):
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+def _factorial(n):
+    if _is_array(n) or not float(n).is_integer() or n < 0:
+        raise CalculatorError("factorial() needs a non-negative whole number")
+    if n > CALC_MAX_FACTORIAL:
+        raise CalculatorError(f"factorial() is limited to {CALC_MAX_FACTORIAL}")
+    return math.factorial(int(n))
+
+
+def _bounded_size(size):
+    if size > CALC_MAX_ARRAY:
+        raise CalculatorError(f"Arrays are limited to {CALC_MAX_ARRAY} values")
+    return size
+
+
+def _range(*args):
+    if not 1 <= len(args) <= 3 or any(_is_array(a) for a in args):
+        raise CalculatorError("range() takes 1 to 3 numbers")
+    start, stop, step = (0, args[0], 1) if len(args) == 1 else (args[0], args[1], args[2] if len(args) == 3 else 1)
+    if step == 0:
+        raise CalculatorError("range() step must not be zero")
+    _bounded_size(max(0, math.ceil((stop - start) / step)))
+    return np.arange(start, stop, step, dtype=np.float64)
+
+
+def _linspace(start, stop, count):
+    return np.linspace(start, stop, _bounded_size(int(count)))
+
+
+def _dot(a, b):
+    try:
+        return float(np.dot(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)))
+    except ValueError as e:
+        raise CalculatorError(f"Arrays do not match: {e}")
+
+
+FUNCTIONS = {
+    "sqrt": _elementwise(math.sqrt, np.sqrt),
+    "exp": _elementwise(math.exp, np.exp),
+    "log": _elementwise(_log, _array_log),
+    "log10": _elementwise(math.log10, np.log10),
+    "log2": _elementwise(math.log2, np.log2),
+    "sin": _elementwise(math.sin, np.sin),
+    "cos": _elementwise(math.cos, np.cos),
+    "tan": _elementwise(math.tan, np.tan),
+    "asin": _elementwise(math.asin, np.arcsin),
+    "acos": _elementwise(math.acos, np.arccos),
+    "atan": _elementwise(math.atan, np.arctan),
+    "atan2": _elementwise(math.atan2, np.arctan2),
+    "sinh": _elementwise(math.sinh, np.sinh),
+    "cosh": _elementwise(math.cosh, np.cosh),
+    "tanh": _elementwise(math.tanh, np.tanh),
+    "degrees": _elementwise(math.degrees, np.degrees),
+    "radians": _elementwise(math.radians, np.radians),
+    "floor": _elementwise(math.floor, np.floor),
+    "ceil": _elementwise(math.ceil, np.ceil),
+    "abs": _elementwise(abs, np.abs),
+    "round": _elementwise(round, np.round),
+    "hypot": _elementwise(math.hypot, np.hypot),
+    "factorial": _factorial,
+    "gcd": _elementwise(math.gcd, np.gcd),
+    "sum": _reduction(np.sum, sum),
+    "min": _reduction(np.min, min),
+    "max": _reduction(np.max, max),
+    "mean": _reduction(np.mean),
+    "median": _reduction(np.median),
+    "std": _reduction(np.std),
+    "var": _reduction(np.var),
+    "prod": _reduction(np.prod),
+    "len": lambda *args: int(_values(args).size),
+    "dot": _dot,
+    "range": _range,
+    "linspace": _linspace,
+}
+# Upper bound on the array a call with constant arguments can create (cost estimate)
+SIZED_FUNCTIONS = {"range", "linspace"}
+
+
+def _array(values):
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        raise CalculatorError("Lists must contain numbers of the same shape")
+
+
+# --- Compilation ---
+class Program:
+    """A compiled calculator program: assignments followed by a result expression."""
+
+    def __init__(self, source, assignments, result, cost):
+        self.source = source
+        self.assignments = assignments
+        self.result = result
+        # Estimated work (nodes plus the size of literal arrays and constant ranges)
+        self.cost = cost
+
+    @property
+    def heavy(self):
+        return self.cost > CALC_INLINE_COST
+
+    def run(self, variables=None, budget=None):
+        budget = budget or Budget()
+        env = dict(CONSTANTS)
+        env.update(variables or {})
+        for name, expr in self.assignments:
+            env[name] = expr(env, budget)
+        return _plain(self.result(env, budget))
+
+
+class _Compiler:
+    def __init__(self):
+        self.nodes = 0
+        self.cost = 0
+        self.depth = 0
+
+    def program(self, source):
+        try:
+            tree = ast.parse(source.strip(), mode="exec")
+        except SyntaxError:
+            raise CalculatorError(INVALID)
+        *statements, last = tree.body or [None]
+        if not isinstance(last, ast.Expr):
+            raise CalculatorError(INVALID)
+        assignments = []
+        for statement in statements:
+            if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name)):
+                raise CalculatorError(INVALID)
+            name = statement.targets[0].id
+            if name in FUNCTIONS:
+                raise CalculatorError(f"{name} is a function name")
+            assignments.append((name, self.expr(statement.value)))
+        result = self.expr(last.value)
+        return Program(source, assignments, result, self.cost + self.nodes)
+
+    def expr(self, node):
+        self.nodes += 1
+        if self.nodes > CALC_MAX_NODES:
+            raise CalculatorError("Expression is too long")
+        if self.depth >= CALC_MAX_DEPTH:
+            raise CalculatorError("Expression is nested too deeply")
+        self.depth += 1
+        try:
+            return self._expr(node)
+        finally:
+            self.depth -= 1
+
+    def _expr(self, node):
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if type(value) not in (int, float):
+                raise CalculatorError(INVALID)
+            return lambda env, budget: value
+        if isinstance(node, ast.Name):
+            return self.name(node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            # "1 + 2 + ... + n" parses as a left-leaning chain; walk it in a loop so a long
+            # flat expression does not count as deep nesting.
+            chain = []
+            while isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+                chain.append(node)
+                node = node.left
+            self.nodes += len(chain) - 1
+            if self.nodes > CALC_MAX_NODES:
+                raise CalculatorError("Expression is too long")
+            first = self.expr(node)
+            rest = [(BINARY_OPS[type(link.op)], self.expr(link.right)) for link in reversed(chain)]
+
+            def chained(env, budget):
+                value = first(env, budget)
+                for op, right in rest:
+                    value = budget.step(op(value, right(env, budget)))
+                return value
+            return chained
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+            op = UNARY_OPS[type(node.op)]
+            operand = self.expr(node.operand)
+            return lambda env, budget: budget.step(op(operand(env, budget)))
+        if isinstance(node, (ast.List, ast.Tuple)):
+            self.cost += len(node.elts)
+            items = [self.expr(item) for item in node.elts]
+            return lambda env, budget: budget.step(_array([item(env, budget) for item in items]))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+                and not node.keywords:
+            return self.call(node.func.id, node.args)
+        raise CalculatorError(INVALID)
+
+    def name(self, name):
+        def load(env, budget):
+            try:
+                return env[name]
+            except KeyError:
+                raise CalculatorError(f"Unknown name {name!r}")
+        return load
+
+    def call(self, name, arg_nodes):
+        if any(isinstance(arg, ast.Starred) for arg in arg_nodes):
+            raise CalculatorError(INVALID)
+        if name in SIZED_FUNCTIONS:
+            self.cost += self._size_estimate(name, arg_nodes)
+        fn = FUNCTIONS[name]
+        args = [self.expr(arg) for arg in arg_nodes]
+
+        def call(env, budget):
+            try:
+                return budget.step(fn(*[arg(env, budget) for arg in args]))
+            except TypeError:
+                raise CalculatorError(f"Wrong arguments for {name}()")
+        return call
+
+    def _size_estimate(self, name, arg_nodes):
+        # Constant arguments give the exact size; anything else may be as large as allowed.
+        try:
+            args = [ast.literal_eval(arg) for arg in arg_nodes]
+            if name == "linspace":
+                return int(args[2])
+            start, stop, step = (0, args[0], 1) if len(args) == 1 else (args[0], args[1], args[2] if len(args) == 3 else 1)
+            return max(0, math.ceil((stop - start) / step))
+        except Exception:
+            return CALC_MAX_ARRAY
+
+
+@functools.lru_cache(maxsize=CALC_CACHE_SIZE)
+def compile_expression(source):
+    """Program for an expression; compiled once per distinct source string."""
+    if len(source) > CALC_MAX_LENGTH:
+        raise CalculatorError("Expression is too long")
+    try:
+        return _Compiler().program(source)
+    except (RecursionError, MemoryError):
+        raise CalculatorError("Expression is nested too deeply")
+
+
+def _plain(value):
+    if isinstance(value, np.ndarray):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def evaluate(source, variables=None, max_steps=CALC_MAX_STEPS, seconds=CALC_TIME_BUDGET):
+    """Value of an expression, evaluated in this thread within the given budget."""
+    try:
+        return compile_expression(source).run(variables, Budget(max_steps, seconds))
+    except CalculatorError:
+        raise
+    except (RecursionError, MemoryError):
+        raise CalculatorError("Expression is too expensive to evaluate")
+    except (ArithmeticError, ValueError, TypeError) as e:
+        raise CalculatorError(str(e))
+
+
+def format_result(value):
+    if isinstance(value, np.ndarray):
+        values = value.ravel().tolist()
+        shown = ", ".join(str(v) for v in values[:CALC_MAX_SHOWN])
+        if len(values) > CALC_MAX_SHOWN:
+            shown += f", ... ({len(values)} values)"
+        return f"[{shown}]"
+    return str(value)
+
+
+class Calculator:
+    def __init__(self, pool=render_pool):
+        self.pool = pool
+        self.inline = 0
+        self.offloaded = 0
+
+    async def calculate(self, expression, variables=None):
+        """Value of an expression: cheap ones inline, heavy ones in a worker process."""
+        program = compile_expression(expression)
+        if not program.heavy:
+            self.inline += 1
+            return evaluate(expression, variables)
+        self.offloaded += 1
+        try:
+            return await self.pool.submit(evaluate, expression, variables, CALC_MAX_STEPS, CALC_WORKER_TIME_BUDGET,
+                                          timeout=CALC_WORKER_TIME_BUDGET + 1)
+        except RenderPoolError as e:
+            raise CalculatorError(str(e))
+
+
+calculator = Calculator()
@@ -1,13 +1,80 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
-from typing import List
-import matplotlib.pyplot as plt
-import io
+from typing import List, Literal, Optional
+import asyncio
 import base64
-from wordcloud import WordCloud
+import binascii
+import codecs
+import os
+import time
 
-app = FastAPI()
+from chart_data import ChartData, ChartInputError
+from charts import png_to_webp, prepare_render
+from metrics import metrics, RENDER_LATENCY
+from render_cache import render_cache
+from render_pool import render_pool, RenderBusyError, RenderTimeoutError
+from word_counts import WordCounter
+
+# Renders run in the shared render process pool (render_pool.py), so they never
+# share figure state and never block the event loop. At most CHART_API_MAX_RENDERS
+# run at once; a request that cannot get a slot within CHART_API_QUEUE_TIMEOUT
+# seconds is answered 503 with Retry-After instead of piling up.
+CHART_API_MAX_RENDERS = int(os.environ.get("CHART_API_MAX_RENDERS", render_pool.workers * 2))
+CHART_API_QUEUE_TIMEOUT = float(os.environ.get("CHART_API_QUEUE_TIMEOUT", 2.0))
+CHART_API_RETRY_AFTER = int(os.environ.get("CHART_API_RETRY_AFTER", 1))
+
+
+class RenderService:
+    def __init__(self, pool, max_renders=CHART_API_MAX_RENDERS, queue_timeout=CHART_API_QUEUE_TIMEOUT):
+        self.pool = pool
+        self.max_renders = max_renders
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_renders)
+        self.rendered = 0
+        self.rejected = 0
+
+    async def render(self, kind, job):
+        """PNG bytes for a prepare_render() job: from the render cache, or rendered in the pool."""
+        cache_key, render_fn, render_args = job
+        png = await asyncio.to_thread(render_cache.get, cache_key)
+        if png is not None:
+            return png
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RenderBusyError("Too many charts are being rendered, please retry shortly.")
+        try:
+            started = time.perf_counter()
+            png = await self.pool.submit(render_fn, *render_args)
+            RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind, source="render")
+        finally:
+            self._slots.release()
+        self.rendered += 1
+        await asyncio.to_thread(render_cache.put, cache_key, png)
+        return png
+
+    def stats(self):
+        return {"max_renders": self.max_renders, "rendered": self.rendered, "rejected": self.rejected,
+                "pool_pending": self.pool.pending}
+
+
+render_service = RenderService(render_pool)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    render_pool.start()
+    try:
+        yield
+    finally:
+        render_pool.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for local frontend
 app.add_middleware(
@@ -16,53 +83,173 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Responses are negotiated: ?format=png|webp|json, or an Accept header preferring
+# image/png or image/webp, returns the image bytes as they come out of the renderer;
+# anything else gets the original {"image": "<base64 PNG>"} JSON. The ETag is the
+# render cache key (a hash of chart type, data and style) plus the format, so a
+# request carrying a matching If-None-Match gets 304 without rendering anything. The
+# GET variants take the data in the query string, so HTTP caches can store charts.
+CHART_CACHE_MAX_AGE = int(os.environ.get("CHART_CACHE_MAX_AGE", 3600))
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp", "json": "application/json"}
+ACCEPT_FORMATS = {"image/png": "png", "image/webp": "webp", "image/*": "png", "application/json": "json"}
+
+
 class ChartRequest(BaseModel):
-    numbers: List[float]
+    # One series as a JSON list...
+    numbers: Optional[List[float]] = None
+    # ...or several series, optionally named
+    series: Optional[List[List[float]]] = None
+    names: Optional[List[str]] = None
+    # Category label per value
+    labels: Optional[List[str]] = None
+    # ...or compact: base64 of little-endian floats, series_count series back to back
+    data: Optional[str] = None
+    dtype: Literal["float32", "float64"] = "float32"
+    series_count: int = 1
+
+    def chart_data(self):
+        try:
+            return ChartData.parse(self.model_dump())
+        except (ChartInputError, binascii.Error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 class WordCloudRequest(BaseModel):
     text: str
 
 
-def fig_to_base64(fig):
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
-    plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode("utf-8")
+def png_to_base64(png):
+    return base64.b64encode(png).decode("utf-8")
+
+
+def negotiate(request):
+    """"png", "webp" or "json" for this request; JSON unless an image type is asked for."""
+    requested = request.query_params.get("format")
+    if requested in MEDIA_TYPES:
+        return requested
+    best, best_q = "json", 0.0
+    for item in request.headers.get("accept", "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        fmt = ACCEPT_FORMATS.get(media_type.lower())
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if fmt and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def image_response(request, kind, arg, allow_empty=False, empty_detail="Nothing to draw."):
+    fmt = negotiate(request)
+    try:
+        # Parsing and hashing are linear in the input, so large inputs are kept off the loop.
+        job = await asyncio.to_thread(prepare_render, kind, arg, allow_empty)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=400, detail=empty_detail)
+    headers = {
+        "ETag": f'"{job[0][:32]}-{fmt}"',
+        "Vary": "Accept",
+        "Cache-Control": f"public, max-age={CHART_CACHE_MAX_AGE}",
+    }
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    try:
+        png = await render_service.render(kind, job)
+    except RenderBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(CHART_API_RETRY_AFTER)})
+    except RenderTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == "json":
+        return JSONResponse({"image": png_to_base64(png)}, headers=headers)
+    body = png
+    if fmt == "webp":
+        webp_key = f"{job[0]}-webp"
+        body = await asyncio.to_thread(render_cache.get, webp_key)
+        if body is None:
+            body = await asyncio.to_thread(png_to_webp, png)
+            await asyncio.to_thread(render_cache.put, webp_key, body)
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def query_chart_data(numbers, labels):
+    return {"numbers": numbers, "labels": labels.split(",") if labels else None}
+
 
 @app.post("/barchart")
-def barchart(req: ChartRequest):
-    fig, ax = plt.subplots(figsize=(4, 2))
-    ax.bar(range(1, len(req.numbers) + 1), req.numbers, color="#4f46e5")
-    ax.set_title("Bar Chart")
-    img = fig_to_base64(fig)
-    return {"image": img}
+async def barchart(req: ChartRequest, request: Request):
+    return await image_response(request, "barchart", req.chart_data(), allow_empty=True)
+
+@app.get("/barchart")
+async def barchart_get(request: Request, numbers: str = "", labels: str = ""):
+    return await image_response(request, "barchart", query_chart_data(numbers, labels), allow_empty=True)
 
 @app.post("/linechart")
-def linechart(req: ChartRequest):
-    fig, ax = plt.subplots(figsize=(4, 2))
-    ax.plot(range(1, len(req.numbers) + 1), req.numbers, marker="o", color="#059669")
-    ax.set_title("Line Chart")
-    img = fig_to_base64(fig)
-    return {"image": img}
+async def linechart(req: ChartRequest, request: Request):
+    return await image_response(request, "linechart", req.chart_data(), allow_empty=True)
+
+@app.get("/linechart")
+async def linechart_get(request: Request, numbers: str = "", labels: str = ""):
+    return await image_response(request, "linechart", query_chart_data(numbers, labels), allow_empty=True)
+
+@app.post("/piechart")
+async def piechart(req: ChartRequest, request: Request):
+    return await image_response(request, "piechart", req.chart_data(), empty_detail="No numbers to draw.")
+
+@app.get("/piechart")
+async def piechart_get(request: Request, numbers: str = "", labels: str = ""):
+    return await image_response(request, "piechart", query_chart_data(numbers, labels), empty_detail="No numbers to draw.")
 
 @app.post("/wordcloud")
-def wordcloud_api(req: WordCloudRequest):
-    wc = WordCloud(width=400, height=200, background_color="white").generate(req.text)
-    buf = io.BytesIO()
-    plt.figure(figsize=(4,2))
-    plt.imshow(wc, interpolation="bilinear")
-    plt.axis("off")
-    plt.tight_layout(pad=0)
-    plt.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
-    plt.close()
-    buf.seek(0)
-    img = base64.b64encode(buf.read()).decode("utf-8")
-    return {"image": img}
+async def wordcloud_api(req: WordCloudRequest, request: Request):
+    return await image_response(request, "wordcloud", req.text, empty_detail="Text contains no words to draw.")
+
+@app.get("/wordcloud")
+async def wordcloud_get(request: Request, text: str = ""):
+    return await image_response(request, "wordcloud", text, empty_detail="Text contains no words to draw.")
+
+@app.post("/wordcloud/text")
+async def wordcloud_text(request: Request):
+    # A plain-text body of any size (a whole transcript), counted chunk by chunk as it
+    # arrives instead of being held in memory as one string.
+    counter = WordCounter()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in request.stream():
+        text = decoder.decode(chunk)
+        if text:
+            await asyncio.to_thread(counter.update, text, False)
+    counter.update(decoder.decode(b"", final=True)).flush()
+    return await image_response(request, "wordcloud", counter.frequencies(), empty_detail="Text contains no words to draw.")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return render_cache.stats()
+
+@app.get("/render/stats")
+def render_stats():
+    return render_service.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return metrics.render_text()
 
 @app.get("/")
 def root():
-    return {"message": "Chart/WordCloud API is running."} 
\ No newline at end of file
+    return {"message": "Chart/WordCloud API is running."}
@@ -0,0 +1,195 @@
+import base64
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Chart input parsing and downsampling.
+# Numbers arrive as text ("1, 2, 3"), JSON lists, several named series, or compact
+# base64/raw little-endian float32/float64 buffers (chart_api.py). All of them are
+# parsed straight into float64 NumPy arrays (no per-element Python loop). Before
+# plotting, a series longer than the plot is wide is reduced to about one point per
+# pixel: lines with LTTB (largest-triangle-three-buckets, keeps the visual shape) or
+# min/max per bucket, bars to the most extreme value per bucket, pies to the largest
+# wedges plus "Other". Parse and downsample are linear in the input and the plot
+# itself only ever sees a bounded number of points, so render time stays flat.
+
+CHART_MAX_INPUT_POINTS = int(os.environ.get("CHART_MAX_INPUT_POINTS", 10_000_000))
+# "lttb" or "minmax"
+CHART_LINE_DOWNSAMPLE = os.environ.get("CHART_LINE_DOWNSAMPLE", "lttb")
+MAX_BARS = 100
+MAX_PIE_WEDGES = 12
+DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+
+class ChartInputError(ValueError):
+    pass
+
+
+class ChartData:
+    """One or more numeric series, with optional series names and category labels."""
+
+    def __init__(self, series, names=None, labels=None):
+        self.series = [np.asarray(s, dtype=np.float64).ravel() for s in series]
+        if sum(len(s) for s in self.series) > CHART_MAX_INPUT_POINTS:
+            raise ChartInputError(f"Too many points (limit {CHART_MAX_INPUT_POINTS})")
+        self.names = [str(n) for n in names] if names else None
+        self.labels = [str(label) for label in labels] if labels else None
+        if self.labels and len(self.labels) != len(self):
+            raise ChartInputError(f"Got {len(self.labels)} labels for {len(self)} values")
+
+    @classmethod
+    def parse(cls, arg, dtype="float64", series_count=1):
+        """ChartData from any supported chart input (see module comment)."""
+        if isinstance(arg, ChartData):
+            return arg
+        if isinstance(arg, dict):
+            return cls._from_dict(arg)
+        if isinstance(arg, (bytes, bytearray, memoryview)):
+            return cls(split_series(decode_buffer(arg, dtype), series_count))
+        if isinstance(arg, (list, tuple)) and arg and all(_is_sequence(item) for item in arg):
+            return cls([parse_numbers(item) for item in arg])
+        return cls([parse_numbers(arg)])
+
+    @classmethod
+    def _from_dict(cls, spec):
+        names = spec.get("names")
+        if spec.get("data") is not None:
+            values = decode_buffer(base64.b64decode(spec["data"]), spec.get("dtype", "float32"))
+            series = split_series(values, spec.get("series_count") or 1)
+        elif spec.get("series"):
+            series = []
+            names = list(names or [])
+            for i, item in enumerate(spec["series"]):
+                if isinstance(item, dict):
+                    series.append(parse_numbers(item.get("values")))
+                    if len(names) <= i:
+                        names.append(item.get("name") or f"Series {i + 1}")
+                else:
+                    series.append(parse_numbers(item))
+            names = names or None
+        else:
+            series = [parse_numbers(spec.get("numbers", spec.get("values")))]
+        return cls(series, names, spec.get("labels"))
+
+    def __len__(self):
+        return max((len(s) for s in self.series), default=0)
+
+    @property
+    def empty(self):
+        return not any(len(s) for s in self.series)
+
+    def digest(self):
+        """Content hash for the render cache key."""
+        h = hashlib.blake2b(digest_size=16)
+        for s in self.series:
+            h.update(len(s).to_bytes(8, "little"))
+            h.update(s.tobytes())
+        h.update(json.dumps([self.names, self.labels]).encode("utf-8"))
+        return h.hexdigest()
+
+
+def _is_sequence(value):
+    return isinstance(value, (list, tuple, np.ndarray))
+
+
+def parse_numbers(value):
+    """1-D float64 array from a list of numbers/numeric strings or a comma/space separated string."""
+    if value is None:
+        return np.empty(0)
+    if isinstance(value, str):
+        value = value.replace(",", " ").split()
+    try:
+        return np.asarray(value, dtype=np.float64).ravel()
+    except (TypeError, ValueError):
+        pass
+    # The text tools pass regex captures, which may contain blanks.
+    try:
+        return np.asarray([v for v in value if not (isinstance(v, str) and not v.strip())], dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.empty(0)
+
+
+def decode_buffer(buffer, dtype="float32"):
+    if dtype not in DTYPES:
+        raise ChartInputError(f"dtype must be one of {', '.join(DTYPES)}")
+    itemsize = np.dtype(DTYPES[dtype]).itemsize
+    if len(buffer) % itemsize:
+        raise ChartInputError(f"Buffer length is not a multiple of {itemsize} bytes")
+    if len(buffer) // itemsize > CHART_MAX_INPUT_POINTS:
+        raise ChartInputError(f"Too many points (limit {CHART_MAX_INPUT_POINTS})")
+    return np.frombuffer(buffer, dtype=DTYPES[dtype]).astype(np.float64)
+
+
+def split_series(values, series_count):
+    if series_count < 1 or len(values) % series_count:
+        raise ChartInputError("Values do not split evenly into series_count series")
+    return list(values.reshape(series_count, -1))
+
+
+# --- Downsampling ---
+def lttb(x, y, n_out):
+    """Indices of the n_out points that Largest-Triangle-Three-Buckets keeps."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_out):
+    """Indices of the minimum and maximum of each of n_out // 2 buckets, in order."""
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    starts = np.linspace(0, n, buckets + 1).astype(np.int64)
+    keep = []
+    for start, end in zip(starts[:-1], starts[1:]):
+        chunk = y[start:end]
+        keep.extend(sorted((start + int(chunk.argmin()), start + int(chunk.argmax()))))
+    return np.unique(np.asarray(keep, dtype=np.int64))
+
+
+def bucket_extremes(y, n_out):
+    """(bucket starts, bucket widths, the most extreme value of each bucket)."""
+    starts = np.linspace(0, len(y), n_out + 1).astype(np.int64)
+    lows = np.minimum.reduceat(y, starts[:-1])
+    highs = np.maximum.reduceat(y, starts[:-1])
+    values = np.where(np.abs(highs) >= np.abs(lows), highs, lows)
+    return starts[:-1], np.diff(starts), values
+
+
+def line_points(y, max_points, method=CHART_LINE_DOWNSAMPLE):
+    """(x, y) to plot for one line: 1-based positions, non-finite values dropped, downsampled."""
+    x = np.arange(1, len(y) + 1, dtype=np.float64)
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if len(y) > max_points:
+        keep = minmax(y, max_points) if method == "minmax" else lttb(x, y, max_points)
+        x, y = x[keep], y[keep]
+    return x, y
+
+
+def pie_wedges(values, labels=None, max_wedges=MAX_PIE_WEDGES):
+    """(values, labels) with everything past the largest max_wedges - 1 wedges merged into "Other"."""
+    labels = labels or [str(i + 1) for i in range(len(values))]
+    if len(values) <= max_wedges:
+        return values, labels[:len(values)]
+    order = np.argsort(values)[::-1]
+    top = np.sort(order[:max_wedges - 1])
+    rest = values[order[max_wedges - 1:]].sum()
+    return np.append(values[top], rest), [labels[i] if i < len(labels) else str(i + 1) for i in top] + ["Other"]
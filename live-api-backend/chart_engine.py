@@ -0,0 +1,191 @@
+import io
+import math
+import queue
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from chart_data import ChartData, MAX_BARS, bucket_extremes, line_points, pie_wedges
+
+# Reusable chart figures, rendered without pyplot.
+# Building a pyplot figure for every chart costs more than drawing it, and pyplot's
+# global "current figure" state is not thread-safe. The engine keeps pre-built Agg
+# Figure/FigureCanvasAgg objects per chart type and updates their artists in place
+# (bar heights, line data, wedge angles) before re-rendering. Each figure
+# is checked out by one thread at a time, so renders can run concurrently. Chart
+# data may hold several series; long series are downsampled to the plot's pixel
+# width first (see chart_data.py).
+
+FIGSIZE = (4, 2)
+CHART_STYLES = {
+    "barchart": {"title": "Bar Chart", "color": "#4f46e5"},
+    "linechart": {"title": "Line Chart", "color": "#059669"},
+    "piechart": {"title": "Pie Chart", "color": None},
+}
+MAX_IDLE_FIGURES = 4
+# Lines with more points than this are drawn without markers.
+MARKER_MAX_POINTS = 50
+# Category labels are only drawn when there are at most this many.
+MAX_TICK_LABELS = 20
+
+
+class _ChartSlot:
+    def __init__(self, kind, figsize):
+        self.kind = kind
+        self.style = CHART_STYLES[kind]
+        self.fig = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.artists = None
+        self.size = None
+        # About one plotted point per horizontal pixel
+        self.max_points = int(figsize[0] * self.fig.dpi)
+
+    def render(self, data):
+        if self.kind == "barchart":
+            self._update_bars(data)
+        elif self.kind == "linechart":
+            self._update_line(data)
+        else:
+            self._update_pie(data)
+        return self._encode()
+
+    def _reset(self):
+        self.ax.clear()
+        if self.style["title"]:
+            self.ax.set_title(self.style["title"])
+
+    def _rescale(self):
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+    def _color(self, count):
+        # One series keeps the chart's color; several use the default color cycle.
+        return self.style["color"] if count == 1 else None
+
+    def _set_labels(self, data, count):
+        if data.labels and 0 < count <= MAX_TICK_LABELS:
+            self.ax.set_xticks(range(1, count + 1), data.labels[:count])
+        if data.names:
+            self.ax.legend(fontsize="small")
+
+    def _update_bars(self, data):
+        # Several series become grouped bars; a series longer than MAX_BARS is drawn as
+        # MAX_BARS buckets, each showing the bucket's most extreme value.
+        series = data.series
+        width = 0.8 / len(series)
+        bars = []
+        for j, values in enumerate(series):
+            if len(values) > MAX_BARS:
+                starts, counts, values = bucket_extremes(values, MAX_BARS)
+            else:
+                starts, counts = np.arange(len(values)), np.ones(len(values))
+            offset = (j - (len(series) - 1) / 2) * width * counts
+            bars.append((starts + (counts + 1) / 2 + offset, values, width * counts))
+        layout = ("bars", tuple(len(s) for s in series), data.names, data.labels)
+        if self.size != layout:
+            self._reset()
+            self.artists = []
+            for j, (xs, heights, widths) in enumerate(bars):
+                label = {"label": data.names[j]} if data.names else {}
+                self.artists.append(self.ax.bar(xs, heights, width=widths, color=self._color(len(bars)), **label))
+            longest = max(len(s) for s in series)
+            self._set_labels(data, 0 if longest > MAX_BARS else longest)
+            self.size = layout
+        else:
+            for container, (_, heights, _) in zip(self.artists, bars):
+                for rect, value in zip(container, heights):
+                    rect.set_height(value)
+            self._rescale()
+
+    def _update_line(self, data):
+        lines = [line_points(values, self.max_points) for values in data.series]
+        layout = ("lines", len(lines), data.names, data.labels)
+        if self.size != layout:
+            self._reset()
+            self.artists = []
+            for j, (xs, ys) in enumerate(lines):
+                label = {"label": data.names[j]} if data.names else {}
+                (line,) = self.ax.plot(xs, ys, color=self._color(len(lines)), **label)
+                self.artists.append(line)
+            self._set_labels(data, len(data))
+            self.size = layout
+        else:
+            for line, (xs, ys) in zip(self.artists, lines):
+                line.set_data(xs, ys)
+            self._rescale()
+        for line, (xs, _) in zip(self.artists, lines):
+            line.set_marker("o" if len(xs) <= MARKER_MAX_POINTS else "")
+
+    def _update_pie(self, data):
+        values = data.series[0]
+        if np.isnan(values).any() or (values < 0).any():
+            raise ValueError("Wedge sizes must be non negative values")
+        total = values.sum()
+        if not total > 0:
+            raise ValueError("Cannot draw a pie chart with a total of zero")
+        nums, labels = pie_wedges(values, data.labels)
+        layout = ("pie", tuple(labels))
+        if self.size != layout:
+            self._reset()
+            self.artists = self.ax.pie(nums, labels=labels, autopct="%1.1f%%")
+            self.size = layout
+            return
+        # Same wedges: move the existing wedges and their labels.
+        wedges, texts, pcts = self.artists
+        theta1 = 0.0
+        for value, wedge, label, pct in zip(nums, wedges, texts, pcts):
+            frac = value / total
+            theta2 = theta1 + frac
+            wedge.set_theta1(360.0 * theta1)
+            wedge.set_theta2(360.0 * theta2)
+            mid = math.pi * (theta1 + theta2)
+            x, y = math.cos(mid), math.sin(mid)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment("left" if x > 0 else "right")
+            pct.set_position((0.6 * x, 0.6 * y))
+            pct.set_text("%1.1f%%" % (100.0 * frac))
+            theta1 = theta2
+
+    def _encode(self):
+        # bbox_inches="tight" already crops to the drawn artists, so the extra
+        # layout pass the pyplot path did with tight_layout() is skipped.
+        buf = io.BytesIO()
+        self.fig.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
+        return buf.getvalue()
+
+
+class ChartEngine:
+    def __init__(self, figsize=FIGSIZE, max_idle=MAX_IDLE_FIGURES):
+        self.figsize = figsize
+        self.max_idle = max_idle
+        self._idle = {kind: queue.LifoQueue() for kind in CHART_STYLES}
+
+    def _acquire(self, kind):
+        try:
+            return self._idle[kind].get_nowait()
+        except queue.Empty:
+            return _ChartSlot(kind, self.figsize)
+
+    def _release(self, slot):
+        idle = self._idle[slot.kind]
+        if idle.qsize() < self.max_idle:
+            idle.put(slot)
+
+    def render(self, kind, data):
+        """Render chart data (see ChartData.parse) to PNG bytes. Word clouds: see wordcloud_engine.py."""
+        data = ChartData.parse(data)
+        slot = self._acquire(kind)
+        # A failed update may leave the artists half-modified, so the figure is
+        # only returned to the pool after a successful render.
+        png = slot.render(data)
+        self._release(slot)
+        return png
+
+    def warm(self):
+        for kind in ("barchart", "linechart", "piechart"):
+            self.render(kind, [1.0, 2.0, 3.0])
+
+
+chart_engine = ChartEngine()
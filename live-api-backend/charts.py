@@ -0,0 +1,95 @@
+import base64
+import io
+import time
+from PIL import Image
+
+from chart_data import ChartData
+from chart_engine import chart_engine, CHART_STYLES, FIGSIZE
+from metrics import RENDER_LATENCY
+from render_cache import render_cache, make_key
+from word_counts import word_frequencies
+from wordcloud_engine import wordcloud_engine, WORDCLOUD_BACKGROUND, WORDCLOUD_MASK, WORDCLOUD_SIZE
+
+# Chart and word cloud renderers used by the live tools and chart_api.py. They live
+# in their own module (instead of live_api.py) so render worker processes can import
+# them without creating a Gemini client.
+
+
+def render_wordcloud_png(frequencies):
+    return wordcloud_engine.render(frequencies)
+
+
+def render_chart_png(kind, data):
+    return chart_engine.render(kind, data)
+
+
+def prepare_render(kind, arg, allow_empty=False):
+    """Normalize a tool input into (cache_key, render_fn, render_args).
+
+    Returns None when there is nothing to draw. The cache key covers the chart
+    type, the normalized data and every style setting that affects the image. A
+    word cloud takes text or precomputed {word: count} frequencies.
+    """
+    if kind == "wordcloud":
+        freqs = arg if isinstance(arg, dict) else word_frequencies(arg)
+        if not freqs:
+            return None
+        inputs = {"frequencies": freqs, "size": WORDCLOUD_SIZE, "background": WORDCLOUD_BACKGROUND, "mask": WORDCLOUD_MASK}
+        return make_key(kind, inputs), render_wordcloud_png, (freqs,)
+    data = ChartData.parse(arg)
+    if data.empty and not allow_empty:
+        return None
+    # Downsampling happens in render_chart_png (in the render worker); the key covers the full data.
+    inputs = {"data": data.digest(), "figsize": FIGSIZE, **CHART_STYLES[kind]}
+    return make_key(kind, inputs), render_chart_png, (kind, data)
+
+
+def render_job(kind, job):
+    """PNG bytes for a prepare_render() job, from the shared render cache if possible."""
+    cache_key, render_fn, render_args = job
+    png = render_cache.get(cache_key)
+    if png is None:
+        started = time.perf_counter()
+        png = render_fn(*render_args)
+        RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind, source="render")
+        render_cache.put(cache_key, png)
+    return png
+
+
+def render_cached(kind, arg, allow_empty=False):
+    """Render synchronously through the shared render cache. Returns PNG bytes or None."""
+    job = prepare_render(kind, arg, allow_empty)
+    if job is None:
+        return None
+    return render_job(kind, job)
+
+
+def png_to_webp(png):
+    # Charts are flat colors and text: lossless WebP is smaller than the PNG and exact.
+    out = io.BytesIO()
+    Image.open(io.BytesIO(png)).save(out, format="WEBP", lossless=True, method=4)
+    return out.getvalue()
+
+
+def _render_tool(kind, arg):
+    try:
+        png = render_cached(kind, arg)
+    except Exception:
+        return None
+    if png is None:
+        return None
+    return base64.b64encode(png).decode("utf-8")
+
+
+# --- Tool: Word Cloud Generator ---
+def wordcloud_tool(text):
+    return _render_tool("wordcloud", text)
+
+def barchart_tool(numbers):
+    return _render_tool("barchart", numbers)
+
+def linechart_tool(numbers):
+    return _render_tool("linechart", numbers)
+
+def piechart_tool(numbers):
+    return _render_tool("piechart", numbers)
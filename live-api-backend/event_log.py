@@ -0,0 +1,436 @@
+import fcntl
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from memory import WriteBehind, is_memory_enabled, remember
+from word_counts import ConversationCloud
+
+logger = logging.getLogger(__name__)
+
+# Append-only conversation event log per client, compacted into context memory.
+# Transcription fragments arrive several times a second; writing each one into the
+# JSON/SQLite memory would rewrite state at audio rate. Instead every session appends
+# events (transcriptions, typed text, tool calls and results) to a log directory per
+# client: append() only formats one JSON line into a buffer, and one background
+# thread per process writes the buffers of all open logs out in batches. The log is
+# part of the user's memory: while memory is disabled for the namespace, buffered
+# events are dropped instead of written and compaction deletes what is on disk, and
+# clearing memory deletes the directory (EventLogManager.clear).
+# A log is a series of segment files of about EVENT_LOG_SEGMENT_BYTES, each written
+# by one EventLog (the writer id is part of its name); the segment being written is
+# named *.active and is renamed to *.jsonl once full or closed. Every line starts
+# with {"t":<unix time>, and times only grow within a segment, so EventLogReader can
+# memory-map segments and binary-search a time range without parsing what lies
+# outside it. Every EVENT_LOG_COMPACT_INTERVAL seconds (and when the session ends)
+# the events since the last compaction are summarized into one "context" memory
+# entry. The checkpoint is kept per writer, since a concurrent session may still
+# hold earlier events in its buffer. Summarized sealed segments are deleted beyond
+# the newest EVENT_LOG_KEEP_SEGMENTS, or once they fall out of the replay window.
+
+EVENT_LOG_DIR = os.environ.get("EVENT_LOG_DIR", os.path.join(os.path.dirname(__file__), "event_logs"))
+EVENT_LOG_SEGMENT_BYTES = int(os.environ.get("EVENT_LOG_SEGMENT_BYTES", 1 << 20))
+EVENT_LOG_FLUSH_INTERVAL = float(os.environ.get("EVENT_LOG_FLUSH_INTERVAL", 0.5))
+EVENT_LOG_COMPACT_INTERVAL = float(os.environ.get("EVENT_LOG_COMPACT_INTERVAL", 300))
+EVENT_LOG_KEEP_SEGMENTS = int(os.environ.get("EVENT_LOG_KEEP_SEGMENTS", 8))
+# How far back a resumed session replays the log (matches session_store's handle TTL)
+EVENT_LOG_REPLAY_SECONDS = float(os.environ.get("EVENT_LOG_REPLAY_SECONDS", 2 * 60 * 60))
+# Upper bound on the text kept per speaker in one context summary
+CONTEXT_SUMMARY_CHARS = int(os.environ.get("CONTEXT_SUMMARY_CHARS", 400))
+CONTEXT_TOPICS = 8
+# An *.active segment untouched this long belongs to a process that died; it is sealed
+STALE_SEGMENT_SECONDS = 24 * 60 * 60
+
+ACTIVE_SUFFIX = ".active"
+SEALED_SUFFIX = ".jsonl"
+CHECKPOINT_FILE = "compacted"
+LOCK_FILE = ".compact.lock"
+_SAFE_KEY = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def log_dir(client_id, root=None):
+    """Log directory of a client: its id if that is a safe file name, else a hash of it."""
+    name = client_id if _SAFE_KEY.fullmatch(client_id) else hashlib.sha256(client_id.encode()).hexdigest()[:32]
+    return os.path.join(root or EVENT_LOG_DIR, name)
+
+
+def format_event(t, kind, fields):
+    # "t" first, with a fixed prefix, so readers can get an event's time without json.loads.
+    rest = json.dumps(fields, ensure_ascii=False, separators=(",", ":"), default=str)[1:]
+    return f'{{"t":{t:.6f},"type":{json.dumps(kind)}{"," if fields else ""}{rest}\n'
+
+
+class EventLog:
+    """The open, writable log of one session (see EventLogManager.open)."""
+
+    def __init__(self, directory, namespace=None, segment_bytes=EVENT_LOG_SEGMENT_BYTES):
+        self.directory = directory
+        self.namespace = namespace
+        self.segment_bytes = segment_bytes
+        self.writer_id = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = []
+        self._pending_t = None
+        self._last_t = 0.0
+        self._file = None
+        self._path = None
+        self._size = 0
+        self._segments = 0
+        self.last_compacted = time.monotonic()
+        self.appended = 0
+        self.written = 0
+
+    def append(self, kind, **fields):
+        """Record an event now. Only buffers it; the background writer writes it out."""
+        with self._lock:
+            # Times strictly increase within a log, so segments stay sorted and a
+            # checkpoint time identifies one event.
+            t = self._last_t = max(time.time(), self._last_t + 1e-6)
+            self._pending.append(format_event(t, kind, fields))
+            if self._pending_t is None:
+                self._pending_t = t
+            self.appended += 1
+
+    def flush(self):
+        """Write buffered events to the current segment. Returns how many were written."""
+        with self._write_lock:
+            with self._lock:
+                lines, first_t = self._pending, self._pending_t
+                self._pending, self._pending_t = [], None
+            if not lines or not self.recording():
+                return 0
+            data = "".join(lines).encode()
+            if self._file is None:
+                self._open_segment(first_t)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.written += len(lines)
+            if self._size >= self.segment_bytes:
+                self._seal()
+            return len(lines)
+
+    def _open_segment(self, t):
+        os.makedirs(self.directory, exist_ok=True)
+        self._segments += 1
+        name = f"{int(t * 1000):013d}-{self.writer_id}-{self._segments:04d}"
+        self._path = os.path.join(self.directory, name + ACTIVE_SUFFIX)
+        self._file = open(self._path, "ab")
+        self._size = 0
+
+    def recording(self):
+        """Whether events are kept: a log bound to a namespace follows its memory setting."""
+        return self.namespace is None or is_memory_enabled(self.namespace)
+
+    def _seal(self):
+        self._file.close()
+        try:
+            os.replace(self._path, self._path[:-len(ACTIVE_SUFFIX)] + SEALED_SUFFIX)
+        except FileNotFoundError:
+            pass  # the log was cleared
+        self._file = self._path = None
+
+    def discard(self):
+        """Drop buffered events and stop writing the current segment (see EventLogManager.clear)."""
+        with self._write_lock:
+            with self._lock:
+                self._pending, self._pending_t = [], None
+            if self._file is not None:
+                self._file.close()
+                self._file = self._path = None
+
+    def close(self):
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._seal()
+
+    def stats(self):
+        return {"appended": self.appended, "written": self.written, "segments": self._segments}
+
+
+class EventLogReader:
+    """Read-only view of a log directory, memory-mapping its segments."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def segments(self, sealed_only=False):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        suffixes = (SEALED_SUFFIX,) if sealed_only else (SEALED_SUFFIX, ACTIVE_SUFFIX)
+        return [os.path.join(self.directory, name) for name in sorted(names) if name.endswith(suffixes)]
+
+    def events(self, start=None, end=None, kinds=None):
+        """Events with start <= t < end, oldest first, as dicts. kinds limits the event types."""
+        streams = [self._segment_events(path, start, end) for path in self.segments()]
+        events = heapq.merge(*streams, key=lambda event: event["t"])
+        if kinds is not None:
+            kinds = set(kinds)
+            events = (event for event in events if event["type"] in kinds)
+        return events
+
+    def _segment_events(self, path, start, end):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            if not path.endswith(ACTIVE_SUFFIX):
+                return
+            # Sealed since the directory was listed
+            try:
+                f = open(path[:-len(ACTIVE_SUFFIX)] + SEALED_SUFFIX, "rb")
+            except FileNotFoundError:
+                return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                # A segment being written may end in a partial line; it is not read.
+                limit = mm.rfind(b"\n") + 1
+                if limit == 0:
+                    return
+                last = mm.rfind(b"\n", 0, limit - 1) + 1
+                if start is not None and _line_time(mm, last) < start:
+                    return
+                if end is not None and _line_time(mm, 0) >= end:
+                    return
+                pos = 0 if start is None else _first_at_or_after(mm, start, limit)
+                while pos < limit:
+                    line_end = mm.find(b"\n", pos, limit)
+                    if end is not None and _line_time(mm, pos) >= end:
+                        return
+                    yield json.loads(mm[pos:line_end])
+                    pos = line_end + 1
+
+
+def _line_time(mm, pos):
+    return float(mm[pos + 5:mm.find(b",", pos)])
+
+
+def _first_at_or_after(mm, t, limit):
+    """Offset of the first line with time >= t (limit if there is none)."""
+    lo, hi = 0, limit
+    while lo < hi:
+        line_start = mm.rfind(b"\n", 0, (lo + hi) // 2) + 1
+        if _line_time(mm, line_start) < t:
+            lo = mm.find(b"\n", line_start, limit) + 1
+        else:
+            hi = line_start
+    return lo
+
+
+def summarize(events, limit=CONTEXT_SUMMARY_CHARS):
+    """(key, text) summarizing a stretch of conversation, or None if nothing was said.
+
+    Extractive: the main topics (word cloud counts), the start of what each speaker
+    said, and the tools that were used.
+    """
+    said = {}
+    conversation = ConversationCloud()
+    tools = []
+    first = None
+    for event in events:
+        kind = event["type"]
+        if kind in ("transcription", "text") and event.get("text"):
+            first = first or event["t"]
+            speaker = event.get("speaker", "User")
+            said.setdefault(speaker, []).append(event["text"])
+            conversation.add(speaker, event["text"], event.get("finished", True))
+        elif kind == "tool_call" and event.get("name") not in tools:
+            tools.append(event.get("name"))
+    if first is None:
+        return None
+    for speaker in said:
+        conversation.add(speaker, "", finished=True)
+    topics = sorted(conversation.frequencies().items(), key=lambda item: -item[1])[:CONTEXT_TOPICS]
+    lines = []
+    if topics:
+        lines.append("Topics: " + ", ".join(word for word, _ in topics))
+    for speaker, parts in said.items():
+        text = " ".join("".join(parts).split())
+        if len(text) > limit:
+            text = text[:limit].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"{speaker}: {text}")
+    if tools:
+        lines.append("Tools used: " + ", ".join(tools))
+    key = "conversation " + datetime.fromtimestamp(first).strftime("%Y-%m-%d %H:%M:%S")
+    return key, "\n".join(lines)
+
+
+def _writer_of(path):
+    # Segments are named {time}-{writer id}-{n}
+    return os.path.basename(path).split("-")[1]
+
+
+def _read_checkpoint(directory):
+    """{writer id: time of its last compacted event}"""
+    try:
+        with open(os.path.join(directory, CHECKPOINT_FILE)) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return checkpoint if isinstance(checkpoint, dict) else {}
+
+
+def _write_checkpoint(directory, checkpoint):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def compact(directory, namespace, keep_segments=EVENT_LOG_KEEP_SEGMENTS):
+    """Summarize the events since the last compaction into context memory and drop old segments.
+
+    With memory disabled for the namespace, sealed segments are deleted unread; a
+    log without a namespace is left alone.
+    Only one process compacts a directory at a time; a busy directory is skipped.
+    Returns the key of the context entry written, or None.
+    """
+    if namespace is None or not os.path.isdir(directory):
+        return None
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        reader = EventLogReader(directory)
+        if not is_memory_enabled(namespace):
+            _prune(reader, None, keep_segments=0)
+            return None
+        checkpoint = _read_checkpoint(directory)
+        # Each writer's events are read from just after its own checkpoint: its times
+        # only grow, so whatever it has not written yet comes after it.
+        latest = dict(checkpoint)
+
+        def tracked(path):
+            writer = _writer_of(path)
+            since = checkpoint.get(writer)
+            for event in reader._segment_events(path, None if since is None else since + 1e-6, None):
+                latest[writer] = event["t"]
+                yield event
+        events = list(heapq.merge(*[tracked(path) for path in reader.segments()], key=lambda event: event["t"]))
+        key = None
+        summary = summarize(events) if events else None
+        if summary:
+            key, text = summary
+            remember("context", key, text, namespace)
+            logger.debug("Compacted %d events of %s into context %r", len(events), directory, key)
+        remaining = _prune(reader, latest, keep_segments)
+        # Writers without segments left start over from their first event.
+        latest = {writer: t for writer, t in latest.items() if writer in remaining}
+        if latest != checkpoint:
+            _write_checkpoint(directory, latest)
+        return key
+
+
+def _prune(reader, compacted, keep_segments):
+    """Delete summarized sealed segments; compacted=None deletes every sealed segment.
+
+    Returns the writer ids that still have segments.
+    """
+    now = time.time()
+    for path in reader.segments():
+        if path.endswith(ACTIVE_SUFFIX) and now - os.path.getmtime(path) > STALE_SEGMENT_SECONDS:
+            os.replace(path, path[:-len(ACTIVE_SUFFIX)] + SEALED_SUFFIX)
+    sealed = reader.segments(sealed_only=True)
+    newest = set(sealed[max(len(sealed) - keep_segments, 0):])
+    for path in sealed:
+        if compacted is not None:
+            end = _segment_end(path)
+            # Only segments whose every event is already summarized, and that are
+            # beyond the newest keep_segments or older than a resumed session replays
+            if end > compacted.get(_writer_of(path), 0.0):
+                continue
+            if path in newest and end >= now - EVENT_LOG_REPLAY_SECONDS:
+                continue
+        os.remove(path)
+    return {_writer_of(path) for path in reader.segments()}
+
+
+def _segment_end(path):
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0.0
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            limit = mm.rfind(b"\n")
+            return _line_time(mm, mm.rfind(b"\n", 0, limit) + 1) if limit > 0 else 0.0
+
+
+def replay_conversation(directory, conversation, since, namespace=None):
+    """Feed the transcriptions and typed text logged since `since` into a ConversationCloud.
+
+    Nothing is replayed while memory is disabled for the namespace.
+    """
+    count = 0
+    if namespace is not None and not is_memory_enabled(namespace):
+        return count
+    for event in EventLogReader(directory).events(start=since, kinds=("transcription", "text")):
+        conversation.add(event.get("speaker", "User"), event.get("text", ""), event.get("finished", True))
+        count += 1
+    return count
+
+
+class EventLogManager:
+    """Open logs of this process, flushed (and compacted when due) by one background thread."""
+
+    def __init__(self, root=EVENT_LOG_DIR, flush_interval=EVENT_LOG_FLUSH_INTERVAL,
+                 compact_interval=EVENT_LOG_COMPACT_INTERVAL):
+        self.root = root
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._logs = set()
+        self._writer = WriteBehind(lambda: self.flush_all(), flush_interval, "event-log-flush")
+
+    def open(self, client_id, namespace=None):
+        log = EventLog(log_dir(client_id, self.root), namespace)
+        with self._lock:
+            self._logs.add(log)
+        self._writer.poke()
+        return log
+
+    def flush_all(self):
+        with self._lock:
+            logs = list(self._logs)
+        for log in logs:
+            log.flush()
+            if time.monotonic() - log.last_compacted >= self.compact_interval:
+                log.last_compacted = time.monotonic()
+                compact(log.directory, log.namespace)
+
+    def close(self, log):
+        """Write out and seal the log and compact it. Blocking: call it off the event loop."""
+        with self._lock:
+            self._logs.discard(log)
+        log.close()
+        compact(log.directory, log.namespace)
+
+    def clear(self, log):
+        """Delete everything logged for the log's client. Blocking: call it off the event loop."""
+        log.discard()
+        shutil.rmtree(log.directory, ignore_errors=True)
+
+    def close_all(self):
+        self._writer.close()
+        with self._lock:
+            logs = list(self._logs)
+        for log in logs:
+            self.close(log)
+
+
+event_logs = EventLogManager()
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from google.genai import types
+
+# Offline stand-in for client.aio.live.connect().
+# With FAKE_GEMINI=1, live_api.py talks to FakeClient instead of Gemini, so the whole
+# WebSocket pipeline can be load-tested (loadtest.py) and regression-tested without an
+# API key. A session answers every FAKE_UTTERANCE_MS of input audio (or a shorter
+# utterance followed by FAKE_END_OF_SPEECH_MS of silence, or a text turn) with a
+# scripted reply built from real google.genai message types: after FAKE_FIRST_AUDIO_MS
+# it streams FAKE_REPLY_MS of 24kHz PCM in FAKE_AUDIO_CHUNK_MS chunks at real-time
+# cadence, with output transcription fragments, usage metadata and a resumption handle.
+# Every FAKE_TOOL_CALL_EVERY-th reply first calls one of the configured tools and waits
+# for its response. Like the SDK, receive() ends after each turn_complete.
+
+FAKE_GEMINI = os.environ.get("FAKE_GEMINI") == "1"
+FAKE_FIRST_AUDIO_MS = float(os.environ.get("FAKE_FIRST_AUDIO_MS", 300))
+FAKE_UTTERANCE_MS = float(os.environ.get("FAKE_UTTERANCE_MS", 1000))
+FAKE_END_OF_SPEECH_MS = float(os.environ.get("FAKE_END_OF_SPEECH_MS", 500))
+FAKE_REPLY_MS = float(os.environ.get("FAKE_REPLY_MS", 1500))
+FAKE_AUDIO_CHUNK_MS = float(os.environ.get("FAKE_AUDIO_CHUNK_MS", 40))
+FAKE_TOOL_CALL_EVERY = int(os.environ.get("FAKE_TOOL_CALL_EVERY", 0))
+FAKE_TOOL_TIMEOUT = 5.0
+
+INPUT_BYTES_PER_MS = 16000 * 2 / 1000
+OUTPUT_BYTES_PER_MS = 24000 * 2 / 1000
+REPLY_WORDS = "Sure, here is a scripted answer from the offline test session".split()
+
+
+def _message(**fields):
+    return types.LiveServerMessage(**fields)
+
+
+class FakeLiveSession:
+    def __init__(self, config=None, first_audio_ms=FAKE_FIRST_AUDIO_MS, utterance_ms=FAKE_UTTERANCE_MS,
+                 end_of_speech_ms=FAKE_END_OF_SPEECH_MS, reply_ms=FAKE_REPLY_MS, chunk_ms=FAKE_AUDIO_CHUNK_MS,
+                 tool_call_every=FAKE_TOOL_CALL_EVERY, tool_names=None):
+        self.first_audio_s = first_audio_ms / 1000
+        self.utterance_bytes = int(utterance_ms * INPUT_BYTES_PER_MS)
+        self.end_of_speech_s = end_of_speech_ms / 1000
+        self.chunk_s = chunk_ms / 1000
+        self.chunks_per_reply = max(1, int(reply_ms / chunk_ms))
+        self.tool_call_every = tool_call_every
+        # Tools the fake may call: by default every declared one
+        self.tool_names = tool_names or [d.name for tool in (getattr(config, "tools", None) or [])
+                                         for d in (tool.function_declarations or [])]
+        self._chunk = b"\x00\x00" * int(chunk_ms * OUTPUT_BYTES_PER_MS / 2)
+        self._responses = asyncio.Queue()
+        self._tool_responses = asyncio.Queue()
+        self._audio_bytes = 0
+        self._end_of_speech = None
+        self._reply_task = None
+        self.turns = 0
+        self.audio_in_bytes = 0
+        self.images_in = 0
+        self.texts_in = 0
+        self.tool_responses = 0
+
+    # --- Client -> "Gemini" ---
+    async def send(self, input=None, end_of_turn=False):
+        if isinstance(input, dict) and "data" in input:
+            self._media(input.get("mime_type", ""), input["data"])
+        elif isinstance(input, str):
+            self._text()
+
+    async def send_realtime_input(self, audio=None, media=None, video=None, text=None, **_):
+        for blob in (audio, media, video):
+            if blob is not None:
+                self._media(blob.mime_type or "", blob.data)
+        if text:
+            self._text()
+
+    async def send_client_content(self, turns=None, turn_complete=True):
+        self._text()
+
+    async def send_tool_response(self, function_responses=None):
+        self.tool_responses += 1
+        self._tool_responses.put_nowait(function_responses)
+
+    def _media(self, mime_type, data):
+        if mime_type.startswith("image/"):
+            self.images_in += 1
+            return
+        self.audio_in_bytes += len(data)
+        if self._replying():
+            return
+        self._audio_bytes += len(data)
+        if self._end_of_speech is not None:
+            self._end_of_speech.cancel()
+        if self._audio_bytes >= self.utterance_bytes:
+            self._start_reply()
+        else:
+            self._end_of_speech = asyncio.get_running_loop().call_later(self.end_of_speech_s, self._start_reply)
+
+    def _text(self):
+        self.texts_in += 1
+        if not self._replying():
+            self._start_reply()
+
+    def _replying(self):
+        return self._reply_task is not None and not self._reply_task.done()
+
+    def _start_reply(self):
+        if self._end_of_speech is not None:
+            self._end_of_speech.cancel()
+            self._end_of_speech = None
+        self._audio_bytes = 0
+        if not self._replying():
+            self._reply_task = asyncio.create_task(self._reply())
+
+    # --- Scripted reply ---
+    async def _reply(self):
+        self.turns += 1
+        if self.tool_call_every and self.tool_names and self.turns % self.tool_call_every == 0:
+            name = self.tool_names[self.turns // self.tool_call_every % len(self.tool_names)]
+            self._responses.put_nowait(_message(tool_call=types.LiveServerToolCall(function_calls=[
+                types.FunctionCall(id=uuid.uuid4().hex, name=name, args={})])))
+            try:
+                await asyncio.wait_for(self._tool_responses.get(), FAKE_TOOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.sleep(self.first_audio_s)
+        start = time.monotonic()
+        for i in range(self.chunks_per_reply):
+            await asyncio.sleep(max(0.0, start + i * self.chunk_s - time.monotonic()))
+            parts = [types.Part(inline_data=types.Blob(data=self._chunk, mime_type="audio/pcm;rate=24000"))]
+            transcription = None
+            if i % 5 == 0:
+                transcription = types.Transcription(text=REPLY_WORDS[i // 5 % len(REPLY_WORDS)] + " ")
+            self._responses.put_nowait(_message(server_content=types.LiveServerContent(
+                model_turn=types.Content(role="model", parts=parts), output_transcription=transcription)))
+        self._responses.put_nowait(_message(usage_metadata=types.UsageMetadata(
+            prompt_token_count=100, response_token_count=50, total_token_count=150)))
+        self._responses.put_nowait(_message(session_resumption_update=types.LiveServerSessionResumptionUpdate(
+            new_handle=uuid.uuid4().hex, resumable=True)))
+        self._responses.put_nowait(_message(server_content=types.LiveServerContent(turn_complete=True)))
+
+    # --- "Gemini" -> client ---
+    async def receive(self):
+        while True:
+            message = await self._responses.get()
+            yield message
+            if message.server_content is not None and message.server_content.turn_complete:
+                return
+
+    async def close(self):
+        if self._end_of_speech is not None:
+            self._end_of_speech.cancel()
+        if self._reply_task is not None:
+            self._reply_task.cancel()
+            await asyncio.gather(self._reply_task, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "turns": self.turns,
+            "audio_in_bytes": self.audio_in_bytes,
+            "images_in": self.images_in,
+            "texts_in": self.texts_in,
+            "tool_responses": self.tool_responses,
+        }
+
+
+class FakeLive:
+    def __init__(self, **options):
+        self.options = options
+        self.sessions = []
+
+    @asynccontextmanager
+    async def connect(self, model=None, config=None):
+        session = FakeLiveSession(config, **self.options)
+        self.sessions.append(session)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+class FakeClient:
+    """Drop-in for genai.Client as far as live_api.py uses it (client.aio.live.connect)."""
+
+    def __init__(self, **options):
+        self.aio = SimpleNamespace(live=FakeLive(**options))
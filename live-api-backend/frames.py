@@ -0,0 +1,128 @@
+import io
+import logging
+import os
+
+import numpy as np
+from PIL import Image
+
+from metrics import metrics
+from render_pool import RenderPool, RenderPoolError
+
+logger = logging.getLogger(__name__)
+
+# Screen-share frame pipeline.
+# Frames arrive at full screen resolution. Each one is decoded, downscaled so its
+# longest side is at most SCREEN_MAX_SIZE, and reduced to a 32x32 grayscale block
+# signature. A frame whose blocks all differ from the last forwarded frame by less
+# than SCREEN_CHANGE_THRESHOLD (0-255) is not worth a round trip or model tokens and
+# is dropped; the rest are re-encoded as JPEG at SCREEN_JPEG_QUALITY. The work runs
+# in worker processes of its own pool (frame_pool), never on the event loop, so a
+# burst of chart renders cannot hold up screen frames or the other way round. A
+# session has at most one frame in flight (see inbound.py); when SCREEN_QUEUE_DEPTH
+# frames of all sessions are queued, new ones are dropped.
+
+SCREEN_MAX_SIZE = int(os.environ.get("SCREEN_MAX_SIZE", 1024))
+SCREEN_JPEG_QUALITY = int(os.environ.get("SCREEN_JPEG_QUALITY", 75))
+SCREEN_CHANGE_THRESHOLD = float(os.environ.get("SCREEN_CHANGE_THRESHOLD", 4))
+SCREEN_WORKERS = int(os.environ.get("SCREEN_WORKERS", 1))
+SCREEN_QUEUE_DEPTH = int(os.environ.get("SCREEN_QUEUE_DEPTH", 8))
+SIGNATURE_SIZE = (32, 32)
+
+
+def block_signature(image):
+    """Mean brightness of each cell of a 32x32 grid over the frame."""
+    return np.asarray(image.convert("L").resize(SIGNATURE_SIZE, Image.BOX), dtype=np.uint8)
+
+
+def frame_changed(signature, previous, threshold=SCREEN_CHANGE_THRESHOLD):
+    if previous is None or previous.shape != signature.shape:
+        return True
+    return int(np.abs(signature.astype(np.int16) - previous.astype(np.int16)).max()) >= threshold
+
+
+def process_frame(data, mime_type, previous=None, max_size=SCREEN_MAX_SIZE,
+                  quality=SCREEN_JPEG_QUALITY, threshold=SCREEN_CHANGE_THRESHOLD):
+    """Return (mime_type, data or None if unchanged, signature bytes) for one frame.
+
+    previous is the signature bytes of the last forwarded frame. Runs in a worker.
+    """
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", (max_size, max_size))  # JPEG: decode at a reduced scale when possible
+    image = image.convert("RGB")
+    resized = max(image.size) > max_size
+    if resized:
+        image.thumbnail((max_size, max_size), Image.BILINEAR)
+    signature = block_signature(image)
+    if previous is not None:
+        previous = np.frombuffer(previous, dtype=np.uint8).reshape(SIGNATURE_SIZE[::-1])
+    if not frame_changed(signature, previous, threshold):
+        return mime_type, None, None
+    if not resized and mime_type == "image/jpeg":
+        return mime_type, data, signature.tobytes()
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality, optimize=False)
+    return "image/jpeg", buf.getvalue(), signature.tobytes()
+
+
+def _warm_frame_worker():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(buf, format="PNG")
+    process_frame(buf.getvalue(), "image/png", max_size=32)
+
+
+frame_pool = RenderPool(SCREEN_WORKERS, SCREEN_QUEUE_DEPTH, initializer=_warm_frame_worker)
+metrics.gauge("live_frame_pending", "Screen frames queued or being processed in the frame pool.",
+              function=lambda: frame_pool.pending)
+
+
+class FrameFilter:
+    """Per-connection stage that downscales frames and drops ones that did not change."""
+
+    def __init__(self, pool=frame_pool, **options):
+        self.pool = pool
+        self.options = options
+        self._previous = None
+        self.frames_in = 0
+        self.frames_unchanged = 0
+        self.frames_busy = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def __call__(self, mime_type, data):
+        """(mime_type, data) to forward, or None to drop the frame."""
+        self.frames_in += 1
+        self.bytes_in += len(data)
+        try:
+            mime_type, out, signature = await self.pool.submit(
+                process_frame, data, mime_type, self._previous, *self._args())
+        except RenderPoolError:
+            # Workers are saturated; the next frame will carry the same screen.
+            self.frames_busy += 1
+            return None
+        except Exception as e:
+            logger.warning("Error processing screen frame: %s", e)
+            out = data
+            signature = None
+        if out is None:
+            self.frames_unchanged += 1
+            return None
+        if signature is not None:
+            self._previous = signature
+        self.bytes_out += len(out)
+        return mime_type, out
+
+    def _args(self):
+        return (
+            self.options.get("max_size", SCREEN_MAX_SIZE),
+            self.options.get("quality", SCREEN_JPEG_QUALITY),
+            self.options.get("threshold", SCREEN_CHANGE_THRESHOLD),
+        )
+
+    def stats(self):
+        return {
+            "frames_in": self.frames_in,
+            "frames_unchanged": self.frames_unchanged,
+            "frames_busy": self.frames_busy,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
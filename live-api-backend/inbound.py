@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import os
+import time
+
+from metrics import INBOUND_BUFFERED
+
+# Ingestion stage between the client WebSocket and session.send().
+# Microphone PCM is collected into frames of INBOUND_AUDIO_FRAME_MS instead of one
+# upstream message per browser chunk. Screen-share images are sent at most
+# INBOUND_IMAGE_FPS times a second: a newer frame replaces one still waiting, a
+# frame identical to the last one sent is dropped, and an optional image filter
+# (frames.py) downscales the rest and drops those that barely changed. A sender task
+# talks to Gemini (images are filtered and sent beside it, one at a time, so they
+# never hold up audio); if it falls INBOUND_MAX_BUFFER_MS of audio behind,
+# put_audio() waits, which stops reading the WebSocket and pushes back on the browser.
+
+INBOUND_AUDIO_FRAME_MS = float(os.environ.get("INBOUND_AUDIO_FRAME_MS", 100))
+INBOUND_IMAGE_FPS = float(os.environ.get("INBOUND_IMAGE_FPS", 1.0))
+INBOUND_MAX_BUFFER_MS = float(os.environ.get("INBOUND_MAX_BUFFER_MS", 1000))
+# Gemini Live expects 16-bit mono PCM at 16kHz from the client.
+INPUT_SAMPLE_RATE = 16000
+INPUT_SAMPLE_WIDTH = 2
+
+
+def _ms_to_bytes(ms, sample_rate):
+    return int(sample_rate * ms / 1000) * INPUT_SAMPLE_WIDTH
+
+
+class InboundShaper:
+    def __init__(self, send, audio_frame_ms=INBOUND_AUDIO_FRAME_MS, image_fps=INBOUND_IMAGE_FPS,
+                 max_buffer_ms=INBOUND_MAX_BUFFER_MS, sample_rate=INPUT_SAMPLE_RATE, image_filter=None,
+                 clock=time.monotonic, metrics=None):
+        # send(mime_type, data) -> awaitable, e.g. a wrapper around session.send
+        self._send = send
+        # metrics.forwarded(kind, arrived_at) is called once a frame has been sent,
+        # e.g. metrics.SessionMetrics (arrival times come from clock)
+        self.metrics = metrics
+        # image_filter(mime_type, data) -> awaitable (mime_type, data) or None to drop,
+        # e.g. frames.FrameFilter
+        self.image_filter = image_filter
+        self.audio_frame_s = audio_frame_ms / 1000
+        self.frame_bytes = _ms_to_bytes(audio_frame_ms, sample_rate)
+        self.max_buffer_bytes = max(_ms_to_bytes(max_buffer_ms, sample_rate), self.frame_bytes)
+        self.image_interval = 1 / image_fps if image_fps > 0 else 0
+        self.clock = clock
+        self._audio = bytearray()
+        self._audio_mime = "audio/pcm"
+        self._audio_since = None
+        self._image = None
+        self._image_at = None
+        self._last_image_digest = None
+        self._next_image_at = 0.0
+        self._wake = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._closing = False
+        self._task = None
+        self._image_task = None
+        self.error = None
+        self.audio_chunks_in = 0
+        self.audio_frames_out = 0
+        self.images_in = 0
+        self.images_sent = 0
+        self.images_replaced = 0
+        self.images_duplicate = 0
+        self.backpressure_waits = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    # --- Producers ---
+    async def put_audio(self, pcm, mime_type="audio/pcm"):
+        self._check()
+        if len(self._audio) >= self.max_buffer_bytes:
+            self.backpressure_waits += 1
+            self._drained.clear()
+            await self._drained.wait()
+            self._check()
+        if not self._audio:
+            self._audio_since = self.clock()
+        self._audio_mime = mime_type
+        self._audio.extend(pcm)
+        INBOUND_BUFFERED.inc(len(pcm))
+        self.audio_chunks_in += 1
+        # Wake the sender when a frame is full, or on a frame's first chunk (a new deadline).
+        if len(self._audio) >= self.frame_bytes or len(self._audio) == len(pcm):
+            self._wake.set()
+
+    def put_image(self, mime_type, data):
+        self._check()
+        self.images_in += 1
+        if self._image is not None:
+            self.images_replaced += 1
+        self._image = (mime_type, data)
+        self._image_at = self.clock()
+        self._wake.set()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    # --- Sender ---
+    def _deadline(self):
+        deadlines = []
+        if self._audio:
+            deadlines.append(self._audio_since + self.audio_frame_s)
+        if self._image is not None and self._image_task is None:
+            deadlines.append(self._next_image_at)
+        return min(deadlines) if deadlines else None
+
+    async def _run(self):
+        try:
+            while True:
+                deadline = self._deadline()
+                if deadline is None and self._closing:
+                    return
+                now = self.clock()
+                if deadline is None or deadline > now and len(self._audio) < self.frame_bytes and not self._closing:
+                    self._wake.clear()
+                    timeout = None if deadline is None else deadline - now
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._send_due(now)
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error):
+        # The WebSocket reader sees the failure on its next put.
+        self.error = error
+        self._drained.set()
+
+    async def _send_due(self, now):
+        if self._audio and (len(self._audio) >= self.frame_bytes or now >= self._audio_since + self.audio_frame_s
+                            or self._closing):
+            frame = bytes(self._audio[:self.frame_bytes])
+            del self._audio[:self.frame_bytes]
+            INBOUND_BUFFERED.dec(len(frame))
+            arrived_at, self._audio_since = self._audio_since, now
+            if len(self._audio) < self.max_buffer_bytes:
+                self._drained.set()
+            self.audio_frames_out += 1
+            await self._send(self._audio_mime, frame)
+            if self.metrics is not None:
+                self.metrics.forwarded("audio", arrived_at)
+        if self._image is not None and self._image_task is None and (now >= self._next_image_at or self._closing):
+            (mime_type, data), self._image = self._image, None
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            if digest == self._last_image_digest:
+                self.images_duplicate += 1
+                return
+            self._last_image_digest = digest
+            self._next_image_at = now + self.image_interval
+            self._image_task = asyncio.create_task(self._send_image(mime_type, data, self._image_at))
+
+    async def _send_image(self, mime_type, data, arrived_at):
+        try:
+            if self.image_filter is not None:
+                filtered = await self.image_filter(mime_type, data)
+                if filtered is None:
+                    self.images_duplicate += 1
+                    return
+                mime_type, data = filtered
+            self.images_sent += 1
+            await self._send(mime_type, data)
+            if self.metrics is not None:
+                self.metrics.forwarded("image", arrived_at)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._image_task = None
+            self._wake.set()
+
+    def stats(self):
+        return {
+            "audio_chunks_in": self.audio_chunks_in,
+            "audio_frames_out": self.audio_frames_out,
+            "images_in": self.images_in,
+            "images_sent": self.images_sent,
+            "images_replaced": self.images_replaced,
+            "images_duplicate": self.images_duplicate,
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+    async def close(self, timeout=1.0):
+        """Send whatever is buffered (for up to timeout seconds), then stop the sender."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+            if self._image_task is not None:
+                await asyncio.wait_for(self._image_task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task = None
+        # Whatever could not be sent in time is dropped.
+        INBOUND_BUFFERED.dec(len(self._audio))
+        self._audio.clear()
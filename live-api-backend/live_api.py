@@ -1,194 +1,145 @@
 import asyncio
+import importlib
 import json
+import logging
 import os
+import sys
+import time
 import uuid
-from google import genai
+from http import HTTPStatus
 import base64
-from google.genai import types
-from google.genai.types import Content, Part, Tool, FunctionDeclaration, FunctionResponse
-import requests
 
 from websockets.server import WebSocketServerProtocol
 import websockets
-import io
-from pydub import AudioSegment
-import datetime
 from dotenv import load_dotenv
-import re
-import ast
-from wordcloud import WordCloud
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+
+from render_pool import render_pool
+from protocol import PROTOCOL_BINARY, wants_binary, decode_media_frame
+from outbound import OutboundQueue
+from audio_egress import AUDIO_OPUS, AUDIO_PCM, OPUS_MIME_TYPE, start_opus_encoder, wants_opus
+from inbound import InboundShaper
+from word_counts import ConversationCloud
+from event_log import EVENT_LOG_REPLAY_SECONDS, event_logs, replay_conversation
+from tools import registry, ToolContext
+from weather_client import weather_client
 
 # --- Memory module import ---
-from memory import enable_memory, disable_memory, clear_memory, get_memory_status, set_preference, get_preference
+from memory import enable_memory, disable_memory, clear_memory, get_memory_status, set_preference, get_preference, close_store, \
+    is_memory_enabled, remember, forget, recall
+from memory import MEMORY_BACKEND, RECALL_SECTIONS
+from memory_sqlite import namespace_for
+from session_store import session_handles
+from workers import LIVE_API_WORKERS, drain, install_stop_handlers, run_workers
+from metrics import metrics, SessionMetrics
+import logs
 
 load_dotenv()
+logger = logging.getLogger("live_api")
 
-# Load API key from environment
-
-gemini_api_key = os.environ['GOOGLE_API_KEY']
 MODEL = "gemini-2.0-flash-live-001"  # For multimodal
-client = genai.Client(
-    http_options={
-        'api_version': 'v1alpha',
-    }
-)
-
-# Load previous session handle from a file
-# You must delete the session_handle.json file to start a new session when last session was
-# finished for a while.
-
-
-def load_previous_session_handle():
+LIVE_API_HOST = os.environ.get("LIVE_API_HOST", "0.0.0.0")
+LIVE_API_PORT = int(os.environ.get("LIVE_API_PORT", 9084))
+# Scripted offline sessions for load and regression tests (see fake_gemini.py).
+FAKE_GEMINI = os.environ.get("FAKE_GEMINI") == "1"
+if not FAKE_GEMINI:
+    # Load API key from environment
+    gemini_api_key = os.environ['GOOGLE_API_KEY']
+
+# Startup: google.genai, matplotlib, wordcloud and NumPy take about a second to import,
+# so nothing heavy is imported here. The Gemini client is created on first use and tool
+# modules import their libraries when first called. Once the server is accepting
+# connections, prewarm() loads all of it in the background (LIVE_API_PREWARM=0 turns
+# that off, e.g. for short-lived test servers).
+LIVE_API_PREWARM = os.environ.get("LIVE_API_PREWARM", "1") == "1"
+PREWARM_MODULES = ["google.genai", "google.genai.types", "frames"]
+client = None
+
+
+def get_client():
+    global client
+    if client is None:
+        if FAKE_GEMINI:
+            from fake_gemini import FakeClient
+            client = FakeClient()
+        else:
+            from google import genai
+            client = genai.Client(
+                http_options={
+                    'api_version': 'v1alpha',
+                }
+            )
+    return client
+
+
+async def prewarm():
+    started = time.perf_counter()
+    render_pool.start()
     try:
-        with open('session_handle.json', 'r') as f:
-            data = json.load(f)
-            print(
-                f"Loaded previous session handle: {data.get('previous_session_handle', None)}")
-            return data.get('previous_session_handle', None)
-    except FileNotFoundError:
-        return None
+        for module in PREWARM_MODULES:
+            await asyncio.to_thread(importlib.import_module, module)
+        sys.modules["frames"].frame_pool.start()
+        await asyncio.to_thread(get_client)
+        await registry.load_all()
+    except Exception as e:
+        logger.warning("Prewarm failed: %s", e)
+        return
+    logger.info("Prewarmed in %.0f ms", (time.perf_counter() - started) * 1000)
 
-# Save previous session handle to a file
+# Session-resumption handles are kept per client, expire after SESSION_HANDLE_TTL and are
+# persisted in the background to a SQLite store shared by all workers (see session_store.py).
 
 
-def save_previous_session_handle(handle):
-    with open('session_handle.json', 'w') as f:
-        json.dump({'previous_session_handle': handle}, f)
+def load_previous_session_handle(client_id):
+    handle = session_handles.get(client_id)
+    logger.info("Loaded previous session handle for %s: %s", client_id, handle)
+    return handle
 
-def clear_stale_session_handle():
-    """Remove any stored session handle so that a fresh session can be started on the next connection."""
-    try:
-        os.remove('session_handle.json')
-    except FileNotFoundError:
-        pass
-    global previous_session_handle
-    previous_session_handle = None
-
-previous_session_handle = load_previous_session_handle()
-
-# --- Tool: Current Time ---
-def current_time_tool():
-    now = datetime.datetime.now()
-    return now.strftime('%Y-%m-%d %I:%M:%S %p')
-
-# Define Gemini tool for current time
-time_tool = Tool(
-    function_declarations=[
-        FunctionDeclaration(
-            name="current_time",
-            description="Returns the current date and time.",
-            parameters={}  # Use empty dict if SchemaType is not available
-        )
-    ]
-)
 
-# --- Tool: Weather Information ---
-OPENWEATHER_API_KEY = "e26b55f010b0d7ed5529668276e57d20"
-DEFAULT_WEATHER_CITY = "London"
-
-def weather_info_tool(city=DEFAULT_WEATHER_CITY):
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
-    try:
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        if response.status_code != 200 or "weather" not in data:
-            return f"Could not fetch weather data for {city}."
-        desc = data["weather"][0]["description"].capitalize()
-        temp = data["main"]["temp"]
-        feels_like = data["main"]["feels_like"]
-        humidity = data["main"]["humidity"]
-        return f"Weather in {city}: {desc}, Temp: {temp}°C (feels like {feels_like}°C), Humidity: {humidity}%"
-    except Exception as e:
-        return f"Error fetching weather: {e}"
+def save_previous_session_handle(client_id, handle):
+    session_handles.set(client_id, handle)
 
-# --- Tool: Calculator ---
-def calculator_tool(expr):
-    try:
-        # Parse the expression safely
-        node = ast.parse(expr, mode='eval')
-        allowed_nodes = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Load, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd)
-        for n in ast.walk(node):
-            if not isinstance(n, allowed_nodes):
-                return "Invalid or unsafe expression."
-        result = eval(compile(node, '<string>', 'eval'))
-        return f"Result: {result}"
-    except Exception as e:
-        return f"Error evaluating expression: {e}"
+def clear_stale_session_handle(client_id):
+    """Remove the client's stored session handle so that a fresh session is started on its next connection."""
+    session_handles.clear(client_id)
 
-# --- Tool: Word Cloud Generator ---
-def wordcloud_tool(text):
-    try:
-        wc = WordCloud(width=400, height=200, background_color="white").generate(text)
-        buf = io.BytesIO()
-        plt.figure(figsize=(4,2))
-        plt.imshow(wc, interpolation="bilinear")
-        plt.axis("off")
-        plt.tight_layout(pad=0)
-        plt.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
-        plt.close()
-        buf.seek(0)
-        img_bytes = buf.read()
-        base64_img = base64.b64encode(img_bytes).decode("utf-8")
-        return base64_img
-    except Exception as e:
-        return None
+# --- Tools: see tools/ for the registry, triggers and handlers ---
+# Every registered tool is declared to Gemini (registry.gemini_tool()) and answered
+# from response.tool_call.
 
-def _chart_encode(fig):
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png", bbox_inches="tight", pad_inches=0)
-    plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode("utf-8")
+def recall_if_enabled(text, namespace):
+    # Blocking (store and index); run it off the event loop.
+    return recall(text, None, namespace) if is_memory_enabled(namespace) else []
 
 
-def _parse_numbers(num_list):
-    try:
-        return [float(x) for x in num_list if x.strip() != ""]
-    except ValueError:
-        return []
-
-
-def barchart_tool(numbers):
-    import matplotlib.pyplot as plt
-    nums = _parse_numbers(numbers)
-    if not nums:
-        return None
-    fig, ax = plt.subplots(figsize=(4, 2))
-    ax.bar(range(1, len(nums) + 1), nums, color="#4f46e5")
-    ax.set_title("Bar Chart")
-    return _chart_encode(fig)
-
-def linechart_tool(numbers):
-    import matplotlib.pyplot as plt
-    nums = _parse_numbers(numbers)
-    if not nums:
-        return None
-    fig, ax = plt.subplots(figsize=(4, 2))
-    ax.plot(range(1, len(nums) + 1), nums, marker="o", color="#059669")
-    ax.set_title("Line Chart")
-    return _chart_encode(fig)
-
-def piechart_tool(numbers):
-    import matplotlib.pyplot as plt
-    nums = _parse_numbers(numbers)
-    if not nums:
-        return None
-    fig, ax = plt.subplots(figsize=(4, 2))
-    ax.pie(nums, labels=[str(i + 1) for i in range(len(nums))], autopct="%1.1f%%")
-    ax.set_title("Pie Chart")
-    return _chart_encode(fig)
+def format_memories(memories):
+    lines = "\n".join(f"- {m['key']}: {m['value']}" for m in memories)
+    return f"Relevant things you remember about the user:\n{lines}"
 
 async def gemini_session_handler(websocket: WebSocketServerProtocol):
-    print(f"Starting Gemini session")
+    logger.info("Starting Gemini session")
     try:
         config_message = await websocket.recv()
-        # config_data = json.loads(config_message)
-        # print(f"Config data: {config_data}")
-
+        try:
+            config_data = json.loads(config_message)
+        except (TypeError, ValueError):
+            config_data = None
+        # Clients that ask for it get audio and images as binary frames (see protocol.py).
+        binary = wants_binary(config_data)
+        if binary:
+            await websocket.send(json.dumps({"protocol": PROTOCOL_BINARY}))
+        # Memory is kept per user (and optionally per session) when the client identifies itself.
+        setup = config_data if isinstance(config_data, dict) else {}
+        namespace = namespace_for(setup.get("user_id"), setup.get("memory_session_id"))
+        # Gemini sessions are resumed per client; a client without an id gets one to reuse on reconnect.
+        client_id = setup.get("client_id") or setup.get("user_id")
+        if not client_id:
+            client_id = uuid.uuid4().hex
+            await websocket.send(json.dumps({"client_id": client_id}))
+        previous_session_handle = await asyncio.to_thread(load_previous_session_handle, client_id)
+
+        from google.genai import types
+        from google.genai.types import Content, Part
+        from frames import FrameFilter
         config = types.LiveConnectConfig(
             response_modalities=[types.Modality.AUDIO],
             speech_config=types.SpeechConfig(
@@ -206,30 +157,68 @@ async def gemini_session_handler(websocket: WebSocketServerProtocol):
                 handle=previous_session_handle
             ),
             output_audio_transcription=types.AudioTranscriptionConfig(),
-            tools=[time_tool],  # Register the tool here
+            tools=[registry.gemini_tool()],
         )
 
-        async with client.aio.live.connect(model=MODEL, config=config) as session:
+        async with get_client().aio.live.connect(model=MODEL, config=config) as session:
             # print(f"Connected to Gemini API with handle: {previous_session_handle}")
 
+            # Latency histograms for this session, also exported at /metrics (see metrics.py).
+            session_metrics = SessionMetrics()
+            # Word counts of everything said, updated per transcription fragment (see word_counts.py)
+            conversation = ConversationCloud()
+            tool_ctx = ToolContext(websocket, binary, namespace, conversation)
+            # While memory is enabled, everything said and every tool call is appended to
+            # the client's event log, which is compacted into context memory (see
+            # event_log.py). A resumed session picks up its conversation word counts from the log.
+            event_log = event_logs.open(client_id, namespace)
+            if previous_session_handle:
+                await asyncio.to_thread(replay_conversation, event_log.directory, conversation,
+                                        time.time() - EVENT_LOG_REPLAY_SECONDS, namespace)
+
+            def said(speaker, text, finished):
+                conversation.add(speaker, text, finished)
+                if text:
+                    event_log.append("transcription", speaker=speaker, text=text, finished=finished)
+            # Clients that ask for it get reply audio as a WebM/Opus stream (see audio_egress.py).
+            encoder = None
+            if wants_opus(config_data):
+                encoder = await start_opus_encoder(websocket, binary)
+                if encoder:
+                    await websocket.send(json.dumps({"audio_format": AUDIO_OPUS, "mime_type": OPUS_MIME_TYPE}))
+                else:
+                    await websocket.send(json.dumps({"audio_format": AUDIO_PCM}))
+            # Everything Gemini produces goes through a bounded writer task (see outbound.py).
+            outbound = OutboundQueue(websocket, binary, encoder=encoder).start()
+
+            # Client media reaches Gemini batched and rate-limited (see inbound.py).
+            async def send_media(mime_type, payload):
+                await session.send(input={"mime_type": mime_type, "data": payload})  # type: ignore
+            frame_filter = FrameFilter()
+            inbound = InboundShaper(send_media, image_filter=frame_filter, metrics=session_metrics).start()
+
+            async def forward_media(mime_type, payload):
+                if mime_type.startswith("image/"):
+                    inbound.put_image(mime_type, payload)
+                else:
+                    await inbound.put_audio(payload, mime_type)
+
             async def send_to_gemini():
                 try:
                     async for message in websocket:
+                        arrived_at = time.monotonic()
                         try:
+                            if isinstance(message, bytes):
+                                mime_type, payload = decode_media_frame(message)
+                                await forward_media(mime_type, payload)
+                                continue
+
                             data = json.loads(message)
 
                             if "realtime_input" in data:
                                 for chunk in data["realtime_input"]["media_chunks"]:
-                                    if chunk["mime_type"] == "audio/pcm":
-                                        await session.send(input={  # type: ignore
-                                            "mime_type": "audio/pcm",
-                                            "data": chunk["data"]
-                                        })
-                                    elif chunk["mime_type"].startswith("image/"):
-                                        await session.send(input={  # type: ignore
-                                            "mime_type": chunk["mime_type"],
-                                            "data": chunk["data"]
-                                        })
+                                    if chunk["mime_type"] == "audio/pcm" or chunk["mime_type"].startswith("image/"):
+                                        await forward_media(chunk["mime_type"], base64.b64decode(chunk["data"]))
 
                             elif "text" in data:
                                 text_content = data["text"].lower()
@@ -237,198 +226,134 @@ async def gemini_session_handler(websocket: WebSocketServerProtocol):
                                 if "memory" in data:
                                     mem_cmd = data["memory"]
                                     if mem_cmd == "enable":
-                                        mem = enable_memory()
+                                        mem = await asyncio.to_thread(enable_memory, namespace)
                                         await websocket.send(json.dumps({"memory_status": "enabled", "memory": mem}))
                                     elif mem_cmd == "disable":
-                                        mem = disable_memory()
+                                        mem = await asyncio.to_thread(disable_memory, namespace)
                                         await websocket.send(json.dumps({"memory_status": "disabled", "memory": mem}))
                                     elif mem_cmd == "clear":
-                                        mem = clear_memory()
+                                        mem = await asyncio.to_thread(clear_memory, namespace)
+                                        await asyncio.to_thread(event_logs.clear, event_log)
                                         await websocket.send(json.dumps({"memory_status": "cleared", "memory": mem}))
                                     elif mem_cmd == "status":
-                                        mem = get_memory_status()
+                                        mem = await asyncio.to_thread(get_memory_status, namespace)
                                         await websocket.send(json.dumps({"memory_status": mem}))
                                     elif mem_cmd == "set_preference":
                                         key = data.get("key")
                                         value = data.get("value")
                                         if key is not None:
-                                            mem = set_preference(key, value)
+                                            mem = await asyncio.to_thread(set_preference, key, value, namespace)
                                             await websocket.send(json.dumps({"memory_status": f"preference set: {key}={value}", "memory": mem}))
                                     elif mem_cmd == "get_preference":
                                         key = data.get("key")
-                                        value = get_preference(key)
+                                        value = await asyncio.to_thread(get_preference, key, namespace)
                                         await websocket.send(json.dumps({"memory_value": value}))
+                                    elif mem_cmd in ("remember", "forget"):
+                                        key = data.get("key")
+                                        section = data.get("section", "knowledge")
+                                        if section not in RECALL_SECTIONS:
+                                            await websocket.send(json.dumps({"memory_status": f"error: unknown section {section!r}"}))
+                                        elif key is None:
+                                            await websocket.send(json.dumps({"memory_status": f"error: {mem_cmd} needs a key"}))
+                                        elif mem_cmd == "remember":
+                                            await asyncio.to_thread(remember, section, key, data.get("value"), namespace)
+                                            await websocket.send(json.dumps({"memory_status": f"remembered: {key}"}))
+                                        else:
+                                            await asyncio.to_thread(forget, section, key, namespace)
+                                            await websocket.send(json.dumps({"memory_status": f"forgot: {key}"}))
+                                    elif mem_cmd == "recall":
+                                        memories = await asyncio.to_thread(recall, data.get("query", data["text"]), data.get("k"), namespace)
+                                        await websocket.send(json.dumps({"memory_recall": memories}))
                                     continue  # Prevent sending to Gemini
                                 # --- End memory management logic ---
-                                # Manual tool interception for 'time', 'weather', 'calculator', carousel, and button control
-                                if "time" in text_content:
-                                    print(f"Manual tool logic triggered for message: {text_content}")
-                                    tool_result = current_time_tool()
-                                    await websocket.send(json.dumps({
-                                        "text": f"The current time is: {tool_result}"
-                                    }))
+                                # Manual tool interception: one pass through the tool registry's trigger matcher
+                                if await registry.dispatch(tool_ctx, text_content):
                                     continue  # Prevent sending to Gemini
-                                elif (match := re.search(r"weather(?: in ([a-zA-Z\s]+))?", text_content)):
-                                    print(f"Manual tool logic triggered for weather: {text_content}")
-                                    # Try to extract city from message, e.g., 'weather in Paris'
-                                    city = DEFAULT_WEATHER_CITY
-                                    if match.group(1):
-                                        city = match.group(1).strip().title()
-                                    tool_result = weather_info_tool(city)
-                                    await websocket.send(json.dumps({
-                                        "text": tool_result
-                                    }))
-                                    continue  # Prevent sending to Gemini
-                                elif "calculate" in text_content or re.search(r"^\s*\d+[\d\s\+\-\*\/\(\)\.]*$", text_content):
-                                    print(f"Manual tool logic triggered for calculator: {text_content}")
-                                    # Extract the expression after 'calculate' or use the whole message if it looks like math
-                                    expr = text_content
-                                    if (calc_match := re.search(r"calculate (.+)", text_content)):
-                                        expr = calc_match.group(1)
-                                    tool_result = calculator_tool(expr)
-                                    await websocket.send(json.dumps({
-                                        "text": tool_result
-                                    }))
-                                    continue  # Prevent sending to Gemini
-                                elif any(word in text_content for word in ["next", "go to next", "forward"]):
-                                    print(f"Manual tool logic triggered for carousel NEXT: {text_content}")
-                                    await websocket.send(json.dumps({"carousel": "next"}))
-                                    continue  # Prevent sending to Gemini
-                                elif any(word in text_content for word in ["previous", "prev", "go to previous", "back"]):
-                                    print(f"Manual tool logic triggered for carousel PREV: {text_content}")
-                                    await websocket.send(json.dumps({"carousel": "prev"}))
-                                    continue  # Prevent sending to Gemini
-                                # Button control logic
-                                elif (match := re.search(r"turn (on|off) (light 1|light 2|fan)", text_content)):
-                                    state = match.group(1)
-                                    name = match.group(2).title()
-                                    print(f"Manual tool logic triggered for button: {name} {state}")
-                                    await websocket.send(json.dumps({"button": {"name": name, "state": state}}))
-                                    continue  # Prevent sending to Gemini
-                                # Word cloud tool logic
-                                elif "word cloud" in text_content:
-                                    print(f"Manual tool logic triggered for word cloud: {text_content}")
-                                    # Extract text after 'word cloud' or 'generate word cloud'
-                                    wc_text = text_content
-                                    if (wc_match := re.search(r"(?:word cloud|generate word cloud)(?: for|:)?\s*(.*)", text_content)):
-                                        if wc_match.group(1):
-                                            wc_text = wc_match.group(1)
-                                    
-                                    base64_img = wordcloud_tool(wc_text)
-                                    if base64_img:
-                                        await websocket.send(json.dumps({"wordcloud": base64_img}))
-                                    else:
-                                        await websocket.send(json.dumps({"text": "Failed to generate word cloud."}))
-                                    continue  # Prevent sending to Gemini
-                                # Bar chart tool logic
-                                elif "bar chart" in text_content:
-                                    print(f"Manual tool logic triggered for bar chart: {text_content}")
-                                    nums = []
-                                    if (nums_match := re.search(r"bar chart[:\s]+([\d,\s\.]+)", text_content)):
-                                        if nums_match.group(1):
-                                            nums = nums_match.group(1).replace(' ', '').split(',')
-                                    base64_img = barchart_tool(nums)
-                                    if base64_img:
-                                        await websocket.send(json.dumps({"barchart": base64_img}))
-                                    else:
-                                        await websocket.send(json.dumps({"text": "Failed to generate bar chart."}))
-                                    continue  # Prevent sending to Gemini
-                                # Line chart tool logic
-                                elif "line chart" in text_content:
-                                    print(f"Manual tool logic triggered for line chart: {text_content}")
-                                    nums = []
-                                    if (nums_match := re.search(r"line chart[:\s]+([\d,\s\.]+)", text_content)):
-                                        if nums_match.group(1):
-                                            nums = nums_match.group(1).replace(' ', '').split(',')
-                                    base64_img = linechart_tool(nums)
-                                    if base64_img:
-                                        await websocket.send(json.dumps({"linechart": base64_img}))
-                                    else:
-                                        await websocket.send(json.dumps({"text": "Failed to generate line chart."}))
-                                    continue  # Prevent sending to Gemini
-                                # Pie chart tool logic
-                                elif "pie chart" in text_content:
-                                    print(f"Manual tool logic triggered for pie chart: {text_content}")
-                                    nums = []
-                                    if (nums_match := re.search(r"pie chart[:\s]+([\d,\s\.]+)", text_content)):
-                                        if nums_match.group(1):
-                                            nums = nums_match.group(1).replace(' ', '').split(',')
-                                    base64_img = piechart_tool(nums)
-                                    if base64_img:
-                                        await websocket.send(json.dumps({"piechart": base64_img}))
-                                    else:
-                                        await websocket.send(json.dumps({"text": "Failed to generate pie chart."}))
-                                    continue  # Prevent sending to Gemini
-                                else:
-                                    await session.send_client_content(
-                                        turns=Content(role="user", parts=[Part(text=data["text"])])
-                                    )
+                                conversation.add("User", data["text"], finished=True)
+                                event_log.append("text", speaker="User", text=data["text"])
+                                parts = [Part(text=data["text"])]
+                                # Only the few memories relevant to this turn go into the context.
+                                memories = await asyncio.to_thread(recall_if_enabled, data["text"], namespace)
+                                if memories:
+                                    parts.insert(0, Part(text=format_memories(memories)))
+                                await session.send_client_content(
+                                    turns=Content(role="user", parts=parts)
+                                )
+                                session_metrics.forwarded("text", arrived_at)
                         except Exception as e:
-                            print(f"Error sending to Gemini: {e}")
-                    print("Client connection closed (send)")
+                            logger.warning("Error sending to Gemini: %s", e)
+                    logger.info("Client connection closed (send)")
                 except Exception as e:
-                    print(f"Error sending to Gemini: {e}")
+                    logger.warning("Error sending to Gemini: %s", e)
                 finally:
-                    print("send_to_gemini closed")
+                    await inbound.close()
+                    logger.info("Inbound shaper stats: %s, screen frames: %s", inbound.stats(), frame_filter.stats())
+
+            # Gemini's function calls run in their own task so the receive loop keeps
+            # going (and can see a cancellation); all calls of a message run concurrently
+            # and are answered in one batch (see ToolRegistry.call).
+            tool_tasks = {}
+
+            async def answer_tool_calls(calls):
+                try:
+                    for call in calls:
+                        event_log.append("tool_call", id=call.id, name=call.name, args=call.args)
+                    function_responses = await registry.call(tool_ctx, calls)
+                    for response in function_responses:
+                        event_log.append("tool_result", id=response.id, name=response.name, response=response.response)
+                    await session.send_tool_response(function_responses=function_responses)
+                except Exception as e:
+                    logger.warning("Error answering tool calls: %s", e)
 
             async def receive_from_gemini():
                 try:
                     while True:
                         try:
-                            print("receiving from gemini")
+                            logger.debug("Receiving from Gemini")
                             async for response in session.receive():
-                                print(f"GEMINI RAW RESPONSE: {response}")
+                                # Formatting a response with its audio payload is expensive: sampled, debug only.
+                                logs.sampled(logger, logging.DEBUG, "gemini-response", "Gemini response: %s", response)
                                 # --- Tool call handling ---
-                                tool_req = getattr(response, "tool_request", None)
-                                if tool_req:
-                                    if tool_req.name == "current_time":
-                                        tool_result = current_time_tool()
-                                        await session.send_tool_response(
-                                            function_responses=[
-                                                FunctionResponse(name="current_time", response={"result": tool_result})
-                                            ]
-                                        )
-                                        continue
+                                if response.tool_call and response.tool_call.function_calls:
+                                    calls = response.tool_call.function_calls
+                                    task = asyncio.create_task(answer_tool_calls(calls))
+                                    tool_tasks[task] = {call.id for call in calls}
+                                    task.add_done_callback(lambda t: tool_tasks.pop(t, None))
+                                    continue
+                                if response.tool_call_cancellation:
+                                    cancelled = set(response.tool_call_cancellation.ids or ())
+                                    for task, ids in list(tool_tasks.items()):
+                                        if ids & cancelled:
+                                            task.cancel()
+                                    continue
                                 # --- End tool call handling ---
 
                                 if response.server_content and hasattr(response.server_content, 'interrupted') and response.server_content.interrupted is not None:
-                                    print(
-                                        f"[{datetime.datetime.now()}] Generation interrupted")
-                                    await websocket.send(json.dumps({"interrupted": "True"}))
+                                    logger.debug("Generation interrupted")
+                                    outbound.put_json({"interrupted": "True"}, interrupt=True)
+                                    outbound.end_audio()
                                     continue
 
                                 if response.usage_metadata:
                                     usage = response.usage_metadata
-                                    print(
-                                        f'Used {usage.total_token_count} tokens in total.'
-                                    )
+                                    session_metrics.usage(usage)
+                                    logger.debug("Used %s tokens in total.", usage.total_token_count)
 
                                 if response.session_resumption_update:
                                     update = response.session_resumption_update
                                     if update.resumable and update.new_handle:
                                         # The handle should be retained and linked to the session.
-                                        previous_session_handle = update.new_handle
-                                        save_previous_session_handle(
-                                            previous_session_handle)
-                                        print(
-                                            f"Resumed session update with handle: {previous_session_handle}")
+                                        save_previous_session_handle(client_id, update.new_handle)
+                                        logger.debug("Session resumption update with handle: %s", update.new_handle)
 
                                 if response.server_content and hasattr(response.server_content, 'output_transcription') and response.server_content.output_transcription is not None:
-                                    await websocket.send(json.dumps({
-                                        "transcription": {
-                                            "text": response.server_content.output_transcription.text,
-                                            "sender": "Gemini",
-                                            "finished": response.server_content.output_transcription.finished
-                                        }
-                                    }))
+                                    transcription = response.server_content.output_transcription
+                                    outbound.put_transcription("Gemini", transcription.text, transcription.finished)
+                                    said("Gemini", transcription.text, transcription.finished)
                                 if response.server_content and hasattr(response.server_content, 'input_transcription') and response.server_content.input_transcription is not None:
-                                    await websocket.send(json.dumps({
-                                        "transcription": {
-                                            "text": response.server_content.input_transcription.text,
-                                            "sender": "User",
-                                            "finished": response.server_content.input_transcription.finished
-                                        }
-                                    }))
+                                    transcription = response.server_content.input_transcription
+                                    outbound.put_transcription("User", transcription.text, transcription.finished)
+                                    said("User", transcription.text, transcription.finished)
 
                                 if response.server_content is None:
                                     continue
@@ -437,66 +362,109 @@ async def gemini_session_handler(websocket: WebSocketServerProtocol):
                                 if model_turn and model_turn.parts:
                                     for part in model_turn.parts:
                                         if hasattr(part, 'text') and part.text is not None:
-                                            await websocket.send(json.dumps({"text": part.text}))
+                                            outbound.put_json({"text": part.text})
 
                                         elif hasattr(part, 'inline_data') and part.inline_data and part.inline_data.data:
-                                            try:
-                                                audio_data = part.inline_data.data
-                                                base64_audio = base64.b64encode(
-                                                    audio_data).decode('utf-8')
-                                                await websocket.send(json.dumps({
-                                                    "audio": base64_audio,
-                                                }))
-                                                # print(f"Sent assistant audio to client: {base64_audio[:32]}...")
-                                            except Exception as e:
-                                                print(
-                                                    f"Error processing assistant audio: {e}")
+                                            session_metrics.reply_audio()
+                                            outbound.put_audio(part.inline_data.data)
 
                                 if response.server_content and response.server_content.turn_complete:
-                                    print('\n<Turn complete>')
-                                    await websocket.send(json.dumps({
-                                        "transcription": {
-                                            "text": "",
-                                            "sender": "Gemini",
-                                            "finished": True
-                                        }
-                                    }))
+                                    logger.debug("Turn complete")
+                                    outbound.end_audio()
+                                    outbound.put_transcription("Gemini", "", True)
+                                    said("Gemini", "", True)
+                                    event_log.append("turn_complete")
 
                         except websockets.exceptions.ConnectionClosedOK:
-                            print("Client connection closed normally (receive)")
+                            logger.info("Client connection closed normally (receive)")
                             break
                         except Exception as e:
-                            print(f"Error receiving from Gemini: {e}")
+                            logger.warning("Error receiving from Gemini: %s", e)
                             break
 
                 except Exception as e:
-                    print(f"Error receiving from Gemini: {e}")
+                    logger.warning("Error receiving from Gemini: %s", e)
                 finally:
-                    print("Gemini connection closed (receive)")
+                    logger.info("Gemini connection closed (receive)")
 
             # Start send and receive tasks
             send_task = asyncio.create_task(send_to_gemini())
             receive_task = asyncio.create_task(receive_from_gemini())
-            await asyncio.gather(send_task, receive_task)
+            try:
+                # Once the client is gone there is nobody to receive for, so stop the
+                # receive loop instead of leaving it waiting on Gemini.
+                await send_task
+            finally:
+                receive_task.cancel()
+                for task in list(tool_tasks):
+                    task.cancel()
+                await asyncio.gather(receive_task, *tool_tasks, return_exceptions=True)
+                await outbound.close()
+                session_metrics.close()
+                logger.info("Outbound queue stats: %s", outbound.stats())
+                logger.info("Session %s latency: %s", client_id, session_metrics.summary())
+                logger.info("Session %s words: %s, event log: %s", client_id, conversation.stats(), event_log.stats())
+                await asyncio.to_thread(event_logs.close, event_log)
 
     except Exception as e:
-        print(f"Error in Gemini session: {e}")
+        logger.warning("Error in Gemini session: %s", e)
     finally:
-        print("Gemini session closed.")
+        logger.info("Gemini session closed.")
 
 
-async def main() -> None:
-    # Use explicit IPv4 address and handle deprecation
+def process_request(connection, request):
+    # Plain HTTP GET /metrics on the WebSocket port serves the Prometheus text format.
+    if request.path == "/metrics":
+        return connection.respond(HTTPStatus.OK, metrics.render_text())
+    return None
+
+
+async def serve(reuse_port=False):
+    stop = asyncio.Event()
+    install_stop_handlers(stop)
     server = await websockets.serve(
         gemini_session_handler,
-        host="0.0.0.0",  # Explicitly use IPv4 localhost
-        port=9084,
-        compression=None  # Disable compression to avoid deprecation warning
+        host=LIVE_API_HOST,
+        port=LIVE_API_PORT,
+        compression=None,  # Disable compression to avoid deprecation warning
+        reuse_port=reuse_port,
+        process_request=process_request,
     )
 
-    print("Running websocket server on 0.0.0.0:9084...")
+    logger.info("Running websocket server on %s:%d", LIVE_API_HOST, LIVE_API_PORT)
     # print("Long memory tutoring assistant ready to help")
-    await asyncio.Future()  # Keep the server running indefinitely
+    prewarm_task = asyncio.create_task(prewarm()) if LIVE_API_PREWARM else None
+    try:
+        await stop.wait()
+        await drain(server)
+    finally:
+        if prewarm_task is not None:
+            prewarm_task.cancel()
+        render_pool.shutdown(wait=False)
+        if "frames" in sys.modules:
+            sys.modules["frames"].frame_pool.shutdown(wait=False)
+        event_logs.close_all()
+        close_store()
+        session_handles.close()
+        await weather_client.aclose()
+
+
+def run_worker(worker_id):
+    logs.configure()
+    logger.info("Worker %d starting", worker_id)
+    asyncio.run(serve(reuse_port=True))
+
+
+def main():
+    logs.configure()
+    if LIVE_API_WORKERS > 1:
+        if MEMORY_BACKEND == "json":
+            raise SystemExit("MEMORY_BACKEND=json keeps memory in one process; use sqlite with LIVE_API_WORKERS > 1")
+        # Each worker keeps its own recall indexes, rebuilt from the shared memory database.
+        os.environ["MEMORY_INDEX_IN_MEMORY"] = "1"
+        run_workers(run_worker, LIVE_API_WORKERS)
+    else:
+        asyncio.run(serve())
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
@@ -0,0 +1,234 @@
+"""Concurrent voice-session load test against live_api.py.
+
+    python loadtest.py --spawn [--sessions 200] [--seconds 30] [--ramp 10]
+
+    LIVE_API_WORKERS=4 python live_api.py &
+    python loadtest.py [--url ws://localhost:9084] [--sessions 200] [--seconds 30]
+
+Every simulated client opens a session with binary frames and talks in turns: it
+streams --utterance-ms of 16kHz PCM in 100ms chunks in real time (with screen-share
+JPEGs at --image-fps), then waits for the spoken reply; every --tool-every-th turn is
+a text tool intent instead. The report gives throughput, p50/p95/p99 of the reply
+latency (last audio chunk sent -> first reply audio frame), of tool replies and of
+the send lag, and the server's memory per session from /metrics.
+
+--spawn starts live_api.py with FAKE_GEMINI=1 (fake_gemini.py) on a free port, so
+nothing leaves the machine and no API key is needed; the fake's FAKE_FIRST_AUDIO_MS
+(default 300ms) is part of the reply latency. Against real Gemini the latencies
+include the model. With several workers /metrics is answered by one of them, so the
+memory figure is per worker.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+from PIL import Image
+
+from protocol import FRAME_AUDIO_PCM, FRAME_IMAGE_JPEG, PROTOCOL_BINARY, decode_frame, encode_frame
+
+CHUNK_MS = 100
+CHUNK = encode_frame(FRAME_AUDIO_PCM, b"\x00\x00" * (16000 * CHUNK_MS // 1000))
+TOOL_INTENTS = ["what time is it", "bar chart: 1,2,3,4", "line chart: 3,1,4,1,5"]
+
+
+def make_screen_frames(count=4, size=(1280, 720)):
+    """Distinct JPEG frames, so the server's duplicate-frame filter lets them through."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        blocks = rng.integers(0, 255, (size[1] // 16, size[0] // 16, 3), dtype=np.uint8)
+        out = io.BytesIO()
+        Image.fromarray(blocks).resize(size, Image.NEAREST).save(out, "JPEG", quality=80)
+        frames.append(encode_frame(FRAME_IMAGE_JPEG, out.getvalue()))
+    return frames
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {f"p{q}": round(values[min(len(values) - 1, int(len(values) * q / 100))] * 1e3, 1) for q in (50, 95, 99)}
+
+
+def scrape(metrics_url):
+    """{metric: value} for the unlabelled samples of a /metrics page, or {} if unreachable."""
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#") and "{" not in line:
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+async def client(index, url, args, results, screen_frames):
+    turn_done = asyncio.Event()
+    waiting = {"audio": None, "tool": None}
+
+    def reply_seen(kind, now):
+        if waiting[kind] is not None:
+            results["first_audio" if kind == "audio" else "tool"].append(now - waiting[kind])
+            waiting[kind] = None
+            if kind == "tool":
+                turn_done.set()
+
+    try:
+        async with websockets.connect(url, open_timeout=30, compression=None, max_size=None) as ws:
+            await ws.send(json.dumps({"protocol": PROTOCOL_BINARY, "client_id": f"loadtest-{index}"}))
+
+            async def read_replies():
+                async for message in ws:
+                    now = time.perf_counter()
+                    results["bytes_received"] += len(message)
+                    if isinstance(message, bytes):
+                        frame_type, _ = decode_frame(message)
+                        reply_seen("audio" if frame_type == FRAME_AUDIO_PCM else "tool", now)
+                        continue
+                    data = json.loads(message)
+                    transcription = data.get("transcription")
+                    if transcription:
+                        if transcription["sender"] == "Gemini" and transcription["finished"]:
+                            turn_done.set()
+                    elif "text" in data or "error" in data:
+                        reply_seen("tool", now)
+
+            reader = asyncio.create_task(read_replies())
+            start = time.perf_counter()
+            next_image = start
+            turn = 0
+            while time.perf_counter() - start < args.seconds:
+                turn += 1
+                turn_done.clear()
+                if args.tool_every and turn % args.tool_every == 0:
+                    waiting["tool"] = time.perf_counter()
+                    await ws.send(json.dumps({"text": TOOL_INTENTS[turn // args.tool_every % len(TOOL_INTENTS)]}))
+                else:
+                    chunk_start = time.perf_counter()
+                    for i in range(max(1, int(args.utterance_ms / CHUNK_MS))):
+                        due = chunk_start + i * CHUNK_MS / 1000
+                        await asyncio.sleep(max(0, due - time.perf_counter()))
+                        now = time.perf_counter()
+                        results["lag"].append(now - due)
+                        await ws.send(CHUNK)
+                        results["audio_chunks"] += 1
+                        if args.image_fps > 0 and now >= next_image:
+                            await ws.send(screen_frames[results["images"] % len(screen_frames)])
+                            results["images"] += 1
+                            next_image = now + 1 / args.image_fps
+                    waiting["audio"] = time.perf_counter()
+                try:
+                    await asyncio.wait_for(turn_done.wait(), args.reply_timeout)
+                    results["turns"] += 1
+                except asyncio.TimeoutError:
+                    results["timeouts"] += 1
+            reader.cancel()
+        results["held"] += 1
+    except Exception as e:
+        results["errors"][type(e).__name__] = results["errors"].get(type(e).__name__, 0) + 1
+
+
+async def run(args):
+    """Run the load test and return the report as a dict."""
+    metrics_url = args.url.replace("ws://", "http://", 1).replace("wss://", "https://", 1).rstrip("/") + "/metrics"
+    results = {"held": 0, "errors": {}, "lag": [], "first_audio": [], "tool": [], "turns": 0, "timeouts": 0,
+               "audio_chunks": 0, "images": 0, "bytes_received": 0}
+    screen_frames = make_screen_frames()
+    before = await asyncio.to_thread(scrape, metrics_url)
+    started = time.perf_counter()
+    tasks = []
+    for index in range(args.sessions):
+        tasks.append(asyncio.create_task(client(index, args.url, args, results, screen_frames)))
+        await asyncio.sleep(args.ramp / args.sessions)
+    # Every session is open now (for sessions shorter than the ramp, only some are).
+    during = await asyncio.to_thread(scrape, metrics_url)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "sessions_held": f"{results['held']}/{args.sessions}",
+        "errors": results["errors"] or "none",
+        "turns": results["turns"],
+        "reply_timeouts": results["timeouts"],
+        "turns_per_s": round(results["turns"] / elapsed, 1),
+        "audio_sent_s_per_s": round(results["audio_chunks"] * CHUNK_MS / 1000 / elapsed, 1),
+        "screen_frames_sent": results["images"],
+        "received_mb_per_s": round(results["bytes_received"] / elapsed / 1e6, 2),
+        "reply_first_audio_ms": percentiles(results["first_audio"]),
+        "tool_reply_ms": percentiles(results["tool"]),
+        "send_lag_ms": percentiles(results["lag"]),
+    }
+    rss = "process_resident_memory_bytes"
+    if rss in before and rss in during:
+        active = during.get("live_sessions_active") or args.sessions
+        report["server_sessions_active"] = int(active)
+        report["server_rss_mb"] = round(during[rss] / 1e6, 1)
+        report["server_kb_per_session"] = round((during[rss] - before[rss]) / active / 1e3, 1)
+    return report
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_fake_server(state_dir):
+    """Start live_api.py against fake Gemini on a free port. Returns (process, url)."""
+    port = _free_port()
+    env = dict(os.environ, FAKE_GEMINI="1", LIVE_API_HOST="127.0.0.1", LIVE_API_PORT=str(port),
+               LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"), DRAIN_TIMEOUT="1",
+               SESSION_DB=os.path.join(state_dir, "sessions.db"), MEMORY_DB=os.path.join(state_dir, "memory.db"),
+               EVENT_LOG_DIR=os.path.join(state_dir, "event_logs"))
+    process = subprocess.Popen([sys.executable, "live_api.py"], cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.monotonic() + 30
+    while not scrape(f"http://127.0.0.1:{port}/metrics"):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise SystemExit("live_api.py did not start")
+        time.sleep(0.2)
+    return process, f"ws://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:9084")
+    parser.add_argument("--spawn", action="store_true", help="start live_api.py with fake Gemini and test that")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which sessions are opened")
+    parser.add_argument("--utterance-ms", type=float, default=1000, help="audio per turn (match FAKE_UTTERANCE_MS)")
+    parser.add_argument("--image-fps", type=float, default=1.0, help="screen-share frames per second, 0 for none")
+    parser.add_argument("--tool-every", type=int, default=4, help="every Nth turn is a text tool intent, 0 for none")
+    parser.add_argument("--reply-timeout", type=float, default=15)
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory() as state_dir:
+        if args.spawn:
+            process, args.url = spawn_fake_server(state_dir)
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+    for key, value in report.items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import logging
+import os
+import threading
+
+# Levelled logging for the backend.
+# LOG_LEVEL picks the level (DEBUG shows per-message detail). Messages use %-style
+# arguments so nothing is formatted unless the record is emitted, and the hot-path
+# debug logs go through sampled(), which lets through one in every N calls per key.
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", 100))
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s[%(process)d] %(message)s"
+
+_sample_lock = threading.Lock()
+_sample_counts = {}
+
+
+def configure(level=LOG_LEVEL):
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    # websockets logs every /metrics scrape as a rejected connection at INFO.
+    if logging.getLogger().getEffectiveLevel() > logging.DEBUG:
+        logging.getLogger("websockets.server").setLevel(logging.WARNING)
+
+
+def sampled(logger, level, key, msg, *args, every=LOG_SAMPLE_EVERY):
+    """Log the 1st, (every+1)th, ... call for key; skipped calls cost a dict update."""
+    if not logger.isEnabledFor(level):
+        return
+    with _sample_lock:
+        count = _sample_counts.get(key, 0)
+        _sample_counts[key] = count + 1
+    if count % every == 0:
+        logger.log(level, msg + " (sampled 1/%d, seen %d)", *args, every, count + 1)
@@ -1,7 +1,21 @@
+import atexit
+import copy
 import json
+import logging
 import os
+import threading
+
+logger = logging.getLogger(__name__)
 
 MEMORY_FILE = os.path.join(os.path.dirname(__file__), "memory_store.json")
+MEMORY_DB = os.environ.get("MEMORY_DB", os.path.join(os.path.dirname(__file__), "memory.db"))
+# "sqlite" (per-user namespaces, see memory_sqlite.py) or "json" (single shared memory_store.json)
+MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "sqlite")
+DEFAULT_NAMESPACE = "default"
+# Write-behind: dirty state is flushed at most every MEMORY_FLUSH_INTERVAL seconds,
+# or sooner once MEMORY_FLUSH_THRESHOLD changes have piled up.
+MEMORY_FLUSH_INTERVAL = float(os.environ.get("MEMORY_FLUSH_INTERVAL", 1.0))
+MEMORY_FLUSH_THRESHOLD = int(os.environ.get("MEMORY_FLUSH_THRESHOLD", 100))
 
 DEFAULT_MEMORY = {
     "enabled": False,
@@ -10,48 +24,314 @@ DEFAULT_MEMORY = {
     "knowledge": {}
 }
 
-def load_memory():
-    if not os.path.exists(MEMORY_FILE):
-        return DEFAULT_MEMORY.copy()
-    try:
-        with open(MEMORY_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        return DEFAULT_MEMORY.copy()
-
-def save_memory(mem):
-    with open(MEMORY_FILE, "w") as f:
-        json.dump(mem, f)
-
-def enable_memory():
-    mem = load_memory()
-    mem["enabled"] = True
-    save_memory(mem)
-    return mem
 
-def disable_memory():
-    mem = load_memory()
-    mem["enabled"] = False
-    save_memory(mem)
-    return mem
+def _default_memory():
+    return {key: (value.copy() if isinstance(value, dict) else value) for key, value in DEFAULT_MEMORY.items()}
 
-def clear_memory():
-    mem = load_memory()
-    enabled = mem.get("enabled", False)
-    mem = DEFAULT_MEMORY.copy()
-    mem["enabled"] = enabled
-    save_memory(mem)
-    return mem
 
-def get_memory_status():
-    return load_memory()
+class WriteBehind:
+    """Background thread that runs flush() every interval, or as soon as it is poked urgently."""
+
+    def __init__(self, flush, interval, name):
+        self._flush = flush
+        self.interval = interval
+        self.name = name
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+
+    def poke(self, urgent=False):
+        if self._thread is None and not self._closed:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+        if urgent:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self._flush()
+            except Exception as e:
+                logger.exception("Error in %s: %s", self.name, e)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class MemoryStore:
+    """Memory kept in RAM with coalesced, atomic write-behind to a JSON file.
+
+    Reads never touch the disk. Mutations mark the store dirty; a background
+    thread writes the whole state to a temp file and renames it over the JSON
+    file, so concurrent sessions never lose updates or see a half-written file.
+    Accessors return copies taken under the lock, so callers may serialize or
+    change them while other threads write.
+    """
+
+    def __init__(self, path=MEMORY_FILE, flush_interval=MEMORY_FLUSH_INTERVAL, flush_threshold=MEMORY_FLUSH_THRESHOLD):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = WriteBehind(lambda: self.flush(), flush_interval, "memory-flush")
+        self._dirty = 0
+        self.flushes = 0
+        self._mem = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return _default_memory()
+        try:
+            with open(self.path, "r") as f:
+                mem = json.load(f)
+        except Exception:
+            return _default_memory()
+        for key, value in _default_memory().items():
+            mem.setdefault(key, value)
+        return mem
+
+    # --- Reads ---
+    @property
+    def memory(self):
+        with self._lock:
+            return copy.deepcopy(self._mem)
+
+    # --- Writes ---
+    def update(self, fn, snapshot=False):
+        """Apply fn(mem) under the store lock and schedule a flush.
+
+        With snapshot=True, returns a copy of the state after the change (costs a
+        copy of the whole store, so only for callers that hand the state out).
+        """
+        with self._lock:
+            fn(self._mem)
+            self._dirty += 1
+            dirty = self._dirty
+            mem = copy.deepcopy(self._mem) if snapshot else None
+        self._writer.poke(urgent=dirty >= self.flush_threshold)
+        return mem
+
+    def replace(self, mem):
+        mem = dict(mem)
+
+        def apply(current):
+            current.clear()
+            current.update(mem)
+        return self.update(apply, snapshot=True)
+
+    # --- Persistence ---
+    def flush(self):
+        """Write the current state if it changed since the last flush."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                payload = json.dumps(self._mem)
+                self._dirty = 0
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "w") as f:
+                    f.write(payload)
+                os.replace(tmp, self.path)
+            except OSError:
+                # Keep the changes marked dirty so the next flush retries them.
+                with self._lock:
+                    self._dirty += 1
+                raise
+            self.flushes += 1
+            return True
+
+    def close(self):
+        """Stop the background writer and flush any pending changes."""
+        self._writer.close()
+        self.flush()
+
+    # --- Memory API (this backend has a single namespace shared by every user) ---
+    def enable(self, namespace=DEFAULT_NAMESPACE):
+        return self._set_enabled(True)
+
+    def disable(self, namespace=DEFAULT_NAMESPACE):
+        return self._set_enabled(False)
+
+    def _set_enabled(self, enabled):
+        def apply(mem):
+            mem["enabled"] = enabled
+        return self.update(apply, snapshot=True)
+
+    def clear(self, namespace=DEFAULT_NAMESPACE):
+        def apply(mem):
+            enabled = mem.get("enabled", False)
+            mem.clear()
+            mem.update(_default_memory())
+            mem["enabled"] = enabled
+        return self.update(apply, snapshot=True)
+
+    def status(self, namespace=DEFAULT_NAMESPACE):
+        return self.memory
+
+    def set_preference(self, namespace, key, value):
+        def apply(mem):
+            mem["preferences"][key] = value
+        return self.update(apply, snapshot=True)
+
+    def get_preference(self, namespace, key):
+        with self._lock:
+            return copy.deepcopy(self._mem["preferences"].get(key))
+
+    def is_enabled(self, namespace=DEFAULT_NAMESPACE):
+        return bool(self._mem.get("enabled"))
+
+    def set_item(self, namespace, section, key, value):
+        def apply(mem):
+            mem[section][key] = value
+        self.update(apply)
+
+    def get_item(self, namespace, section, key):
+        with self._lock:
+            return copy.deepcopy(self._mem[section].get(key))
+
+    def delete_item(self, namespace, section, key):
+        def apply(mem):
+            mem[section].pop(key, None)
+        self.update(apply)
 
-def set_preference(key, value):
-    mem = load_memory()
-    mem["preferences"][key] = value
-    save_memory(mem)
+    def iter_items(self, namespace, section):
+        with self._lock:
+            return list(self._mem[section].items())
+
+    def fingerprint(self, namespace):
+        # Only this process writes the JSON store.
+        return None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide memory backend selected by MEMORY_BACKEND."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if MEMORY_BACKEND == "json":
+                    store = MemoryStore()
+                else:
+                    from memory_sqlite import SQLiteMemoryStore
+                    store = SQLiteMemoryStore(MEMORY_DB)
+                    if os.path.exists(MEMORY_FILE):
+                        store.migrate_json(MEMORY_FILE, DEFAULT_NAMESPACE, only_once=True)
+                atexit.register(store.close)
+                _store = store
+    return _store
+
+
+def close_store():
+    if _store is not None:
+        _store.close()
+    from memory_index import close_indexes
+    close_indexes()
+
+
+def enable_memory(namespace=DEFAULT_NAMESPACE):
+    return get_store().enable(namespace)
+
+def disable_memory(namespace=DEFAULT_NAMESPACE):
+    return get_store().disable(namespace)
+
+def clear_memory(namespace=DEFAULT_NAMESPACE):
+    mem = get_store().clear(namespace)
+    index = _get_index(namespace)
+    index.clear()
+    _index_updated(index, namespace)
     return mem
 
-def get_preference(key):
-    mem = load_memory()
-    return mem["preferences"].get(key) 
\ No newline at end of file
+def get_memory_status(namespace=DEFAULT_NAMESPACE):
+    return get_store().status(namespace)
+
+def set_preference(key, value, namespace=DEFAULT_NAMESPACE):
+    return get_store().set_preference(namespace, key, value)
+
+def get_preference(key, namespace=DEFAULT_NAMESPACE):
+    return get_store().get_preference(namespace, key)
+
+def is_memory_enabled(namespace=DEFAULT_NAMESPACE):
+    return get_store().is_enabled(namespace)
+
+
+# --- Retrieval over knowledge/context (see memory_index.py) ---
+RECALL_SECTIONS = ("knowledge", "context")
+
+
+def memory_text(key, value):
+    return f"{key}: {value if isinstance(value, str) else json.dumps(value)}"
+
+
+def _get_index(namespace):
+    from memory_index import get_index
+    index = get_index(namespace)
+    if index.path is None:
+        # In-memory index of one worker: rebuild it when another worker changed the namespace.
+        fingerprint = get_store().fingerprint(namespace)
+        if fingerprint != index.fingerprint:
+            index.clear()
+            _build_index(index, namespace)
+            index.fingerprint = fingerprint
+    elif index.created:
+        # First use of this namespace's index (or it was deleted): build it from the store.
+        index.created = False
+        _build_index(index, namespace)
+    return index
+
+
+def _build_index(index, namespace):
+    store = get_store()
+    for section in RECALL_SECTIONS:
+        index.add_many((f"{section}/{key}", memory_text(key, value))
+                       for key, value in store.iter_items(namespace, section))
+
+
+def _index_updated(index, namespace):
+    # Our own write should not make this worker rebuild its index.
+    if index.path is None:
+        index.fingerprint = get_store().fingerprint(namespace)
+
+
+def remember(section, key, value, namespace=DEFAULT_NAMESPACE):
+    """Store a knowledge/context entry and index it for recall."""
+    if section not in RECALL_SECTIONS:
+        raise ValueError(f"Unknown memory section {section!r}")
+    index = _get_index(namespace)
+    get_store().set_item(namespace, section, key, value)
+    index.add(f"{section}/{key}", memory_text(key, value))
+    _index_updated(index, namespace)
+
+
+def forget(section, key, namespace=DEFAULT_NAMESPACE):
+    index = _get_index(namespace)
+    get_store().delete_item(namespace, section, key)
+    index.delete(f"{section}/{key}")
+    _index_updated(index, namespace)
+
+
+def recall(query, k=None, namespace=DEFAULT_NAMESPACE):
+    """The k knowledge/context entries most relevant to query, as [{section, key, value, score}]."""
+    from memory_index import MEMORY_RECALL_K, MEMORY_RECALL_MIN_SCORE
+    store = get_store()
+    results = []
+    for doc_id, score in _get_index(namespace).search(query, k or MEMORY_RECALL_K, MEMORY_RECALL_MIN_SCORE):
+        section, key = doc_id.split("/", 1)
+        value = store.get_item(namespace, section, key)
+        if value is not None:
+            results.append({"section": section, "key": key, "value": value, "score": round(score, 4)})
+    return results
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from memory import MEMORY_FLUSH_INTERVAL, WriteBehind
+
+# Local retrieval over the knowledge/context memory sections.
+# Each entry is turned into a hashed bag of word unigrams, bigrams and character
+# trigrams (so "live" matches "lives"). There is no vocabulary to fit, so entries
+# can be added and removed one at a time. Vectors are log-scaled, L2-normalised and
+# stored as rows of a float32 matrix. A query is weighted by the index's current IDF
+# and scored against every row with one matrix product, so the model gets the few
+# entries that match the turn instead of the whole memory. With a path the matrix is
+# a memory-mapped file that grows by doubling; the id list and document frequencies
+# are saved next to it by a write-behind thread.
+
+MEMORY_INDEX_DIR = os.environ.get("MEMORY_INDEX_DIR", os.path.join(os.path.dirname(__file__), "memory_index"))
+# Set for multi-worker serving: each process keeps its own indexes in RAM, rebuilt
+# from the shared memory database when another worker changed a namespace.
+MEMORY_INDEX_IN_MEMORY = os.environ.get("MEMORY_INDEX_IN_MEMORY") == "1"
+MEMORY_INDEX_DIM = int(os.environ.get("MEMORY_INDEX_DIM", 2048))
+MEMORY_RECALL_K = int(os.environ.get("MEMORY_RECALL_K", 3))
+# Entries scoring below this are not worth putting in front of the model.
+MEMORY_RECALL_MIN_SCORE = float(os.environ.get("MEMORY_RECALL_MIN_SCORE", 0.1))
+
+INITIAL_CAPACITY = 256
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a about an and are as at be but by can do does for from had has have he her his how i in is it its me "
+    "my of on or our she so tell that the their them they this to was we were what when where which who why "
+    "will with you your".split()
+)
+
+
+def features(text, dim=MEMORY_INDEX_DIM):
+    """Hashed feature ids of the word unigrams, bigrams and character trigrams in text."""
+    tokens = [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    grams += [f"#{t}#"[i:i + 3] for t in tokens if len(t) > 3 for i in range(len(t))]
+    return np.fromiter((zlib.crc32(g.encode()) % dim for g in grams), dtype=np.int64, count=len(grams))
+
+
+def vectorize(text, dim=MEMORY_INDEX_DIM):
+    vec = np.log1p(np.bincount(features(text, dim), minlength=dim).astype(np.float32))
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class VectorIndex:
+    def __init__(self, path=None, dim=MEMORY_INDEX_DIM, flush_interval=MEMORY_FLUSH_INTERVAL):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._ids = []
+        self._rows = {}
+        self._df = np.zeros(dim, dtype=np.int64)
+        self._dirty = False
+        self.created = True
+        # Version of the memory the index was built from (see memory._get_index)
+        self.fingerprint = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+        else:
+            self._vectors = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self._writer = WriteBehind(self.save, flush_interval, "memory-index-flush")
+
+    # --- Storage ---
+    def _files(self):
+        return os.path.join(self.path, "vectors.f32"), os.path.join(self.path, "meta.json"), os.path.join(self.path, "df.npy")
+
+    def _load(self):
+        vectors_file, meta_file, df_file = self._files()
+        capacity = INITIAL_CAPACITY
+        if os.path.exists(meta_file):
+            with open(meta_file, "r") as f:
+                meta = json.load(f)
+            if meta["dim"] != self.dim:
+                raise ValueError(f"Index at {self.path} has dim {meta['dim']}, expected {self.dim}")
+            self._ids = meta["ids"]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._df = np.load(df_file)
+            capacity = max(meta["capacity"], capacity)
+            self.created = False
+        self._vectors = self._map(vectors_file, capacity)
+
+    def _map(self, vectors_file, capacity):
+        size = capacity * self.dim * 4
+        with open(vectors_file, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(vectors_file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _grow(self):
+        capacity = len(self._vectors) * 2
+        if self.path:
+            self._vectors.flush()
+            self._vectors = self._map(self._files()[0], capacity)
+        else:
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+
+    def save(self):
+        """Persist the matrix and metadata if they changed since the last save."""
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            self._vectors.flush()
+            meta = json.dumps({"dim": self.dim, "capacity": len(self._vectors), "ids": self._ids})
+            df = self._df.copy()
+            self._dirty = False
+        vectors_file, meta_file, df_file = self._files()
+        np.save(df_file + ".tmp.npy", df)
+        os.replace(df_file + ".tmp.npy", df_file)
+        with open(meta_file + ".tmp", "w") as f:
+            f.write(meta)
+        os.replace(meta_file + ".tmp", meta_file)
+        return True
+
+    def close(self):
+        self._writer.close()
+        self.save()
+
+    # --- Updates ---
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._rows
+
+    def add(self, doc_id, text):
+        self.add_many([(doc_id, text)])
+
+    def add_many(self, items):
+        """Insert or replace (doc_id, text) pairs."""
+        with self._lock:
+            for doc_id, text in items:
+                if doc_id in self._rows:
+                    self._delete(doc_id)
+                vec = vectorize(text, self.dim)
+                if len(self._ids) == len(self._vectors):
+                    self._grow()
+                row = len(self._ids)
+                self._vectors[row] = vec
+                self._ids.append(doc_id)
+                self._rows[doc_id] = row
+                self._df[np.flatnonzero(vec)] += 1
+            self._dirty = True
+        self._writer.poke()
+
+    def delete(self, doc_id):
+        with self._lock:
+            if doc_id not in self._rows:
+                return False
+            self._delete(doc_id)
+            self._dirty = True
+        self._writer.poke()
+        return True
+
+    def _delete(self, doc_id):
+        # Move the last row into the hole so the live rows stay contiguous.
+        row = self._rows.pop(doc_id)
+        self._df[np.flatnonzero(self._vectors[row])] -= 1
+        last = len(self._ids) - 1
+        if row != last:
+            moved = self._ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+        self._vectors[last] = 0
+        self._ids.pop()
+
+    def clear(self):
+        with self._lock:
+            self._vectors[:len(self._ids)] = 0
+            self._ids = []
+            self._rows = {}
+            self._df[:] = 0
+            self._dirty = True
+        self._writer.poke()
+
+    # --- Search ---
+    def search(self, query, k=MEMORY_RECALL_K, min_score=0.0):
+        return self.search_many([query], k, min_score)[0]
+
+    def search_many(self, queries, k=MEMORY_RECALL_K, min_score=0.0):
+        """Top-k (doc_id, score) per query, best first, scored in one matrix product."""
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or not queries:
+                return [[] for _ in queries]
+            idf = np.log((1 + n) / (1 + self._df)).astype(np.float32) + 1
+            q = np.stack([vectorize(query, self.dim) for query in queries]) * idf
+            norms = np.linalg.norm(q, axis=1, keepdims=True)
+            q /= np.where(norms == 0, 1, norms)
+            scores = q @ self._vectors[:n].T
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for i, candidates in enumerate(top):
+                ranked = candidates[np.argsort(-scores[i, candidates])]
+                results.append([(self._ids[j], float(scores[i, j])) for j in ranked if scores[i, j] > min_score])
+            return results
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_path(namespace, root=MEMORY_INDEX_DIR):
+    # Namespaces may contain "/" (user/session), so the directory name is a digest.
+    return os.path.join(root, hashlib.sha1(namespace.encode()).hexdigest()[:20])
+
+
+def get_index(namespace):
+    """The on-disk index for a memory namespace, opened on first use."""
+    with _indexes_lock:
+        index = _indexes.get(namespace)
+        if index is None:
+            path = None if MEMORY_INDEX_IN_MEMORY else index_path(namespace)
+            index = _indexes[namespace] = VectorIndex(path)
+        return index
+
+
+def close_indexes():
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.close()
@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from memory import DEFAULT_NAMESPACE, MEMORY_FLUSH_INTERVAL, MEMORY_FLUSH_THRESHOLD, WriteBehind
+
+# SQLite-backed memory with per-user / per-session namespaces.
+# Every (namespace, section, key) is its own row behind a primary-key index, so
+# lookups and updates cost the same at ten users or ten thousand, instead of
+# re-reading and rewriting one global JSON blob. The database runs in WAL mode so
+# readers never block the writer. Writes are buffered and committed in batches by
+# a background thread; reads see buffered writes immediately. Enabled flags are
+# read on every turn, so they are cached in RAM for one flush interval (about as
+# stale as another worker's buffered writes can be anyway).
+
+SECTIONS = ("preferences", "context", "knowledge")
+STATUS_PAGE_SIZE = 100
+_DELETED = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_namespaces (
+    namespace TEXT PRIMARY KEY,
+    enabled INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS memory_items (
+    namespace TEXT NOT NULL,
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, section, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS memory_items_recent ON memory_items (namespace, section, updated_at);
+CREATE TABLE IF NOT EXISTS memory_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def namespace_for(user_id=None, session_id=None):
+    """Namespace for a user, or for one session of a user."""
+    namespace = str(user_id) if user_id else DEFAULT_NAMESPACE
+    return f"{namespace}/{session_id}" if session_id else namespace
+
+
+class SQLiteMemoryStore:
+    def __init__(self, path, flush_interval=MEMORY_FLUSH_INTERVAL, batch_size=MEMORY_FLUSH_THRESHOLD):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        self._db_lock = threading.RLock()
+        self._lock = threading.Lock()
+        # (namespace, section, key) -> JSON text, or _DELETED
+        self._pending = {}
+        # namespace -> enabled flag
+        self._pending_enabled = {}
+        # namespace -> (enabled flag, time read)
+        self._enabled = {}
+        self._writer = WriteBehind(lambda: self.flush(), flush_interval, "memory-sqlite-flush")
+
+    # --- Batched writes ---
+    def _queue(self, namespace, section, items):
+        now_pending = 0
+        with self._lock:
+            for key, value in items:
+                self._pending[(namespace, section, str(key))] = value if value is _DELETED else json.dumps(value)
+            now_pending = len(self._pending)
+        self._writer.poke(urgent=now_pending >= self.batch_size)
+
+    def set_item(self, namespace, section, key, value):
+        self._queue(namespace, section, [(key, value)])
+
+    def set_items(self, namespace, section, mapping):
+        self._queue(namespace, section, mapping.items())
+
+    def delete_item(self, namespace, section, key):
+        self._queue(namespace, section, [(key, _DELETED)])
+
+    def flush(self):
+        """Commit buffered writes in one transaction. Returns the number of rows written."""
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                enabled, self._pending_enabled = self._pending_enabled, {}
+            if not pending and not enabled:
+                return 0
+            now = time.time()
+            upserts = [(ns, section, key, value, now) for (ns, section, key), value in pending.items() if value is not _DELETED]
+            deletes = [(ns, section, key) for (ns, section, key), value in pending.items() if value is _DELETED]
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO memory_namespaces (namespace, enabled) VALUES (?, ?) "
+                    "ON CONFLICT (namespace) DO UPDATE SET enabled = excluded.enabled",
+                    [(ns, int(flag)) for ns, flag in enabled.items()],
+                )
+                self._conn.executemany(
+                    "INSERT INTO memory_items (namespace, section, key, value, updated_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, section, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                    upserts,
+                )
+                self._conn.executemany(
+                    "DELETE FROM memory_items WHERE namespace = ? AND section = ? AND key = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                # Put the batch back (without clobbering newer writes) so it is retried.
+                with self._lock:
+                    for item_key, value in pending.items():
+                        self._pending.setdefault(item_key, value)
+                    for ns, flag in enabled.items():
+                        self._pending_enabled.setdefault(ns, flag)
+                raise
+            return len(upserts) + len(deletes) + len(enabled)
+
+    # --- Reads ---
+    def get_item(self, namespace, section, key):
+        value = self._pending.get((namespace, section, str(key)))
+        if value is None:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT value FROM memory_items WHERE namespace = ? AND section = ? AND key = ?",
+                    (namespace, section, str(key)),
+                ).fetchone()
+            value = row[0] if row else _DELETED
+        return None if value is _DELETED else json.loads(value)
+
+    def page(self, namespace, section, limit=50, after=None):
+        """Return (items, cursor) for up to limit keys after the cursor, in key order.
+
+        Pass the returned cursor back as `after` for the next page; it is None on
+        the last page.
+        """
+        self.flush()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM memory_items WHERE namespace = ? AND section = ? AND key > ? "
+                "ORDER BY key LIMIT ?",
+                (namespace, section, after if after is not None else "", limit + 1),
+            ).fetchall()
+        items = {key: json.loads(value) for key, value in rows[:limit]}
+        cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return items, cursor
+
+    def recent(self, namespace, section, limit=50):
+        """Most recently updated entries first."""
+        self.flush()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM memory_items WHERE namespace = ? AND section = ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (namespace, section, limit),
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def iter_items(self, namespace, section, page_size=500):
+        """Every (key, value) of a section, fetched a page at a time."""
+        cursor = None
+        while True:
+            items, cursor = self.page(namespace, section, page_size, cursor)
+            yield from items.items()
+            if cursor is None:
+                return
+
+    def fingerprint(self, namespace, sections=("knowledge", "context")):
+        """Changes whenever entries of the given sections are added, updated or removed."""
+        self.flush()
+        marks = ",".join("?" * len(sections))
+        with self._db_lock:
+            return tuple(self._conn.execute(
+                f"SELECT COUNT(*), MAX(updated_at) FROM memory_items WHERE namespace = ? AND section IN ({marks})",
+                (namespace, *sections),
+            ).fetchone())
+
+    def count(self, namespace, section):
+        self.flush()
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM memory_items WHERE namespace = ? AND section = ?", (namespace, section)
+            ).fetchone()[0]
+
+    def is_enabled(self, namespace):
+        flag = self._pending_enabled.get(namespace)
+        if flag is not None:
+            return flag
+        cached = self._enabled.get(namespace)
+        if cached is not None and time.monotonic() - cached[1] < self.flush_interval:
+            return cached[0]
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT enabled FROM memory_namespaces WHERE namespace = ?", (namespace,)).fetchone()
+        flag = bool(row[0]) if row else False
+        self._enabled[namespace] = (flag, time.monotonic())
+        return flag
+
+    # --- Memory API (same shape as memory.py's functions) ---
+    def enable(self, namespace=DEFAULT_NAMESPACE):
+        return self._set_enabled(namespace, True)
+
+    def disable(self, namespace=DEFAULT_NAMESPACE):
+        return self._set_enabled(namespace, False)
+
+    def _set_enabled(self, namespace, enabled):
+        with self._lock:
+            self._pending_enabled[namespace] = enabled
+            self._enabled[namespace] = (enabled, time.monotonic())
+        self._writer.poke()
+        return self.status(namespace)
+
+    def clear(self, namespace=DEFAULT_NAMESPACE):
+        self.flush()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM memory_items WHERE namespace = ?", (namespace,))
+        return self.status(namespace)
+
+    def status(self, namespace=DEFAULT_NAMESPACE):
+        """Memory for a namespace in the classic JSON shape.
+
+        Preferences are returned in full; context and knowledge are limited to the
+        STATUS_PAGE_SIZE most recent entries (use page() for the rest).
+        """
+        mem = {"enabled": self.is_enabled(namespace)}
+        mem["preferences"] = self.page(namespace, "preferences", limit=10 ** 9)[0]
+        for section in ("context", "knowledge"):
+            mem[section] = self.recent(namespace, section, STATUS_PAGE_SIZE)
+        return mem
+
+    def set_preference(self, namespace, key, value):
+        self.set_item(namespace, "preferences", key, value)
+        return self.status(namespace)
+
+    def get_preference(self, namespace, key):
+        return self.get_item(namespace, "preferences", key)
+
+    # --- Migration from memory_store.json ---
+    def migrate_json(self, json_path, namespace=DEFAULT_NAMESPACE, only_once=False):
+        """Import a memory_store.json file into a namespace. Returns the number of items imported."""
+        marker = f"migrated:{os.path.abspath(json_path)}"
+        if only_once:
+            with self._db_lock:
+                if self._conn.execute("SELECT 1 FROM memory_meta WHERE key = ?", (marker,)).fetchone():
+                    return 0
+        try:
+            with open(json_path, "r") as f:
+                mem = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        imported = 0
+        with self._lock:
+            self._pending_enabled[namespace] = bool(mem.get("enabled", False))
+            self._enabled.pop(namespace, None)
+        for section in SECTIONS:
+            items = mem.get(section) or {}
+            self.set_items(namespace, section, items)
+            imported += len(items)
+        self.flush()
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memory_meta (key, value) VALUES (?, ?)", (marker, str(time.time())))
+        return imported
+
+    def close(self):
+        self._writer.close()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    from memory import MEMORY_DB, MEMORY_FILE
+
+    # python memory_sqlite.py [memory_store.json] [namespace]
+    source = sys.argv[1] if len(sys.argv) > 1 else MEMORY_FILE
+    target_namespace = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_NAMESPACE
+    store = SQLiteMemoryStore(MEMORY_DB)
+    count = store.migrate_json(source, target_namespace)
+    store.close()
+    print(f"Migrated {count} items from {source} into {MEMORY_DB} (namespace {target_namespace!r})")
@@ -0,0 +1,284 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics with a Prometheus text exposition.
+# Counters, gauges and fixed-bucket histograms, optionally labelled. Recording is a
+# lock and a few additions, cheap enough for the audio path. render_text() produces
+# the text format served at /metrics by live_api.py and chart_api.py. With several
+# workers each process exposes its own numbers (label them per target when scraping).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+DURATION_BUCKETS = (1, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help="", labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help="", labels=(), function=None):
+        super().__init__(name, help, labels)
+        # function() -> current total, read at scrape time, for counts kept elsewhere
+        # (unlabelled counters only)
+        self.function = function
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        if self.function is not None:
+            return self.function()
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        if self.function is not None:
+            return self.header() + [f"{self.name} {self.function()}"]
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help="", labels=(), function=None):
+        super().__init__(name, help, labels)
+        # function() -> current value, read at scrape time (unlabelled gauges only)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        if self.function is not None:
+            return self.function()
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        if self.function is not None:
+            return self.header() + [f"{self.name} {self.function()}"]
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help="", labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile by interpolating inside the bucket that holds it."""
+        series = self._values.get(self._key(labels))
+        if not series or not series[2]:
+            return None
+        counts, _, total = series
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def render(self):
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help="", labels=(), function=None):
+        return self._add(Counter(name, help, labels, function))
+
+    def gauge(self, name, help="", labels=(), function=None):
+        return self._add(Gauge(name, help, labels, function))
+
+    def histogram(self, name, help="", labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render_text(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --- The live pipeline's metrics ---
+SESSIONS_ACTIVE = metrics.gauge("live_sessions_active", "Open client sessions in this process.")
+SESSIONS_TOTAL = metrics.counter("live_sessions_total", "Client sessions started.")
+FORWARD_LATENCY = metrics.histogram(
+    "live_forward_seconds", "Client message arrival to upstream send completed.", labels=("kind",))
+FIRST_AUDIO_LATENCY = metrics.histogram(
+    "live_first_audio_seconds", "Last client input sent to Gemini until the first reply audio arrives.")
+OUTBOUND_DELAY = metrics.histogram(
+    "live_outbound_delay_seconds", "Time Gemini output waits in the per-connection send queue.", labels=("kind",))
+OUTBOUND_DEPTH = metrics.histogram(
+    "live_outbound_queue_depth", "Send queue depth seen when a message is queued.", buckets=SIZE_BUCKETS)
+OUTBOUND_DROPPED = metrics.counter("live_outbound_dropped_total", "Audio frames dropped for slow clients.")
+INBOUND_BUFFERED = metrics.gauge(
+    "live_inbound_buffered_bytes", "Client audio waiting in the inbound shapers to be sent upstream.")
+TOOL_LATENCY = metrics.histogram("live_tool_seconds", "Tool execution time.", labels=("tool",))
+RENDER_LATENCY = metrics.histogram("live_render_seconds", "Chart/word cloud render time.", labels=("kind", "source"))
+AUDIO_ENCODE_DELAY = metrics.histogram(
+    "live_audio_encode_seconds", "PCM written to the Opus encoder until its next output.")
+TOKENS = metrics.counter("live_tokens_total", "Tokens reported in Gemini usage_metadata.", labels=("kind",))
+# One observation per finished session, from its own histograms: how many sessions had a bad tail.
+SESSION_FIRST_AUDIO_P99 = metrics.histogram(
+    "live_session_first_audio_p99_seconds", "Per-session p99 of live_first_audio_seconds, at session end.")
+SESSION_FORWARD_P99 = metrics.histogram(
+    "live_session_forward_p99_seconds", "Per-session p99 of live_forward_seconds, at session end.", labels=("kind",))
+SESSION_DURATION = metrics.histogram(
+    "live_session_duration_seconds", "Length of finished sessions.", buckets=DURATION_BUCKETS)
+
+
+def resident_memory_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current RSS where /proc is not available (kB on Linux).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+metrics.gauge("process_resident_memory_bytes", "Resident memory of this process.", function=resident_memory_bytes)
+
+
+class SessionMetrics:
+    """Per-session latency histograms, also fed into the process-wide ones.
+
+    When the session closes, its p99s and duration are observed in the live_session_*
+    histograms, so /metrics shows the spread across sessions and not only the overall mix.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.forward = Histogram("session_forward_seconds", labels=("kind",))
+        self.first_audio = Histogram("session_first_audio_seconds")
+        self.awaiting_reply_since = None
+        SESSIONS_ACTIVE.inc()
+        SESSIONS_TOTAL.inc()
+
+    def forwarded(self, kind, arrived_at):
+        now = time.monotonic()
+        self.forward.observe(now - arrived_at, kind=kind)
+        FORWARD_LATENCY.observe(now - arrived_at, kind=kind)
+        self.awaiting_reply_since = now
+
+    def reply_audio(self):
+        if self.awaiting_reply_since is not None:
+            latency = time.monotonic() - self.awaiting_reply_since
+            self.first_audio.observe(latency)
+            FIRST_AUDIO_LATENCY.observe(latency)
+            self.awaiting_reply_since = None
+
+    def usage(self, usage_metadata):
+        for kind in ("prompt", "response", "total"):
+            count = getattr(usage_metadata, f"{kind}_token_count", None)
+            if count:
+                TOKENS.inc(count, kind=kind)
+
+    def summary(self):
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+        return {
+            "duration_s": round(time.monotonic() - self.started, 1),
+            "first_audio_p50_ms": ms(self.first_audio.quantile(0.5)),
+            "first_audio_p99_ms": ms(self.first_audio.quantile(0.99)),
+            "audio_forward_p99_ms": ms(self.forward.quantile(0.99, kind="audio")),
+            "replies": self.first_audio.count(),
+        }
+
+    def close(self):
+        SESSIONS_ACTIVE.dec()
+        SESSION_DURATION.observe(time.monotonic() - self.started)
+        if self.first_audio.count():
+            SESSION_FIRST_AUDIO_P99.observe(self.first_audio.quantile(0.99))
+        for kind in ("audio", "image", "text"):
+            if self.forward.count(kind=kind):
+                SESSION_FORWARD_P99.observe(self.forward.quantile(0.99, kind=kind), kind=kind)
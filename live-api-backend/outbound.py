@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from collections import deque
+
+from metrics import OUTBOUND_DELAY, OUTBOUND_DEPTH, OUTBOUND_DROPPED
+
+from protocol import FRAME_AUDIO_PCM, encode_frame
+
+# Per-connection outbound writer.
+# receive_from_gemini() used to await websocket.send() for every audio part and
+# transcription fragment, so a slow browser stalled the Gemini receive loop. Now it
+# only appends to this queue and a writer task does the sending. While messages wait
+# in the queue, adjacent audio chunks are merged into frames of up to
+# OUTBOUND_AUDIO_BUDGET_MS, and adjacent transcription fragments from the same
+# speaker are concatenated (the client appends fragments, so nothing is lost). If
+# the client falls further behind than OUTBOUND_MAX_ITEMS, the oldest queued audio
+# is dropped; control messages are never dropped. Each item carries its enqueue
+# time (last element) so the wait in the queue shows up in live_outbound_delay_seconds.
+# With an Opus encoder (audio_egress.py) the writer feeds audio to the encoder instead
+# of sending it; dropping still happens on PCM, before encoding, so the stream stays valid.
+
+OUTBOUND_MAX_ITEMS = int(os.environ.get("OUTBOUND_MAX_ITEMS", 64))
+OUTBOUND_AUDIO_BUDGET_MS = float(os.environ.get("OUTBOUND_AUDIO_BUDGET_MS", 40))
+# Gemini Live speaks 16-bit mono PCM at 24kHz.
+OUTPUT_SAMPLE_RATE = 24000
+OUTPUT_SAMPLE_WIDTH = 2
+
+AUDIO = "audio"
+AUDIO_END = "audio_end"
+TRANSCRIPTION = "transcription"
+MESSAGE = "message"
+
+
+class OutboundQueue:
+    def __init__(self, websocket, binary=False, max_items=OUTBOUND_MAX_ITEMS,
+                 audio_budget_ms=OUTBOUND_AUDIO_BUDGET_MS, sample_rate=OUTPUT_SAMPLE_RATE, encoder=None):
+        self.websocket = websocket
+        self.binary = binary
+        self.encoder = encoder
+        self.max_items = max_items
+        # Largest merged audio frame, in bytes (kept to whole samples).
+        self.max_audio_bytes = int(sample_rate * audio_budget_ms / 1000) * OUTPUT_SAMPLE_WIDTH
+        self._items = deque()
+        self._ready = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.error = None
+        self.sent = 0
+        self.max_depth = 0
+        self.merged_audio = 0
+        self.merged_transcriptions = 0
+        self.dropped_audio = 0
+        self.dropped_audio_bytes = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    # --- Producers (never block) ---
+    def put_audio(self, pcm):
+        self._check()
+        last = self._items[-1] if self._items else None
+        if last is not None and last[0] == AUDIO and len(last[1]) + len(pcm) <= self.max_audio_bytes:
+            last[1].extend(pcm)
+            self.merged_audio += 1
+            return
+        self._push([AUDIO, bytearray(pcm)])
+
+    def end_audio(self):
+        """Mark the end of a reply, so an encoder sends out everything it holds."""
+        self._check()
+        if self.encoder is not None:
+            self._push([AUDIO_END])
+
+    def put_transcription(self, sender, text, finished=None):
+        self._check()
+        last = self._items[-1] if self._items else None
+        if last is not None and last[0] == TRANSCRIPTION and last[1] == sender and not last[3]:
+            last[2] += text or ""
+            last[3] = finished
+            self.merged_transcriptions += 1
+            return
+        self._push([TRANSCRIPTION, sender, text or "", finished])
+
+    def put_json(self, payload, interrupt=False):
+        """Queue a control message. interrupt=True discards audio that has not been sent yet."""
+        self._check()
+        if interrupt:
+            self._discard_audio(len(self._items))
+        self._push([MESSAGE, payload])
+
+    def _push(self, item):
+        item.append(time.monotonic())
+        OUTBOUND_DEPTH.observe(len(self._items))
+        self._items.append(item)
+        if len(self._items) > self.max_items:
+            self._discard_audio(len(self._items) - self.max_items)
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._ready.set()
+
+    def _discard_audio(self, count):
+        """Drop up to count of the oldest queued audio frames."""
+        kept = deque()
+        while self._items:
+            item = self._items.popleft()
+            if count > 0 and item[0] == AUDIO:
+                count -= 1
+                self.dropped_audio += 1
+                self.dropped_audio_bytes += len(item[1])
+                OUTBOUND_DROPPED.inc()
+            else:
+                kept.append(item)
+        self._items = kept
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    # --- Writer ---
+    def _encode(self, item):
+        kind = item[0]
+        if kind == AUDIO:
+            if self.binary:
+                return encode_frame(FRAME_AUDIO_PCM, bytes(item[1]))
+            return json.dumps({"audio": base64.b64encode(item[1]).decode("utf-8")})
+        if kind == TRANSCRIPTION:
+            return json.dumps({"transcription": {"text": item[2], "sender": item[1], "finished": item[3]}})
+        return json.dumps(item[1])
+
+    async def _run(self):
+        try:
+            while True:
+                if not self._items:
+                    if self._closing:
+                        return
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                item = self._items.popleft()
+                OUTBOUND_DELAY.observe(time.monotonic() - item[-1], kind=item[0])
+                if item[0] == AUDIO_END:
+                    await self.encoder.flush()
+                    continue
+                if item[0] == AUDIO and self.encoder is not None:
+                    await self.encoder.write(bytes(item[1]))
+                    continue
+                await self.websocket.send(self._encode(item))
+                self.sent += 1
+        except Exception as e:
+            # Producers see the failure (e.g. ConnectionClosed) on their next put.
+            self.error = e
+            self._items.clear()
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def stats(self):
+        stats = {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "merged_audio": self.merged_audio,
+            "merged_transcriptions": self.merged_transcriptions,
+            "dropped_audio": self.dropped_audio,
+            "dropped_audio_bytes": self.dropped_audio_bytes,
+        }
+        if self.encoder is not None:
+            stats["encoder"] = self.encoder.stats()
+        return stats
+
+    async def close(self, timeout=1.0):
+        """Send what is queued (for up to timeout seconds), then stop the writer and the encoder."""
+        if self._task is not None:
+            self._closing = True
+            self._ready.set()
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._task = None
+        if self.encoder is not None:
+            await self.encoder.close(timeout)
@@ -0,0 +1,72 @@
+import struct
+
+# Binary WebSocket frames for audio and images.
+# Base64 inside JSON adds ~33% to every 20-40ms audio frame and costs an
+# encode/decode in both directions. A client that sends {"protocol": "binary-v1"}
+# in its first (setup) message gets audio and rendered images as binary frames:
+#
+#     | version (1 byte) | frame type (1 byte) | raw payload ... |
+#
+# Control messages (text, transcriptions, tool results, memory) stay JSON.
+
+PROTOCOL_BINARY = "binary-v1"
+VERSION = 1
+HEADER = struct.Struct("!BB")
+
+FRAME_AUDIO_PCM = 0x01
+FRAME_IMAGE_JPEG = 0x02
+FRAME_IMAGE_PNG = 0x03
+FRAME_IMAGE_WEBP = 0x04
+# WebM/Opus stream bytes (server to client only, see audio_egress.py)
+FRAME_AUDIO_OPUS = 0x05
+FRAME_WORDCLOUD = 0x10
+FRAME_BARCHART = 0x11
+FRAME_LINECHART = 0x12
+FRAME_PIECHART = 0x13
+
+# Frame types a client may send, mapped to the mime type forwarded to Gemini.
+MIME_TYPES = {
+    FRAME_AUDIO_PCM: "audio/pcm",
+    FRAME_IMAGE_JPEG: "image/jpeg",
+    FRAME_IMAGE_PNG: "image/png",
+    FRAME_IMAGE_WEBP: "image/webp",
+}
+
+# Rendered tool images sent to the client; the frame type replaces the JSON key.
+IMAGE_FRAMES = {
+    "wordcloud": FRAME_WORDCLOUD,
+    "barchart": FRAME_BARCHART,
+    "linechart": FRAME_LINECHART,
+    "piechart": FRAME_PIECHART,
+}
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def wants_binary(config_data):
+    return isinstance(config_data, dict) and config_data.get("protocol") == PROTOCOL_BINARY
+
+
+def encode_frame(frame_type, payload):
+    return HEADER.pack(VERSION, frame_type) + payload
+
+
+def decode_frame(message):
+    """Split a binary frame into (frame_type, payload memoryview)."""
+    if len(message) < HEADER.size:
+        raise ProtocolError("Binary frame is shorter than its header")
+    version, frame_type = HEADER.unpack_from(message)
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported binary frame version {version}")
+    return frame_type, memoryview(message)[HEADER.size:]
+
+
+def decode_media_frame(message):
+    """Decode a client media frame into (mime_type, payload bytes)."""
+    frame_type, payload = decode_frame(message)
+    mime_type = MIME_TYPES.get(frame_type)
+    if mime_type is None:
+        raise ProtocolError(f"Unknown media frame type {frame_type:#x}")
+    return mime_type, bytes(payload)
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import metrics
+
+# Content-addressed cache for rendered chart/word cloud PNGs.
+# Keys are a hash of the chart type plus its normalized inputs (parsed numbers,
+# word frequencies, size and colors), so the same chart is only rendered once.
+# Entries live in an in-memory LRU bounded by total bytes, with an optional
+# on-disk tier (RENDER_CACHE_DIR) that survives restarts. The disk tier is LRU too:
+# a read from disk touches the file, and trimming removes the oldest mtimes first.
+# Hits and misses are exported at /metrics.
+
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR") or None
+RENDER_CACHE_DISK_MAX_BYTES = int(os.environ.get("RENDER_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024))
+
+
+def make_key(kind, inputs):
+    payload = json.dumps([kind, inputs], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, max_bytes=RENDER_CACHE_MAX_BYTES, disk_dir=RENDER_CACHE_DIR, disk_max_bytes=RENDER_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        self._disk_put(key, value)
+
+    def _store(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = value
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes if self.disk_dir else None,
+            }
+
+    # --- Disk tier ---
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + ".png")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(value)
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._trim_disk()
+
+    def _disk_files(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".png"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+        return files
+
+    def _trim_disk(self):
+        # Least recently used files go first until the disk tier is back under its limit.
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, name in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._disk_bytes = total
+            self.evictions += removed
+
+
+render_cache = RenderCache()
+metrics.counter("live_render_cache_hits_total", "Render cache hits in memory.",
+                function=lambda: render_cache.hits)
+metrics.counter("live_render_cache_disk_hits_total", "Render cache hits on disk.",
+                function=lambda: render_cache.disk_hits)
+metrics.counter("live_render_cache_misses_total", "Render cache misses.",
+                function=lambda: render_cache.misses)
+metrics.counter("live_render_cache_evictions_total", "Render cache entries evicted.",
+                function=lambda: render_cache.evictions)
+metrics.gauge("live_render_cache_bytes", "Bytes of images in the in-memory render cache.",
+              function=lambda: render_cache._bytes)
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import metrics
+
+# Bounded process pool for chart and word cloud rendering.
+# matplotlib/WordCloud renders take tens to hundreds of milliseconds of pure CPU
+# work, so running them inside the asyncio loop stalls audio forwarding for every
+# connected client. Tools submit render jobs here and await the result instead.
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", min(2, os.cpu_count() or 1)))
+RENDER_QUEUE_DEPTH = int(os.environ.get("RENDER_QUEUE_DEPTH", 8))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", 10))
+
+
+class RenderPoolError(Exception):
+    pass
+
+
+class RenderBusyError(RenderPoolError):
+    pass
+
+
+class RenderTimeoutError(RenderPoolError):
+    pass
+
+
+def _warm_worker():
+    # Runs once in every worker process: import the heavy libraries and build the
+    # chart engine's figures and a WordCloud so fonts and artists are ready before the
+    # first job.
+    import charts  # noqa: F401
+    from chart_engine import chart_engine
+    from wordcloud_engine import wordcloud_engine
+    chart_engine.warm()
+    wordcloud_engine.warm()
+
+
+def _ping():
+    return os.getpid()
+
+
+class RenderPool:
+    def __init__(self, workers=RENDER_WORKERS, queue_depth=RENDER_QUEUE_DEPTH, timeout=RENDER_TIMEOUT,
+                 initializer=_warm_worker):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        # Runs once in every worker process before its first job
+        self.initializer = initializer
+        self.pending = 0
+        self._executor = None
+
+    def start(self):
+        """Create the worker processes and pre-warm them. Safe to call twice."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+            for _ in range(self.workers):
+                self._executor.submit(_ping)
+        return self
+
+    async def submit(self, fn, *args, timeout=None):
+        """Run fn(*args) in a worker and return its result.
+
+        Raises RenderBusyError when queue_depth jobs are already in flight and
+        RenderTimeoutError when the job does not finish within the timeout.
+        """
+        if self.pending >= self.queue_depth:
+            raise RenderBusyError("Renderer is busy, please try again in a moment.")
+        self.start()
+        # The slot is released when the worker finishes, not when the caller
+        # gives up, so a timed-out job still counts against the queue depth.
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise RenderTimeoutError("Rendering took too long and was abandoned.")
+
+    def _release(self):
+        self.pending -= 1
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool()
+metrics.gauge("live_render_pending", "Render jobs queued or running in the render pool.",
+              function=lambda: render_pool.pending)
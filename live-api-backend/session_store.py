@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from memory import WriteBehind
+
+# Gemini session-resumption handles, one per client.
+# session_handle.json could only be owned by one process; with several workers
+# behind SO_REUSEPORT a client may reconnect to any of them, so handles live in a
+# small SQLite database (WAL mode, safe for concurrent readers and writers on one
+# host) keyed by client. An existing session_handle.json is imported once.
+# SessionHandleManager sits in front of it: handle updates from the Gemini receive
+# loop only touch a dict and are written behind (debounced) by a background thread,
+# and handles older than SESSION_HANDLE_TTL are treated as gone and purged.
+
+SESSION_DB = os.environ.get("SESSION_DB", os.path.join(os.path.dirname(__file__), "sessions.db"))
+SESSION_HANDLE_FILE = os.path.join(os.path.dirname(__file__), "session_handle.json")
+DEFAULT_SESSION_KEY = "default"
+# Gemini keeps a resumable session for a limited time after it ends.
+SESSION_HANDLE_TTL = float(os.environ.get("SESSION_HANDLE_TTL", 2 * 60 * 60))
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", 1.0))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_handles (
+    key TEXT PRIMARY KEY,
+    handle TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SessionHandleStore:
+    def __init__(self, path=SESSION_DB, legacy_file=SESSION_HANDLE_FILE):
+        self.path = path
+        self.legacy_file = legacy_file
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # Connections must not cross a fork, so each worker process opens its own.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+            self._import_legacy()
+        return self._conn
+
+    def _import_legacy(self):
+        marker = f"imported:{os.path.abspath(self.legacy_file)}"
+        if self._conn.execute("SELECT 1 FROM session_meta WHERE key = ?", (marker,)).fetchone():
+            return
+        try:
+            with open(self.legacy_file, "r") as f:
+                handle = json.load(f).get("previous_session_handle")
+        except (OSError, ValueError, AttributeError):
+            handle = None
+        self._conn.execute("BEGIN IMMEDIATE")
+        if handle:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO session_handles (key, handle, updated_at) VALUES (?, ?, ?)",
+                (DEFAULT_SESSION_KEY, handle, time.time()))
+        self._conn.execute("INSERT OR IGNORE INTO session_meta (key, value) VALUES (?, ?)", (marker, str(time.time())))
+        self._conn.execute("COMMIT")
+
+    def get(self, key=DEFAULT_SESSION_KEY):
+        row = self.get_entry(key)
+        return row[0] if row else None
+
+    def get_entry(self, key):
+        """(handle, updated_at) for key, or None."""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT handle, updated_at FROM session_handles WHERE key = ?", (key,)).fetchone()
+
+    def set(self, handle, key=DEFAULT_SESSION_KEY):
+        self.set_many([(key, handle, time.time())])
+
+    def set_many(self, entries):
+        """Write (key, handle, updated_at) entries in one transaction; older writes never win."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO session_handles (key, handle, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET handle = excluded.handle, updated_at = excluded.updated_at "
+                "WHERE excluded.updated_at >= session_handles.updated_at",
+                entries)
+            conn.execute("COMMIT")
+
+    def clear(self, key=DEFAULT_SESSION_KEY):
+        with self._lock:
+            self._connection().execute("DELETE FROM session_handles WHERE key = ?", (key,))
+
+    def purge(self, before):
+        """Delete handles last updated before the given time. Returns how many were removed."""
+        with self._lock:
+            return self._connection().execute(
+                "DELETE FROM session_handles WHERE updated_at < ?", (before,)).rowcount
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+
+class SessionHandleManager:
+    def __init__(self, store, ttl=SESSION_HANDLE_TTL, flush_interval=SESSION_FLUSH_INTERVAL, clock=time.time):
+        self.store = store
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        # key -> (handle, updated_at) written by this process; None marks a cleared handle
+        self._handles = {}
+        self._pending = {}
+        self._writer = WriteBehind(lambda: self.flush(), flush_interval, "session-handle-flush")
+        self.evicted = 0
+
+    def get(self, key):
+        """The newest unexpired handle for key, from this process or any other worker.
+
+        Reads the database, so call it off the event loop (it runs once per connection).
+        """
+        with self._lock:
+            local = self._handles.get(key)
+        entry = local if key in self._pending else None
+        if entry is None:
+            stored = self.store.get_entry(key)
+            entry = max((e for e in (local, stored) if e), key=lambda e: e[1], default=None)
+        if entry is None or entry[0] is None:
+            return None
+        if self.clock() - entry[1] > self.ttl:
+            self.evicted += 1
+            self.clear(key)
+            return None
+        return entry[0]
+
+    def set(self, key, handle):
+        """Remember a new handle. Never blocks: the database write happens in the background."""
+        entry = (handle, self.clock())
+        with self._lock:
+            self._handles[key] = entry
+            self._pending[key] = entry
+        self._writer.poke()
+
+    def clear(self, key):
+        entry = (None, self.clock())
+        with self._lock:
+            self._handles[key] = entry
+            self._pending[key] = entry
+        self._writer.poke()
+
+    def flush(self):
+        """Write pending handles in one transaction and drop expired ones."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            cutoff = self.clock() - self.ttl
+            for key in [k for k, (_, updated_at) in self._handles.items() if updated_at < cutoff]:
+                del self._handles[key]
+                self.evicted += 1
+        writes = [(key, handle, updated_at) for key, (handle, updated_at) in pending.items() if handle is not None]
+        try:
+            if writes:
+                self.store.set_many(writes)
+            for key, (handle, _) in pending.items():
+                if handle is None:
+                    self.store.clear(key)
+            self.store.purge(cutoff)
+        except Exception:
+            with self._lock:
+                for key, entry in pending.items():
+                    self._pending.setdefault(key, entry)
+            raise
+        return len(pending)
+
+    def close(self):
+        self._writer.close()
+        self.flush()
+        self.store.close()
+
+
+session_store = SessionHandleStore()
+session_handles = SessionHandleManager(session_store)
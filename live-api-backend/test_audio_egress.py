@@ -0,0 +1,94 @@
+import asyncio
+import math
+import struct
+import subprocess
+
+import pytest
+
+import audio_egress
+from audio_egress import SAMPLE_RATE, OpusEncoder, opus_available, start_opus_encoder
+from outbound import OutboundQueue
+from protocol import FRAME_AUDIO_OPUS, decode_frame
+
+needs_ffmpeg = pytest.mark.skipif(not opus_available(), reason="ffmpeg not found (set FFMPEG)")
+WEBM_MAGIC = b"\x1a\x45\xdf\xa3"
+
+
+def tone(seconds, freq=220):
+    return b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * freq * i / SAMPLE_RATE)))
+                    for i in range(int(seconds * SAMPLE_RATE)))
+
+
+def decoded_seconds(webm):
+    pcm = subprocess.run([audio_egress.FFMPEG, "-loglevel", "error", "-i", "pipe:0", "-f", "s16le",
+                          "-ar", str(SAMPLE_RATE), "-ac", "1", "pipe:1"],
+                         input=webm, capture_output=True, check=True).stdout
+    return len(pcm) / 2 / SAMPLE_RATE
+
+
+class Collect:
+    def __init__(self):
+        self.data = bytearray()
+
+    async def __call__(self, chunk):
+        self.data.extend(chunk)
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+@needs_ffmpeg
+@pytest.mark.asyncio
+async def test_stream_is_webm_opus_and_much_smaller_than_pcm():
+    out = Collect()
+    encoder = await OpusEncoder(out).start()
+    pcm = tone(2.0)
+    for i in range(0, len(pcm), 1920):
+        await encoder.write(pcm[i:i + 1920])
+    await encoder.close()
+    assert bytes(out.data[:4]) == WEBM_MAGIC
+    assert len(out.data) < len(pcm) / 8
+    assert decoded_seconds(bytes(out.data)) == pytest.approx(2.0, abs=0.1)
+
+
+@needs_ffmpeg
+@pytest.mark.asyncio
+async def test_idle_encoder_flushes_within_latency_bound():
+    out = Collect()
+    encoder = await OpusEncoder(out, max_latency_ms=100).start()
+    await encoder.write(tone(1.0))
+    await asyncio.sleep(0.6)
+    # Everything written so far came out without closing the encoder.
+    assert encoder.flushes == 1
+    assert decoded_seconds(bytes(out.data)) >= 0.98
+    await encoder.close()
+
+
+@needs_ffmpeg
+@pytest.mark.asyncio
+async def test_outbound_queue_sends_encoded_audio_frames():
+    ws = FakeSocket()
+    encoder = await OpusEncoder(audio_egress.opus_sender(ws, binary=True)).start()
+    queue = OutboundQueue(ws, binary=True, encoder=encoder).start()
+    for _ in range(25):
+        queue.put_audio(tone(0.04))
+    queue.end_audio()
+    queue.put_transcription("Gemini", "", True)
+    await queue.close()
+    frames = [decode_frame(m) for m in ws.sent if isinstance(m, bytes)]
+    assert frames and {t for t, _ in frames} == {FRAME_AUDIO_OPUS}
+    assert decoded_seconds(b"".join(bytes(p) for _, p in frames)) >= 0.98
+    assert queue.stats()["encoder"]["flushes"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_pcm_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio_egress, "FFMPEG", "no-such-ffmpeg")
+    assert await start_opus_encoder(FakeSocket(), binary=True) is None
+    assert audio_egress.wants_opus({"audio_format": "opus"})
+    assert not audio_egress.wants_opus({"protocol": "binary-v1"})
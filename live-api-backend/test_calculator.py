@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+import pytest
+
+from calculator import Calculator, CalculatorError, compile_expression, evaluate, format_result
+from tools.info import calculator_tool
+
+
+def test_arithmetic_functions_and_variables():
+    assert evaluate("3 * (4 + 1)") == 15
+    assert evaluate("7 / 2") == 3.5
+    assert evaluate("2 ** 10 % 1000") == 24
+    assert evaluate("round(sqrt(2) * pi, 3)") == 4.443
+    assert evaluate("log(8, 2)") == 3.0
+    assert evaluate("factorial(20)") == 2432902008176640000
+    assert evaluate("r = 2; area = pi * r**2; round(area, 2)") == 12.57
+    assert evaluate("x * y", {"x": 6, "y": 7}) == 42
+
+
+def test_vectors_are_numpy_arrays():
+    assert evaluate("mean([1, 2, 3])") == 2.0
+    assert evaluate("sum([1, 2, 3] * 2)") == 12.0
+    assert evaluate("dot([1, 2], [3, 4])") == 11.0
+    assert evaluate("[1, 2] + [3, 4]").tolist() == [4.0, 6.0]
+    assert format_result(evaluate("range(20)")).endswith("... (20 values)]")
+    with pytest.raises(CalculatorError):
+        evaluate("[1, 2] + [1, 2, 3]")
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os')", "(1).real", "'a' * 3", "lambda: 1", "open", "x = 1", "[i for i in [1]]",
+])
+def test_only_whitelisted_syntax_is_accepted(expression):
+    with pytest.raises(CalculatorError):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9", "10**100000", "factorial(100000)", "2**9000 * 2**9000", "range(10**9)", "1" + "+1" * 5000,
+])
+def test_huge_results_are_refused_quickly(expression):
+    start = time.perf_counter()
+    with pytest.raises(CalculatorError):
+        evaluate(expression)
+    assert time.perf_counter() - start < 0.05
+
+
+def test_long_and_deeply_nested_expressions_are_refused():
+    assert evaluate("+".join(["1"] * 400)) == 400
+    with pytest.raises(CalculatorError, match="too long"):
+        evaluate("+".join(["1"] * 999))
+    with pytest.raises(CalculatorError, match="nested too deeply"):
+        evaluate("-" * 990 + "1")
+    with pytest.raises(CalculatorError, match="nested too deeply"):
+        evaluate("abs(" * 150 + "1" + ")" * 150)
+
+
+def test_step_budget_is_enforced():
+    with pytest.raises(CalculatorError, match="too expensive"):
+        evaluate("sum(range(100000) * 2)", max_steps=50)
+
+
+def test_compiled_expressions_are_cached():
+    compile_expression.cache_clear()
+    for _ in range(5):
+        evaluate("1 + 2 * 3")
+    assert compile_expression.cache_info().hits == 4
+
+
+class InlinePool:
+    def __init__(self):
+        self.jobs = 0
+
+    async def submit(self, fn, *args, timeout=None):
+        self.jobs += 1
+        return fn(*args)
+
+
+@pytest.mark.asyncio
+async def test_heavy_expressions_go_to_the_worker():
+    pool = InlinePool()
+    calc = Calculator(pool)
+    assert await calc.calculate("2 + 2") == 4
+    assert pool.jobs == 0
+    assert await calc.calculate("sum(range(10**6))") == 499999500000.0
+    assert pool.jobs == 1 and calc.offloaded == 1
+
+
+@pytest.mark.asyncio
+async def test_calculator_tool_messages():
+    assert await calculator_tool("6*7") == "Result: 42"
+    assert await calculator_tool("__import__('os')") == "Invalid or unsafe expression."
+    assert await calculator_tool("1/0") == "Error evaluating expression: division by zero"
+    assert await calculator_tool("-" * 990 + "1") == "Error evaluating expression: Expression is nested too deeply"
+    assert np.isclose(float((await calculator_tool("mean([1.5, 2.5])")).split(": ")[1]), 2.0)
@@ -19,4 +19,62 @@ def test_wordcloud():
     resp = client.post("/wordcloud", json={"text": "hello world hello"})
     assert resp.status_code == 200
     assert "image" in resp.json()
-    assert resp.json()["image"].startswith("iVBOR") 
\ No newline at end of file
+    assert resp.json()["image"].startswith("iVBOR") 
+
+
+def test_cache_stats():
+    client.post("/barchart", json={"numbers": [7, 8, 9]})
+    client.post("/barchart", json={"numbers": [7, 8, 9]})
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] >= 1
+    assert stats["entries"] >= 1
+
+def test_png_bytes_when_asked_for():
+    resp = client.post("/barchart", json={"numbers": [1, 2, 3]}, headers={"Accept": "image/png"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.content.startswith(b"\x89PNG")
+
+def test_webp_by_accept_preference_and_query():
+    resp = client.post("/linechart", json={"numbers": [1, 2, 3]},
+                       headers={"Accept": "image/png;q=0.5, image/webp"})
+    assert resp.headers["content-type"] == "image/webp"
+    assert resp.content[:4] == b"RIFF" and resp.content[8:12] == b"WEBP"
+    resp = client.get("/linechart?numbers=1,2,3&format=webp")
+    assert resp.headers["content-type"] == "image/webp"
+
+def test_json_stays_the_default():
+    resp = client.post("/barchart", json={"numbers": [1, 2, 3]}, headers={"Accept": "*/*"})
+    assert resp.json()["image"].startswith("iVBOR")
+
+def test_unchanged_chart_returns_304():
+    first = client.get("/barchart?numbers=14,15,16", headers={"Accept": "image/png"})
+    etag = first.headers["etag"]
+    again = client.get("/barchart?numbers=14,15,16", headers={"Accept": "image/png", "If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    changed = client.get("/barchart?numbers=14,15,17", headers={"Accept": "image/png", "If-None-Match": etag})
+    assert changed.status_code == 200
+    # The same data asked for as JSON is a different representation.
+    as_json = client.post("/barchart", json={"numbers": [14, 15, 16]}, headers={"If-None-Match": etag})
+    assert as_json.status_code == 200 and as_json.headers["etag"] != etag
+
+def test_piechart():
+    resp = client.post("/piechart", json={"numbers": [1, 2, 3], "labels": ["a", "b", "c"]})
+    assert resp.json()["image"].startswith("iVBOR")
+    assert client.post("/piechart", json={"numbers": []}).status_code == 400
+    assert client.post("/piechart", json={"numbers": [1, -2]}).status_code == 400
+
+def test_wordcloud_get_and_empty_text():
+    resp = client.get("/wordcloud", params={"text": "hello world hello", "format": "png"})
+    assert resp.content.startswith(b"\x89PNG")
+    assert client.post("/wordcloud", json={"text": ""}).status_code == 400
+
+def test_streamed_text_wordcloud_matches_json_body():
+    text = "the quick brown fox jumps over the lazy dog " * 2000
+    as_json = client.post("/wordcloud", json={"text": text}, headers={"Accept": "image/png"})
+    chunks = (text[i:i + 1000].encode() for i in range(0, len(text), 1000))
+    streamed = client.post("/wordcloud/text", content=chunks, headers={"Accept": "image/png"})
+    assert streamed.content.startswith(b"\x89PNG")
+    # Same counts, so the same cache key.
+    assert streamed.headers["etag"] == as_json.headers["etag"]
+    assert client.post("/wordcloud/text", content=b"1 2 3").status_code == 400
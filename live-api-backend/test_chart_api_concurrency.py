@@ -0,0 +1,64 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import chart_api
+from chart_api import RenderService, app
+from chart_engine import ChartEngine
+from charts import prepare_render
+from render_pool import RenderBusyError
+
+
+def test_concurrent_requests_each_get_their_own_chart(monkeypatch):
+    # Correctness under load, not shedding: wait for a slot rather than 503.
+    monkeypatch.setattr(chart_api.render_service, "queue_timeout", 60)
+    kinds = ["barchart", "linechart", "piechart"]
+    requests = [(kinds[i % 3], [i + 101, (i * 7) % 13 + 1, i % 5 + 2]) for i in range(36)]
+    engine = ChartEngine()
+    expected = {(kind, tuple(numbers)): engine.render(kind, numbers) for kind, numbers in requests}
+
+    with TestClient(app) as client:
+        def post(request):
+            kind, numbers = request
+            return request, client.post(f"/{kind}?format=png", json={"numbers": numbers})
+
+        with ThreadPoolExecutor(max_workers=12) as threads:
+            results = list(threads.map(post, requests))
+
+    for (kind, numbers), resp in results:
+        assert resp.status_code == 200, resp.text
+        Image.open(io.BytesIO(resp.content)).verify()
+        assert resp.content == expected[(kind, tuple(numbers))]
+
+
+class SlowPool:
+    pending = 0
+
+    async def submit(self, fn, *args):
+        await asyncio.sleep(0.2)
+        return fn(*args)
+
+
+@pytest.mark.asyncio
+async def test_render_service_rejects_when_all_slots_are_busy():
+    service = RenderService(SlowPool(), max_renders=1, queue_timeout=0.01)
+    first = asyncio.create_task(service.render("barchart", prepare_render("barchart", [201, 202])))
+    await asyncio.sleep(0.05)
+    with pytest.raises(RenderBusyError):
+        await service.render("barchart", prepare_render("barchart", [203, 204]))
+    assert (await first).startswith(b"\x89PNG")
+    assert service.stats()["rejected"] == 1
+
+
+def test_busy_render_is_503_with_retry_after(monkeypatch):
+    async def busy(kind, job):
+        raise RenderBusyError("busy")
+
+    monkeypatch.setattr(chart_api.render_service, "render", busy)
+    resp = TestClient(app).post("/linechart", json={"numbers": [301, 302, 303]})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == str(chart_api.CHART_API_RETRY_AFTER)
@@ -0,0 +1,108 @@
+import base64
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from chart_api import app
+from chart_data import ChartData, ChartInputError, bucket_extremes, lttb, minmax, line_points, pie_wedges
+from chart_engine import ChartEngine
+from charts import prepare_render
+
+
+def test_parses_every_input_form():
+    assert ChartData.parse("1, 2,3").series[0].tolist() == [1.0, 2.0, 3.0]
+    assert ChartData.parse(["1", "", "2"]).series[0].tolist() == [1.0, 2.0]
+    assert ChartData.parse(["x"]).empty
+    two = ChartData.parse([[1, 2], [3, 4, 5]])
+    assert [s.tolist() for s in two.series] == [[1.0, 2.0], [3.0, 4.0, 5.0]]
+    named = ChartData.parse({"series": [{"name": "a", "values": [1]}, {"values": [2]}], "labels": ["q1"]})
+    assert named.names == ["a", "Series 2"] and named.labels == ["q1"]
+    packed = base64.b64encode(np.arange(6, dtype="<f4").tobytes()).decode()
+    split = ChartData.parse({"data": packed, "dtype": "float32", "series_count": 2})
+    assert [s.tolist() for s in split.series] == [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]]
+    with pytest.raises(ChartInputError):
+        ChartData.parse({"data": packed, "series_count": 4})
+
+
+def test_digest_depends_on_values_and_labels():
+    assert ChartData.parse([1, 2]).digest() == ChartData.parse("1,2").digest()
+    assert ChartData.parse([1, 2]).digest() != ChartData.parse([2, 1]).digest()
+    assert ChartData.parse({"numbers": [1, 2], "labels": ["a", "b"]}).digest() != ChartData.parse([1, 2]).digest()
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    y = np.sin(np.linspace(0, 20, 100_000))
+    y[54_321] = 50.0
+    x = np.arange(len(y), dtype=float)
+    keep = lttb(x, y, 400)
+    assert len(keep) == 400
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 54_321 in keep
+
+
+def test_minmax_and_bucket_extremes_keep_extremes():
+    y = np.zeros(10_000)
+    y[123], y[9_000] = -7.0, 9.0
+    keep = minmax(y, 200)
+    assert len(keep) <= 200 and 123 in keep and 9_000 in keep
+    starts, widths, values = bucket_extremes(y, 100)
+    assert len(values) == 100 and widths.sum() == len(y)
+    assert values.min() == -7.0 and values.max() == 9.0
+
+
+def test_line_points_drop_non_finite_values():
+    x, y = line_points(np.array([1.0, np.nan, 3.0, np.inf]), 400)
+    assert x.tolist() == [1.0, 3.0] and y.tolist() == [1.0, 3.0]
+
+
+def test_pie_merges_small_wedges():
+    values, labels = pie_wedges(np.arange(1, 21, dtype=float))
+    assert len(values) == 12 and labels[-1] == "Other"
+    assert values.sum() == sum(range(1, 21))
+
+
+@pytest.mark.parametrize("kind", ["linechart", "barchart"])
+def test_render_time_is_bounded_by_plot_width(kind):
+    engine = ChartEngine()
+    rng = np.random.default_rng(1)
+    engine.render(kind, rng.normal(size=100))
+    start = time.perf_counter()
+    small = engine.render(kind, rng.normal(size=1_000))
+    small_time = time.perf_counter() - start
+    start = time.perf_counter()
+    big = engine.render(kind, [rng.normal(size=1_000_000), rng.normal(size=1_000_000)])
+    big_time = time.perf_counter() - start
+    assert big.startswith(b"\x89PNG") and small.startswith(b"\x89PNG")
+    assert big_time < max(1.0, small_time * 10)
+
+
+def test_multi_series_with_names_and_labels_render():
+    data = {"series": [{"name": "2024", "values": [1, 2, 3]}, {"name": "2025", "values": [2, 3, 1]}],
+            "labels": ["a", "b", "c"]}
+    for kind in ("barchart", "linechart", "piechart"):
+        assert ChartEngine().render(kind, data).startswith(b"\x89PNG")
+
+
+def test_label_count_must_match_values():
+    with pytest.raises(ChartInputError, match="2 labels for 3 values"):
+        ChartData.parse({"numbers": [1, 2, 3], "labels": ["a", "b"]})
+    assert TestClient(app).post("/piechart", json={"numbers": [1, 2, 3], "labels": ["a"]}).status_code == 400
+
+
+def test_prepare_render_keys_on_content():
+    assert prepare_render("linechart", [1, 2, 3])[0] == prepare_render("linechart", "1,2,3")[0]
+    assert prepare_render("linechart", []) is None
+
+
+def test_chart_api_accepts_compact_and_multi_series_input():
+    client = TestClient(app)
+    packed = base64.b64encode(np.random.default_rng(2).normal(size=200_000).astype("<f4").tobytes()).decode()
+    resp = client.post("/linechart", json={"data": packed, "dtype": "float32", "series_count": 2, "names": ["a", "b"]})
+    assert resp.status_code == 200
+    assert base64.b64decode(resp.json()["image"]).startswith(b"\x89PNG")
+    resp = client.post("/barchart", json={"series": [[1, 2], [3, 4]], "labels": ["x", "y"]})
+    assert resp.status_code == 200
+    assert client.post("/linechart", json={"data": "AAAA", "series_count": 2}).status_code == 400
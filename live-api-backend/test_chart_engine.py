@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from chart_engine import ChartEngine
+
+
+@pytest.mark.parametrize("kind", ["barchart", "linechart", "piechart"])
+def test_in_place_update_matches_fresh_figure(kind):
+    reused = ChartEngine()
+    reused.render(kind, [5.0, 1.0, 3.0])
+    updated = reused.render(kind, [2.0, 7.0, 4.0])
+    fresh = ChartEngine().render(kind, [2.0, 7.0, 4.0])
+    assert updated == fresh
+
+def test_figures_are_reused():
+    engine = ChartEngine()
+    engine.render("barchart", [1.0, 2.0])
+    slot = engine._idle["barchart"].queue[-1]
+    engine.render("barchart", [3.0, 4.0, 5.0])
+    assert engine._idle["barchart"].queue[-1] is slot
+
+def test_concurrent_renders_are_isolated():
+    engine = ChartEngine()
+    datasets = [[float(i), float(i + 1), float(i * 2 + 1)] for i in range(1, 9)]
+    expected = [ChartEngine().render("linechart", d) for d in datasets]
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda d: engine.render("linechart", d), datasets * 3))
+    assert results == expected * 3
+
+def test_negative_pie_rejected():
+    with pytest.raises(ValueError):
+        ChartEngine().render("piechart", [1.0, -2.0])
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+
+import pytest
+
+import memory
+import memory_index
+from event_log import EventLog, EventLogManager, EventLogReader, compact, log_dir, replay_conversation, summarize
+from memory import MemoryStore
+from word_counts import ConversationCloud
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = MemoryStore(str(tmp_path / "memory_store.json"))
+    monkeypatch.setattr(memory, "_store", store)
+    monkeypatch.setattr(memory_index, "_indexes", {})
+    monkeypatch.setattr(memory_index, "index_path", lambda ns: str(tmp_path / "index" / ns))
+    return store
+
+
+def write_events(log, count, kind="transcription"):
+    for i in range(count):
+        log.append(kind, speaker="Gemini" if i % 2 else "User", text=f" word{i}", finished=False)
+    log.flush()
+
+
+def test_segments_roll_over_and_seal(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=2000)
+    write_events(log, 10)
+    write_events(log, 40)
+    log.append("turn_complete")
+    log.close()
+    reader = EventLogReader(str(tmp_path))
+    names = [os.path.basename(p) for p in reader.segments()]
+    assert len(names) >= 2 and all(name.endswith(".jsonl") for name in names)
+    events = list(reader.events())
+    assert len(events) == 51 and events[-1] == {"t": events[-1]["t"], "type": "turn_complete"}
+    assert [e["text"] for e in events[:3]] == [" word0", " word1", " word2"]
+    times = [e["t"] for e in events]
+    assert times == sorted(times) and len(set(times)) == len(times)
+
+
+def test_time_range_queries_match_a_full_scan(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=4000)
+    for i in range(300):
+        log.append("tool_call" if i % 7 == 0 else "transcription", n=i)
+        if i % 25 == 0:
+            log.flush()
+    log.flush()  # the last segment stays active
+    reader = EventLogReader(str(tmp_path))
+    everything = list(reader.events())
+    assert [e["n"] for e in everything] == list(range(300))
+    start, end = everything[40]["t"], everything[260]["t"]
+    assert [e["n"] for e in reader.events(start, end)] == list(range(40, 260))
+    assert [e["n"] for e in reader.events(start=everything[-1]["t"] + 1)] == []
+    assert [e["n"] for e in reader.events(end, kinds=["tool_call"])] == [n for n in range(260, 300) if n % 7 == 0]
+
+
+def test_partial_last_line_is_not_read(tmp_path):
+    log = EventLog(str(tmp_path))
+    write_events(log, 3)
+    with open(EventLogReader(str(tmp_path)).segments()[0], "ab") as f:
+        f.write(b'{"t":99999999999.0,"type":"transcr')
+    assert len(list(EventLogReader(str(tmp_path)).events())) == 3
+
+
+def test_summary_has_topics_speakers_and_tools():
+    t = time.time()
+    events = [
+        {"t": t, "type": "text", "speaker": "User", "text": "why do rainbows appear after rain"},
+        {"t": t + 1, "type": "transcription", "speaker": "Gemini", "text": "Rainbows appear when sun", "finished": False},
+        {"t": t + 2, "type": "transcription", "speaker": "Gemini", "text": "light passes through rain drops", "finished": True},
+        {"t": t + 3, "type": "tool_call", "name": "wordcloud", "args": {}},
+    ]
+    key, text = summarize(events)
+    assert key.startswith("conversation ")
+    lines = text.splitlines()
+    assert lines[0].startswith("Topics: ") and "rainbows" in lines[0]
+    assert lines[1] == "User: why do rainbows appear after rain"
+    assert lines[2] == "Gemini: Rainbows appear when sunlight passes through rain drops"
+    assert lines[3] == "Tools used: wordcloud"
+    assert summarize(events[3:]) is None
+
+
+def test_compaction_fills_context_memory_once(tmp_path, store):
+    directory = str(tmp_path / "log")
+    log = EventLog(directory, segment_bytes=500)
+    write_events(log, 30)
+    log.close()
+    # Memory disabled: nothing is written to context and the log is deleted.
+    assert compact(directory, "default", keep_segments=1) is None
+    assert store.memory["context"] == {} and EventLogReader(directory).segments() == []
+    store.enable()
+    log = EventLog(directory)
+    write_events(log, 4)
+    log.close()
+    key = compact(directory, "default", keep_segments=1)
+    assert "word29" not in store.memory["context"][key] and "word3" in store.memory["context"][key]
+    assert compact(directory, "default") is None
+    # The summary is recallable like any other context entry.
+    assert memory.recall("rain word3", namespace="default")[0]["key"] == key
+    # Summarized sealed segments are kept for replay up to the newest keep_segments.
+    assert len(EventLogReader(directory).segments()) == 1
+
+
+def test_buffered_events_of_a_concurrent_writer_are_compacted_later(tmp_path, store):
+    store.enable()
+    directory = str(tmp_path / "log")
+    slow, fast = EventLog(directory, "default"), EventLog(directory, "default")
+    slow.append("text", speaker="User", text="early words")
+    fast.append("text", speaker="User", text="later words")
+    fast.close()
+    first = compact(directory, "default")
+    assert "later" in store.memory["context"][first] and "early" not in store.memory["context"][first]
+    slow.close()
+    second = compact(directory, "default")
+    assert "early" in store.memory["context"][second]
+    assert compact(directory, "default") is None
+
+
+def test_nothing_is_logged_or_replayed_while_memory_is_disabled(tmp_path, store):
+    directory = str(tmp_path / "log")
+    log = EventLog(directory, "default")
+    log.append("text", speaker="User", text="secret plans")
+    assert log.flush() == 0 and EventLogReader(directory).segments() == []
+    store.enable()
+    log.append("text", speaker="User", text="rainbow plans")
+    log.close()
+    conversation = ConversationCloud()
+    assert replay_conversation(directory, conversation, 0, "default") == 1
+    assert conversation.frequencies() == {"rainbow": 1, "plans": 1}
+    store.disable()
+    assert replay_conversation(directory, ConversationCloud(), 0, "default") == 0
+
+
+def test_manager_writes_in_the_background(tmp_path):
+    manager = EventLogManager(root=str(tmp_path), flush_interval=0.05, compact_interval=3600)
+    log = manager.open("client/with:odd chars")
+    assert os.path.dirname(log.directory) == str(tmp_path) and "/" not in os.path.basename(log.directory)
+    assert log_dir("abc-123", str(tmp_path)) == os.path.join(str(tmp_path), "abc-123")
+    log.append("text", speaker="User", text="hello")
+    deadline = time.monotonic() + 2
+    while log.written == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log.written == 1
+    manager.close_all()
+    line = open(EventLogReader(log.directory).segments()[0]).read()
+    assert line.startswith('{"t":') and json.loads(line)["text"] == "hello"
+
+
+def test_clear_deletes_the_log(tmp_path, store):
+    store.enable()
+    manager = EventLogManager(root=str(tmp_path), flush_interval=3600, compact_interval=3600)
+    log = manager.open("client-1", "default")
+    log.append("text", speaker="User", text="hello")
+    log.flush()
+    manager.clear(log)
+    assert not os.path.exists(log.directory)
+    log.append("text", speaker="User", text="after clearing")
+    manager.close(log)
+    assert [e["text"] for e in EventLogReader(log.directory).events()] == ["after clearing"]
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+import websockets
+
+os.environ.setdefault("FAKE_GEMINI", "1")
+import live_api
+import loadtest
+import memory
+import memory_index
+from audio_egress import opus_available
+from event_log import EventLogManager, EventLogReader, log_dir
+from fake_gemini import FakeClient, FakeLiveSession
+from memory_sqlite import SQLiteMemoryStore
+from protocol import FRAME_AUDIO_OPUS, FRAME_AUDIO_PCM, PROTOCOL_BINARY, decode_frame, encode_frame
+from session_store import SessionHandleManager, SessionHandleStore
+
+FAST = dict(first_audio_ms=20, utterance_ms=200, end_of_speech_ms=100, reply_ms=120, chunk_ms=40)
+
+
+@pytest_asyncio.fixture
+async def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(live_api, "client", FakeClient(**FAST))
+    handles = SessionHandleManager(SessionHandleStore(str(tmp_path / "sessions.db"), legacy_file=str(tmp_path / "none.json")))
+    monkeypatch.setattr(live_api, "session_handles", handles)
+    monkeypatch.setattr(live_api, "event_logs", EventLogManager(root=str(tmp_path / "event_logs")))
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"))
+    monkeypatch.setattr(memory, "_store", store)
+    monkeypatch.setattr(memory_index, "_indexes", {})
+    monkeypatch.setattr(memory_index, "index_path", lambda ns: str(tmp_path / "index" / ns))
+    server = await websockets.serve(live_api.gemini_session_handler, "127.0.0.1", 0,
+                                    process_request=live_api.process_request)
+    yield f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    server.close()
+    await server.wait_closed()
+    live_api.event_logs.close_all()
+    store.close()
+    handles.close()
+
+
+@pytest.mark.asyncio
+async def test_fake_session_scripts_a_reply_turn():
+    session = FakeLiveSession(**FAST)
+    await session.send(input={"mime_type": "audio/pcm", "data": b"\x00" * 6400})
+    messages = [m async for m in session.receive()]
+    audio = [m for m in messages if m.server_content and m.server_content.model_turn]
+    assert len(audio) == 3
+    assert audio[0].server_content.output_transcription.text
+    assert any(m.usage_metadata for m in messages)
+    assert any(m.session_resumption_update and m.session_resumption_update.resumable for m in messages)
+    assert messages[-1].server_content.turn_complete
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_short_utterance_is_answered_after_end_of_speech():
+    session = FakeLiveSession(**FAST)
+    await session.send(input={"mime_type": "audio/pcm", "data": b"\x00" * 320})
+    assert session.turns == 0
+    messages = [m async for m in session.receive()]
+    assert session.turns == 1 and messages[-1].server_content.turn_complete
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_fake_session_calls_configured_tools():
+    config = SimpleNamespace(tools=[live_api.registry.gemini_tool(["current_time"])])
+    session = FakeLiveSession(config, tool_call_every=1, **FAST)
+    await session.send_client_content()
+    first = await anext(session.receive())
+    assert first.tool_call.function_calls[0].name == "current_time"
+    await session.send_tool_response(function_responses=[])
+    messages = [m async for m in session.receive()]
+    assert messages[-1].server_content.turn_complete
+    assert session.stats()["tool_responses"] == 1
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_handler_streams_fake_reply_to_binary_client(server):
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"protocol": PROTOCOL_BINARY, "client_id": "test-client"}))
+        assert json.loads(await ws.recv()) == {"protocol": PROTOCOL_BINARY}
+        for _ in range(2):
+            await ws.send(encode_frame(FRAME_AUDIO_PCM, b"\x00" * 3200))
+        audio_frames = 0
+        while True:
+            message = await ws.recv()
+            if isinstance(message, bytes):
+                assert decode_frame(message)[0] == FRAME_AUDIO_PCM
+                audio_frames += 1
+            elif json.loads(message)["transcription"]["finished"]:
+                break
+    assert audio_frames >= 1
+    assert live_api.session_handles.get("test-client")
+
+
+@pytest.mark.asyncio
+async def test_handler_answers_native_tool_calls(server, monkeypatch):
+    fake = FakeClient(tool_call_every=1, tool_names=["current_time"], **FAST)
+    monkeypatch.setattr(live_api, "client", fake)
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"client_id": "tool-client"}))
+        await ws.send(json.dumps({"text": "tell me something"}))
+        while True:
+            data = json.loads(await ws.recv())
+            if data.get("transcription", {}).get("finished"):
+                break
+    assert fake.aio.live.sessions[0].tool_responses == 1
+
+
+async def finished_turn(ws):
+    while True:
+        message = await ws.recv()
+        if isinstance(message, str) and json.loads(message).get("transcription", {}).get("finished"):
+            return
+
+
+@pytest.mark.asyncio
+async def test_conversation_is_logged_and_replayed_on_resume(server):
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"client_id": "log-client"}))
+        await ws.send(json.dumps({"text": "", "memory": "enable"}))
+        assert json.loads(await ws.recv())["memory_status"] == "enabled"
+        await ws.send(json.dumps({"text": "tell me about rainbows"}))
+        await finished_turn(ws)
+    directory = log_dir("log-client", live_api.event_logs.root)
+    reader = EventLogReader(directory)
+    for _ in range(100):
+        if reader.segments(sealed_only=True):
+            break
+        await asyncio.sleep(0.05)
+    events = list(reader.events())
+    assert [e["type"] for e in events][:1] == ["text"]
+    assert any(e["type"] == "transcription" and e["speaker"] == "Gemini" for e in events)
+    assert events[-1]["type"] == "turn_complete"
+    # The resumed session starts with the logged conversation's word counts.
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"client_id": "log-client"}))
+        await ws.send(json.dumps({"text": "conversation word cloud"}))
+        reply = json.loads(await ws.recv())
+        assert reply["wordcloud"].startswith("iVBOR")
+        # Clearing memory deletes the log.
+        await ws.send(json.dumps({"text": "", "memory": "clear"}))
+        assert json.loads(await ws.recv())["memory_status"] == "cleared"
+    assert not os.path.exists(directory)
+
+
+@pytest.mark.asyncio
+async def test_conversation_is_not_logged_while_memory_is_disabled(server):
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"client_id": "private-client"}))
+        await ws.send(json.dumps({"text": "tell me about rainbows"}))
+        await finished_turn(ws)
+    live_api.event_logs.close_all()
+    assert EventLogReader(log_dir("private-client", live_api.event_logs.root)).segments() == []
+
+
+@pytest.mark.asyncio
+async def test_loadtest_reports_latency_against_fake_server(server):
+    args = SimpleNamespace(url=server, sessions=3, seconds=0.5, ramp=0.1, utterance_ms=200,
+                           image_fps=5, tool_every=2, reply_timeout=5)
+    report = await loadtest.run(args)
+    assert report["sessions_held"] == "3/3"
+    assert report["turns"] >= 3 and report["reply_timeouts"] == 0
+    assert report["reply_first_audio_ms"]["p50"] >= FAST["first_audio_ms"]
+    assert report["tool_reply_ms"] is not None
+    assert "server_kb_per_session" in report
+
+
+@pytest.mark.skipif(not opus_available(), reason="ffmpeg not found (set FFMPEG)")
+@pytest.mark.asyncio
+async def test_handler_streams_opus_when_negotiated(server):
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"protocol": PROTOCOL_BINARY, "audio_format": "opus", "client_id": "opus-client"}))
+        assert json.loads(await ws.recv()) == {"protocol": PROTOCOL_BINARY}
+        assert json.loads(await ws.recv())["audio_format"] == "opus"
+        await ws.send(json.dumps({"text": "hello"}))
+        opus = bytearray()
+        finished = False
+        # Encoded audio trails the JSON messages by the encoder's delay.
+        while not (finished and opus):
+            message = await asyncio.wait_for(ws.recv(), 5)
+            if isinstance(message, bytes):
+                frame_type, payload = decode_frame(message)
+                assert frame_type == FRAME_AUDIO_OPUS
+                opus.extend(payload)
+            elif json.loads(message).get("transcription", {}).get("finished"):
+                finished = True
+    assert opus.startswith(b"\x1a\x45\xdf\xa3")
+
+
+@pytest.mark.asyncio
+async def test_bad_memory_commands_get_an_error_reply(server):
+    async with websockets.connect(server) as ws:
+        await ws.send(json.dumps({"client_id": "bad-memory-client"}))
+        for command in ({"memory": "remember", "section": "diary", "key": "k", "value": "v"},
+                        {"memory": "forget", "section": "diary", "key": "k"},
+                        {"memory": "forget"}):
+            await ws.send(json.dumps({"text": "", **command}))
+            assert json.loads(await ws.recv())["memory_status"].startswith("error: ")
+        await ws.send(json.dumps({"text": "", "memory": "remember", "key": "pet", "value": "a dog"}))
+        assert json.loads(await ws.recv())["memory_status"] == "remembered: pet"
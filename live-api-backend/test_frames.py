@@ -0,0 +1,51 @@
+import io
+import pytest
+from PIL import Image, ImageDraw
+from frames import FrameFilter, frame_pool, process_frame
+from render_pool import RenderPool, render_pool
+
+
+def screen(text="hello", size=(1920, 1080), fmt="PNG"):
+    image = Image.new("RGB", size, "white")
+    ImageDraw.Draw(image).rectangle((100, 100, 700, 400), fill="navy")
+    ImageDraw.Draw(image).text((900, 500), text, fill="black")
+    buf = io.BytesIO()
+    image.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class InlinePool:
+    async def submit(self, fn, *args):
+        return fn(*args)
+
+
+def test_frames_are_downscaled_to_jpeg():
+    mime, data, signature = process_frame(screen(), "image/png", max_size=640)
+    assert mime == "image/jpeg"
+    assert max(Image.open(io.BytesIO(data)).size) == 640
+    assert len(signature) == 32 * 32
+
+def test_small_jpeg_passes_through_untouched():
+    original = screen(size=(400, 300), fmt="JPEG")
+    assert process_frame(original, "image/jpeg", max_size=640)[1] == original
+
+@pytest.mark.asyncio
+async def test_unchanged_screens_are_dropped():
+    frame_filter = FrameFilter(pool=InlinePool(), max_size=640)
+    assert await frame_filter("image/png", screen()) is not None
+    # a re-encode of the same screen is byte-different but visually identical
+    assert await frame_filter("image/jpeg", screen(fmt="JPEG")) is None
+    assert await frame_filter("image/png", screen("a much longer line of different text " * 4)) is not None
+    stats = frame_filter.stats()
+    assert stats["frames_in"] == 3 and stats["frames_unchanged"] == 1
+    assert stats["bytes_out"] < stats["bytes_in"]
+
+@pytest.mark.asyncio
+async def test_frames_have_their_own_pool():
+    # Chart and calculator jobs cannot fill up the queue that screen frames wait in.
+    assert FrameFilter().pool is frame_pool and frame_pool is not render_pool
+    pool = RenderPool(workers=1, queue_depth=2, initializer=frame_pool.initializer)
+    try:
+        assert await FrameFilter(pool=pool)("image/png", screen()) is not None
+    finally:
+        pool.shutdown()
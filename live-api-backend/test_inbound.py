@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from inbound import InboundShaper
+
+
+class Upstream:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, mime_type, data):
+        await asyncio.sleep(self.delay)
+        self.sent.append((mime_type, data))
+
+
+@pytest.mark.asyncio
+async def test_small_pcm_chunks_are_combined_into_frames():
+    upstream = Upstream()
+    # 100ms at 16kHz 16-bit = 3200 bytes
+    shaper = InboundShaper(upstream.send, audio_frame_ms=100).start()
+    for _ in range(16):
+        await shaper.put_audio(b"\x01" * 400)
+    await asyncio.sleep(0.01)
+    assert [len(d) for _, d in upstream.sent] == [3200, 3200]
+    await shaper.put_audio(b"\x02" * 400)
+    await asyncio.sleep(0.15)  # a partial frame goes out once the frame duration has passed
+    assert [len(d) for _, d in upstream.sent] == [3200, 3200, 400]
+    await shaper.close()
+    assert shaper.stats()["audio_chunks_in"] == 17 and shaper.stats()["audio_frames_out"] == 3
+
+@pytest.mark.asyncio
+async def test_images_are_throttled_and_deduplicated():
+    upstream = Upstream()
+    shaper = InboundShaper(upstream.send, image_fps=10).start()
+    shaper.put_image("image/jpeg", b"frame-1")
+    await asyncio.sleep(0.01)
+    for i in range(5):  # within the same 100ms slot: only the newest survives
+        shaper.put_image("image/jpeg", f"frame-{i + 2}".encode())
+    await asyncio.sleep(0.15)
+    shaper.put_image("image/jpeg", b"frame-6")  # unchanged screen
+    await asyncio.sleep(0.15)
+    await shaper.close()
+    assert [d for _, d in upstream.sent] == [b"frame-1", b"frame-6"]
+    stats = shaper.stats()
+    assert stats["images_replaced"] == 4 and stats["images_duplicate"] == 1
+
+@pytest.mark.asyncio
+async def test_slow_upstream_applies_backpressure():
+    upstream = Upstream(delay=0.05)
+    shaper = InboundShaper(upstream.send, audio_frame_ms=10, max_buffer_ms=20).start()
+    for _ in range(20):
+        await shaper.put_audio(b"\x00" * 320)  # 10ms each
+    await shaper.close(timeout=5)
+    assert shaper.stats()["backpressure_waits"] > 0
+    assert sum(len(d) for _, d in upstream.sent) == 20 * 320
+
+@pytest.mark.asyncio
+async def test_upstream_errors_surface_on_next_put():
+    async def broken(mime_type, data):
+        raise ConnectionError("upstream closed")
+    shaper = InboundShaper(broken, audio_frame_ms=10).start()
+    await shaper.put_audio(b"\x00" * 320)
+    await asyncio.sleep(0.01)
+    with pytest.raises(ConnectionError):
+        await shaper.put_audio(b"\x00" * 320)
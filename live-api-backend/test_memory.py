@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from memory import MemoryStore, DEFAULT_NAMESPACE
+
+
+def test_reads_do_not_touch_disk(tmp_path):
+    path = tmp_path / "memory_store.json"
+    store = MemoryStore(str(path), flush_interval=60)
+    store.update(lambda mem: mem["preferences"].update(color="blue"))
+    assert store.get_preference(DEFAULT_NAMESPACE, "color") == "blue"
+    assert not path.exists()  # still waiting for the write-behind flush
+    store.close()
+    assert json.loads(path.read_text())["preferences"] == {"color": "blue"}
+
+def test_writes_are_coalesced(tmp_path):
+    path = tmp_path / "memory_store.json"
+    store = MemoryStore(str(path), flush_interval=60)
+    for i in range(50):
+        store.update(lambda mem, i=i: mem["preferences"].__setitem__(f"k{i}", i))
+    assert store.flush() is True
+    assert store.flush() is False  # nothing changed since
+    assert store.flushes == 1
+    store.close()
+    assert len(json.loads(path.read_text())["preferences"]) == 50
+
+def test_threshold_triggers_background_flush(tmp_path):
+    path = tmp_path / "memory_store.json"
+    store = MemoryStore(str(path), flush_interval=60, flush_threshold=5)
+    flushed = threading.Event()
+    original = store.flush
+    store.flush = lambda: (original(), flushed.set())[0]
+    for i in range(5):
+        store.update(lambda mem, i=i: mem["preferences"].__setitem__(f"k{i}", i))
+    assert flushed.wait(5)
+    assert len(json.loads(path.read_text())["preferences"]) == 5
+    store.close()
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    path = tmp_path / "memory_store.json"
+    store = MemoryStore(str(path), flush_interval=0.01)
+
+    def writer(n):
+        for i in range(200):
+            store.update(lambda mem: mem["preferences"].__setitem__(f"{n}-{i}", i))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.close()
+    assert len(MemoryStore(str(path)).memory["preferences"]) == 800
+
+def test_reload_and_defaults(tmp_path):
+    path = tmp_path / "memory_store.json"
+    path.write_text(json.dumps({"enabled": True, "preferences": {"name": "Ada"}}))
+    store = MemoryStore(str(path))
+    assert store.memory["enabled"] is True
+    assert store.get_preference(DEFAULT_NAMESPACE, "name") == "Ada"
+    assert store.memory["context"] == {} and store.memory["knowledge"] == {}
+    store.replace(store.memory)
+    assert store.get_preference(DEFAULT_NAMESPACE, "name") == "Ada"
+    store.close()
+
+
+def test_accessors_return_snapshots(tmp_path):
+    store = MemoryStore(str(tmp_path / "memory_store.json"))
+    status = store.set_preference(DEFAULT_NAMESPACE, "name", "Ada")
+    store.set_preference(DEFAULT_NAMESPACE, "city", "Paris")
+    status["preferences"]["name"] = "Bob"
+    assert status["preferences"] == {"name": "Bob"}
+    assert store.status()["preferences"] == {"name": "Ada", "city": "Paris"}
+    store.close()
+
+
+def test_set_item_cost_does_not_grow_with_the_store(tmp_path):
+    def set_item_seconds(entries):
+        store = MemoryStore(str(tmp_path / f"memory_{entries}.json"), flush_interval=3600)
+        store.update(lambda mem: mem["context"].update({f"old {i}": "x" * 200 for i in range(entries)}))
+        started = time.perf_counter()
+        for i in range(200):
+            store.set_item(DEFAULT_NAMESPACE, "context", "current turn", f"fragment {i}")
+        elapsed = time.perf_counter() - started
+        store.close()
+        return elapsed
+
+    small, large = set_item_seconds(10), set_item_seconds(5000)
+    # A copy of 5000 entries per write would make this ~100x slower.
+    assert large < small * 5 + 0.01
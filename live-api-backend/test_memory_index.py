@@ -0,0 +1,52 @@
+import memory
+from memory import MemoryStore
+from memory_index import VectorIndex
+
+
+def test_search_ranks_relevant_entries_first():
+    index = VectorIndex()
+    index.add_many([
+        ("knowledge/pet", "pet: the user has a dog called Rex"),
+        ("knowledge/city", "city: the user lives in Lisbon"),
+        ("knowledge/food", "food: favourite food is ramen"),
+    ])
+    assert index.search("what is my dog called", k=1)[0][0] == "knowledge/pet"
+    results = index.search_many(["where do I live", "I want some ramen"], k=2)
+    assert results[0][0][0] == "knowledge/city"
+    assert results[1][0][0] == "knowledge/food"
+    assert index.search("quantum chromodynamics", min_score=0.1) == []
+
+def test_add_replace_and_delete():
+    index = VectorIndex()
+    for i in range(300):  # past the initial capacity
+        index.add(f"k{i}", f"note number {i} about topic{i}")
+    index.add("k5", "now about gardening")
+    assert len(index) == 300
+    assert index.search("gardening", k=1)[0][0] == "k5"
+    assert index.delete("k5") and not index.delete("k5")
+    assert "k5" not in index and len(index) == 299
+    assert index.search("note number 299 about topic299", k=1)[0][0] == "k299"  # the moved row is still findable
+
+def test_memory_mapped_index_reopens(tmp_path):
+    index = VectorIndex(str(tmp_path), flush_interval=60)
+    assert index.created
+    index.add_many((f"k{i}", f"fact {i} word{i}") for i in range(400))
+    index.delete("k0")
+    index.close()
+    reopened = VectorIndex(str(tmp_path))
+    assert not reopened.created and len(reopened) == 399
+    assert reopened.search("word123", k=1)[0][0] == "k123"
+    reopened.close()
+
+def test_recall_through_memory_api(tmp_path, monkeypatch):
+    import memory_index
+    monkeypatch.setattr(memory, "_store", MemoryStore(str(tmp_path / "memory_store.json")))
+    monkeypatch.setattr(memory_index, "MEMORY_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(memory_index, "_indexes", {})
+    monkeypatch.setattr(memory_index, "index_path", lambda ns: str(tmp_path / "index" / ns))
+    memory.remember("knowledge", "pet", "a dog called Rex")
+    memory.remember("context", "trip", "planning a trip to Japan")
+    assert [m["key"] for m in memory.recall("tell me about my dog", k=1)] == ["pet"]
+    memory.forget("knowledge", "pet")
+    assert [m["key"] for m in memory.recall("dog")] == []
+    memory.close_store()
@@ -0,0 +1,74 @@
+import json
+from memory_sqlite import SQLiteMemoryStore, namespace_for
+
+
+def test_namespaces_are_isolated(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"), flush_interval=60)
+    store.enable("alice")
+    store.set_preference("alice", "color", "blue")
+    store.set_preference("bob", "color", "red")
+    assert store.get_preference("alice", "color") == "blue"  # served from the write buffer
+    assert store.get_preference("bob", "color") == "red"
+    assert store.status("alice")["enabled"] is True
+    assert store.status("bob")["enabled"] is False
+    store.clear("alice")
+    assert store.get_preference("alice", "color") is None
+    assert store.get_preference("bob", "color") == "red"
+    store.close()
+
+def test_writes_are_batched_and_persist(tmp_path):
+    path = str(tmp_path / "memory.db")
+    store = SQLiteMemoryStore(path, flush_interval=60)
+    for i in range(50):
+        store.set_item("u1", "knowledge", f"k{i:02d}", {"n": i})
+    store.delete_item("u1", "knowledge", "k00")
+    assert store.flush() == 50
+    assert store.flush() == 0
+    store.close()
+    reopened = SQLiteMemoryStore(path)
+    assert reopened.count("u1", "knowledge") == 49
+    assert reopened.get_item("u1", "knowledge", "k07") == {"n": 7}
+    reopened.close()
+
+def test_paging(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"))
+    store.set_items("u1", "context", {f"k{i:03d}": i for i in range(25)})
+    seen, cursor = {}, None
+    while True:
+        items, cursor = store.page("u1", "context", limit=10, after=cursor)
+        seen.update(items)
+        if cursor is None:
+            break
+    assert list(seen) == [f"k{i:03d}" for i in range(25)]
+    store.close()
+
+def test_migrate_json_once(tmp_path):
+    source = tmp_path / "memory_store.json"
+    source.write_text(json.dumps({"enabled": True, "preferences": {"name": "Ada"},
+                                  "context": {"topic": "maths"}, "knowledge": {}}))
+    store = SQLiteMemoryStore(str(tmp_path / "memory.db"))
+    assert store.migrate_json(str(source), only_once=True) == 2
+    assert store.migrate_json(str(source), only_once=True) == 0
+    mem = store.status()
+    assert mem["enabled"] is True
+    assert mem["preferences"] == {"name": "Ada"} and mem["context"] == {"topic": "maths"}
+    store.close()
+
+def test_enabled_flag_is_cached_for_a_flush_interval(tmp_path):
+    path = str(tmp_path / "memory.db")
+    store = SQLiteMemoryStore(path, flush_interval=60)
+    other = SQLiteMemoryStore(path, flush_interval=0)
+    store.enable("alice")
+    store.flush()
+    assert store.is_enabled("alice") is True
+    other.disable("alice")
+    other.flush()
+    assert store.is_enabled("alice") is True  # another worker's change shows after the interval
+    assert other.is_enabled("alice") is False
+    store.close()
+    other.close()
+
+def test_namespace_for():
+    assert namespace_for() == "default"
+    assert namespace_for("u1") == "u1"
+    assert namespace_for("u1", "s9") == "u1/s9"
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import pytest
+from fastapi.testclient import TestClient
+
+import logs
+from metrics import MetricsRegistry, Histogram, SessionMetrics, FORWARD_LATENCY, FIRST_AUDIO_LATENCY, SESSIONS_ACTIVE, \
+    INBOUND_BUFFERED, SESSION_DURATION, SESSION_FIRST_AUDIO_P99, SESSION_FORWARD_P99
+from inbound import InboundShaper
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    hist = registry.histogram("test_seconds", "Test.", labels=("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        hist.observe(value, kind="audio")
+    text = registry.render_text()
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{kind="audio",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{kind="audio",le="1.0"} 3' in text
+    assert 'test_seconds_bucket{kind="audio",le="+Inf"} 4' in text
+    assert 'test_seconds_count{kind="audio"} 4' in text
+
+
+def test_histogram_quantile_interpolates_within_bucket():
+    hist = Histogram("q", buckets=(0.1, 0.2, 0.3))
+    for _ in range(90):
+        hist.observe(0.05)
+    for _ in range(10):
+        hist.observe(0.25)
+    assert hist.quantile(0.5) < 0.1
+    assert 0.2 < hist.quantile(0.99) <= 0.3
+    assert Histogram("empty").quantile(0.5) is None
+
+
+def test_counter_gauge_and_callback_gauge():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", labels=("kind",))
+    counter.inc(3, kind="prompt")
+    counter.inc(kind="prompt")
+    assert counter.value(kind="prompt") == 4
+    depth = [7]
+    registry.gauge("g", function=lambda: depth[0])
+    assert "g 7" in registry.render_text()
+    # Registering the same name again returns the existing metric.
+    assert registry.counter("c_total") is counter
+
+
+def test_session_metrics_feed_global_histograms():
+    before_forward = FORWARD_LATENCY.count(kind="audio")
+    before_first = FIRST_AUDIO_LATENCY.count()
+    active = SESSIONS_ACTIVE.value()
+    session = SessionMetrics()
+    assert SESSIONS_ACTIVE.value() == active + 1
+    session.reply_audio()  # nothing sent yet, not a reply
+    session.forwarded("audio", 0)
+    session.reply_audio()
+    session.reply_audio()  # only the first audio of a reply counts
+    assert FORWARD_LATENCY.count(kind="audio") == before_forward + 1
+    assert FIRST_AUDIO_LATENCY.count() == before_first + 1
+    assert session.summary()["replies"] == 1
+    before = (SESSION_DURATION.count(), SESSION_FIRST_AUDIO_P99.count(),
+              SESSION_FORWARD_P99.count(kind="audio"), SESSION_FORWARD_P99.count(kind="image"))
+    session.close()
+    assert SESSIONS_ACTIVE.value() == active
+    # The session's own tail latencies are exported once it ends.
+    assert (SESSION_DURATION.count(), SESSION_FIRST_AUDIO_P99.count(), SESSION_FORWARD_P99.count(kind="audio"),
+            SESSION_FORWARD_P99.count(kind="image")) == (before[0] + 1, before[1] + 1, before[2] + 1, before[3])
+
+
+@pytest.mark.asyncio
+async def test_inbound_reports_forward_latency():
+    class Recorder:
+        def __init__(self):
+            self.kinds = []
+
+        def forwarded(self, kind, arrived_at):
+            self.kinds.append(kind)
+
+    async def send(mime_type, data):
+        pass
+
+    recorder = Recorder()
+    buffered = INBOUND_BUFFERED.value()
+    shaper = InboundShaper(send, audio_frame_ms=10, metrics=recorder).start()
+    await shaper.put_audio(b"\x00" * 320)
+    assert INBOUND_BUFFERED.value() == buffered + 320
+    shaper.put_image("image/jpeg", b"jpeg")
+    await asyncio.sleep(0.05)
+    await shaper.close()
+    assert sorted(recorder.kinds) == ["audio", "image"]
+    assert INBOUND_BUFFERED.value() == buffered
+
+
+def test_sampled_logging_emits_one_in_n(caplog):
+    logger = logging.getLogger("test_metrics.sampled")
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        for i in range(25):
+            logs.sampled(logger, logging.DEBUG, "test-key", "message %d", i, every=10)
+    assert [r.getMessage().split(" (")[0] for r in caplog.records] == ["message 0", "message 10", "message 20"]
+
+
+def test_chart_api_serves_metrics():
+    from chart_api import app
+    client = TestClient(app)
+    client.post("/barchart", json={"numbers": [1, 2, 3]})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "live_render_seconds" in response.text
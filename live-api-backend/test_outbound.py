@@ -0,0 +1,80 @@
+import asyncio
+import json
+import pytest
+from outbound import OutboundQueue
+from protocol import FRAME_AUDIO_PCM, decode_frame
+
+
+class SlowSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, message):
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+
+@pytest.mark.asyncio
+async def test_queued_audio_is_merged_up_to_budget():
+    ws = SlowSocket()
+    # 40ms at 24kHz 16-bit = 1920 bytes per frame
+    queue = OutboundQueue(ws, binary=True, audio_budget_ms=40)
+    for _ in range(10):
+        queue.put_audio(b"\x01" * 480)
+    queue.start()
+    await queue.close()
+    frames = [decode_frame(m) for m in ws.sent]
+    assert [t for t, _ in frames] == [FRAME_AUDIO_PCM] * 3
+    assert [len(p) for _, p in frames] == [1920, 1920, 960]
+    assert queue.stats()["merged_audio"] == 7
+
+@pytest.mark.asyncio
+async def test_transcription_fragments_are_concatenated():
+    ws = SlowSocket()
+    queue = OutboundQueue(ws)
+    queue.put_transcription("Gemini", "Hel")
+    queue.put_transcription("Gemini", "lo", True)
+    queue.put_transcription("Gemini", "Next")
+    queue.put_transcription("User", "hi")
+    queue.start()
+    await queue.close()
+    sent = [json.loads(m)["transcription"] for m in ws.sent]
+    assert sent == [
+        {"text": "Hello", "sender": "Gemini", "finished": True},
+        {"text": "Next", "sender": "Gemini", "finished": None},
+        {"text": "hi", "sender": "User", "finished": None},
+    ]
+
+@pytest.mark.asyncio
+async def test_slow_client_drops_oldest_audio_not_control():
+    ws = SlowSocket(delay=0.01)
+    queue = OutboundQueue(ws, max_items=4, audio_budget_ms=0).start()
+    for i in range(20):
+        queue.put_audio(bytes([i]) * 4)  # never merged with a zero budget
+        if i == 10:
+            queue.put_json({"text": "keep me"})
+    assert queue.depth <= 4
+    await queue.close(timeout=5)
+    assert {"text": "keep me"} in [json.loads(m) for m in ws.sent if m.startswith('{"text')]
+    stats = queue.stats()
+    assert stats["dropped_audio"] > 0
+    assert stats["sent"] + stats["dropped_audio"] == 21
+
+@pytest.mark.asyncio
+async def test_interrupt_discards_pending_audio_and_errors_surface():
+    ws = SlowSocket()
+    queue = OutboundQueue(ws)
+    queue.put_audio(b"\x00" * 100)
+    queue.put_json({"interrupted": "True"}, interrupt=True)
+    assert queue.depth == 1
+
+    class Closed:
+        async def send(self, message):
+            raise ConnectionError("gone")
+    broken = OutboundQueue(Closed()).start()
+    broken.put_json({"text": "x"})
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    with pytest.raises(ConnectionError):
+        broken.put_json({"text": "y"})
@@ -0,0 +1,32 @@
+import pytest
+from protocol import (
+    FRAME_AUDIO_PCM, FRAME_BARCHART, FRAME_IMAGE_JPEG, PROTOCOL_BINARY, ProtocolError,
+    decode_frame, decode_media_frame, encode_frame, wants_binary,
+)
+
+
+def test_round_trip_audio_frame():
+    pcm = bytes(range(256)) * 4
+    frame = encode_frame(FRAME_AUDIO_PCM, pcm)
+    assert len(frame) == len(pcm) + 2
+    assert decode_media_frame(frame) == ("audio/pcm", pcm)
+
+def test_image_frames():
+    frame = encode_frame(FRAME_BARCHART, b"\x89PNG")
+    frame_type, payload = decode_frame(frame)
+    assert frame_type == FRAME_BARCHART
+    assert bytes(payload) == b"\x89PNG"
+    assert decode_media_frame(encode_frame(FRAME_IMAGE_JPEG, b"jpg"))[0] == "image/jpeg"
+
+def test_rejects_bad_frames():
+    with pytest.raises(ProtocolError):
+        decode_frame(b"\x01")
+    with pytest.raises(ProtocolError):
+        decode_frame(b"\x02\x01data")
+    with pytest.raises(ProtocolError):
+        decode_media_frame(encode_frame(FRAME_BARCHART, b""))
+
+def test_negotiation():
+    assert wants_binary({"setup": {}, "protocol": PROTOCOL_BINARY})
+    assert not wants_binary({"setup": {}})
+    assert not wants_binary(None)
@@ -0,0 +1,61 @@
+import os
+
+from metrics import metrics
+from render_cache import RenderCache, make_key
+from charts import prepare_render, render_cached
+from render_cache import render_cache
+
+
+def test_key_normalizes_inputs():
+    assert make_key("barchart", {"numbers": [1.0, 2.0]}) == make_key("barchart", {"numbers": [1.0, 2.0]})
+    assert make_key("barchart", {"numbers": [1.0, 2.0]}) != make_key("linechart", {"numbers": [1.0, 2.0]})
+    # "1" and "1.0" parse to the same numbers, so they share a cache entry
+    assert prepare_render("barchart", ["1", "2"])[0] == prepare_render("barchart", ["1.0", " 2"])[0]
+
+def test_lru_evicts_by_bytes():
+    cache = RenderCache(max_bytes=10, disk_dir=None)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # "a" is now most recently used
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["bytes"] == 10
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = RenderCache(max_bytes=1024, disk_dir=str(tmp_path))
+    cache.put("k", b"png-bytes")
+    restarted = RenderCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert restarted.get("k") == b"png-bytes"
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get("k") == b"png-bytes"
+    assert restarted.stats()["hits"] == 1
+
+def test_disk_tier_trims_oldest(tmp_path):
+    cache = RenderCache(max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=10)
+    cache.put("a", b"123456")
+    cache.put("b", b"123456")
+    assert len(list(tmp_path.iterdir())) == 1
+
+def test_disk_tier_trims_least_recently_read(tmp_path):
+    cache = RenderCache(max_bytes=1024, disk_dir=str(tmp_path), disk_max_bytes=15)
+    cache.put("a", b"123456")
+    cache.put("b", b"123456")
+    old = os.path.getmtime(tmp_path / "b.png") - 60
+    os.utime(tmp_path / "a.png", (old, old))
+    os.utime(tmp_path / "b.png", (old + 1, old + 1))
+    assert RenderCache(disk_dir=str(tmp_path)).get("a") == b"123456"  # read from disk: "a" is now newest
+    cache.put("c", b"123456")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.png", "c.png"]
+
+def test_render_cached_hits():
+    before = render_cache.stats()["hits"]
+    first = render_cached("barchart", ["4", "5", "6"])
+    second = render_cached("barchart", ["4", "5", "6"])
+    assert first == second and first.startswith(b"\x89PNG")
+    assert render_cache.stats()["hits"] == before + 1
+    assert f"live_render_cache_hits_total {render_cache.hits}" in metrics.render_text()
@@ -0,0 +1,42 @@
+import asyncio
+import time
+import pytest
+from charts import barchart_tool
+from render_pool import RenderPool, RenderBusyError, RenderTimeoutError
+
+
+def slow_job(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.mark.asyncio
+async def test_render_in_worker():
+    pool = RenderPool(workers=1, queue_depth=2, timeout=30)
+    try:
+        img = await pool.submit(barchart_tool, ["1", "2", "3"])
+        assert img.startswith("iVBOR")
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_queue_depth_backpressure():
+    pool = RenderPool(workers=1, queue_depth=1, timeout=30)
+    try:
+        first = asyncio.create_task(pool.submit(slow_job, 0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(RenderBusyError):
+            await pool.submit(slow_job, 0)
+        assert await first == 0.5
+    finally:
+        pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_job_timeout():
+    pool = RenderPool(workers=1, queue_depth=2, timeout=30)
+    try:
+        with pytest.raises(RenderTimeoutError):
+            await pool.submit(slow_job, 1, timeout=0.1)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,52 @@
+from session_store import SessionHandleManager, SessionHandleStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def manager(tmp_path, clock, ttl=60):
+    store = SessionHandleStore(str(tmp_path / "sessions.db"), legacy_file=str(tmp_path / "none.json"))
+    return SessionHandleManager(store, ttl=ttl, flush_interval=60, clock=clock)
+
+
+def test_handles_are_per_client_and_written_behind(tmp_path):
+    clock = Clock()
+    handles = manager(tmp_path, clock)
+    handles.set("alice", "h-alice")
+    handles.set("bob", "h-bob")
+    assert handles.get("alice") == "h-alice" and handles.get("bob") == "h-bob"
+    assert handles.store.get("alice") is None  # not written yet
+    assert handles.flush() == 2
+    assert handles.store.get("alice") == "h-alice"
+    handles.close()
+
+def test_another_workers_newer_handle_wins(tmp_path):
+    clock = Clock()
+    first, second = manager(tmp_path, clock), manager(tmp_path, clock)
+    first.set("alice", "old")
+    first.flush()
+    clock.now += 5
+    second.set("alice", "new")
+    second.flush()
+    assert first.get("alice") == "new"
+    first.close()
+    second.close()
+
+def test_expired_handles_are_evicted(tmp_path):
+    clock = Clock()
+    handles = manager(tmp_path, clock, ttl=60)
+    handles.set("alice", "h1")
+    handles.flush()
+    clock.now += 61
+    assert handles.get("alice") is None
+    handles.flush()
+    assert handles.store.get("alice") is None
+    handles.set("bob", "h2")
+    handles.clear("bob")
+    assert handles.get("bob") is None
+    handles.close()
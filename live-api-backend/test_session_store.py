@@ -0,0 +1,28 @@
+import json
+from session_store import SessionHandleStore
+
+
+def test_handles_are_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first = SessionHandleStore(path, legacy_file=str(tmp_path / "missing.json"))
+    second = SessionHandleStore(path, legacy_file=str(tmp_path / "missing.json"))
+    assert first.get() is None
+    first.set("handle-1")
+    first.set("handle-a", key="alice")
+    assert second.get() == "handle-1"
+    assert second.get("alice") == "handle-a"
+    second.clear()
+    assert first.get() is None and first.get("alice") == "handle-a"
+    first.close()
+    second.close()
+
+def test_legacy_file_is_imported_once(tmp_path):
+    legacy = tmp_path / "session_handle.json"
+    legacy.write_text(json.dumps({"previous_session_handle": "old-handle"}))
+    path = str(tmp_path / "sessions.db")
+    store = SessionHandleStore(path, legacy_file=str(legacy))
+    assert store.get() == "old-handle"
+    store.clear()
+    store.close()
+    # a cleared handle must not come back from the old file
+    assert SessionHandleStore(path, legacy_file=str(legacy)).get() is None
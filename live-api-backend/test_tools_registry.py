@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+import pytest
+from google.genai.types import FunctionCall
+from tools import registry, ToolContext, ToolRegistry
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def route(text):
+    routed = registry.route(text)
+    return (routed[0].name, routed[1]) if routed else None
+
+
+def test_routes_intents():
+    assert route("what is the time?") == ("current_time", {})
+    assert route("weather in new york") == ("weather", {"city": "New York"})
+    assert route("weather") == ("weather", {})
+    assert route("calculate 2+2") == ("calculator", {"expression": "2+2"})
+    assert route("3 * (4 + 1)") == ("calculator", {"expression": "3 * (4 + 1)"})
+    assert route("go to next") == ("carousel", {"direction": "next"})
+    assert route("previous please") == ("carousel", {"direction": "prev"})
+    assert route("turn on light 2") == ("button", {"name": "Light 2", "state": "on"})
+    assert route("bar chart: 1, 2, 3") == ("barchart", {"numbers": ["1", "2", "3"]})
+    assert route("word cloud: hello world") == ("wordcloud", {"text": "hello world"})
+
+def test_no_substring_hijacking():
+    assert route("sometimes i wonder") is None
+    assert route("thanks for the feedback") is None
+    assert route("tell me a story") is None
+
+def test_leftmost_trigger_wins():
+    # The old if/elif chain sent this to the time tool because "time" was checked first.
+    assert route("word cloud: the last time we went back home")[0] == "wordcloud"
+    assert route("line chart: 4,5 and then next")[0] == "linechart"
+
+def test_function_declarations():
+    names = [d.name for d in registry.function_declarations()]
+    assert names[:3] == ["current_time", "weather", "calculator"]
+    assert {"carousel", "button", "wordcloud", "barchart", "linechart", "piechart"} <= set(names)
+    assert [d.name for d in registry.function_declarations(["weather"])] == ["weather"]
+
+@pytest.mark.asyncio
+async def test_dispatch_sends_reply():
+    ws = FakeWebSocket()
+    assert await registry.dispatch(ToolContext(ws), "turn off fan")
+    assert json.loads(ws.sent[0]) == {"button": {"name": "Fan", "state": "off"}}
+    assert await registry.dispatch(ToolContext(ws), "calculate 6*7")
+    assert json.loads(ws.sent[1]) == {"text": "Result: 42"}
+    assert not await registry.dispatch(ToolContext(ws), "hello there")
+
+def test_keywords_and_patterns():
+    reg = ToolRegistry()
+    reg.tool("a", keywords=["alpha", "alpha beta"], extract=lambda g, t: {"g": g})(lambda ctx, g: g)
+    reg.tool("b", keywords=["set"], pattern=r"set (\w+) to (\w+)", extract=lambda g, t: {"g": g})(lambda ctx, g: g)
+    reg.tool("c", message_pattern=r"\d+")(lambda ctx: None)
+    assert reg.route("say alpha beta")[0].name == "a"
+    # a keyword whose argument pattern does not match is skipped
+    assert reg.route("reset nothing, set x to y") == (reg.tools["b"], {"g": ("x", "y")})
+    assert reg.route("settle down") is None
+    assert reg.route("42")[0].name == "c"
+    assert reg.route("42 alpha")[0].name == "a"
+    with pytest.raises(ValueError):
+        reg.tool("a")(lambda ctx: None)
+    reg.tool("d", keywords=["set"])(lambda ctx: None)
+    with pytest.raises(ValueError):
+        reg.route("set")
+
+
+@pytest.mark.asyncio
+async def test_function_calls_run_concurrently_with_timeouts():
+    reg = ToolRegistry()
+
+    @reg.tool("slow", timeout=1)
+    async def slow(ctx, seconds):
+        await asyncio.sleep(seconds)
+        return f"slept {seconds}"
+
+    @reg.tool("stuck", timeout=0.1)
+    async def stuck(ctx):
+        await asyncio.sleep(10)
+
+    @reg.tool("broken")
+    def broken(ctx):
+        raise RuntimeError("boom")
+
+    calls = [FunctionCall(id="1", name="slow", args={"seconds": 0.2}),
+             FunctionCall(id="2", name="slow", args={"seconds": 0.2}),
+             FunctionCall(id="3", name="stuck", args={}),
+             FunctionCall(id="4", name="broken", args={}),
+             FunctionCall(id="5", name="missing", args={})]
+    start = time.perf_counter()
+    responses = await reg.call(ToolContext(FakeWebSocket()), calls)
+    assert time.perf_counter() - start < 0.35
+    assert [r.id for r in responses] == ["1", "2", "3", "4", "5"]
+    assert responses[0].response == {"result": "slept 0.2"}
+    assert responses[2].response == {"error": "stuck timed out"}
+    assert responses[3].response == {"error": "boom"}
+    assert "Unknown tool" in responses[4].response["error"]
+
+
+def test_every_tool_is_declared_for_gemini():
+    names = {d.name for d in registry.function_declarations()}
+    assert {"current_time", "weather", "calculator", "wordcloud", "barchart", "carousel", "button",
+            "remember", "recall", "forget"} <= names
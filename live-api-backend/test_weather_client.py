@@ -0,0 +1,72 @@
+import asyncio
+import httpx
+import pytest
+from weather_client import WeatherClient, CityNotFound, WeatherError
+
+PARIS = {"weather": [{"description": "clear sky"}], "main": {"temp": 21, "feels_like": 20, "humidity": 40}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def stub(calls, delay=0.0, status=200):
+    async def handler(request):
+        calls.append(request.url.params["q"])
+        await asyncio.sleep(delay)
+        if status != 200:
+            return httpx.Response(status, json={"message": "city not found"})
+        return httpx.Response(200, json=PARIS)
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_skip_upstream():
+    calls = []
+    client = WeatherClient(transport=stub(calls), ttl=60)
+    assert await client.get("Paris") == PARIS
+    assert await client.get("  paris ") == PARIS
+    assert calls == ["Paris"]
+    assert client.stats()["hits"] == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_fetch():
+    calls = []
+    client = WeatherClient(transport=stub(calls, delay=0.05))
+    results = await asyncio.gather(*(client.get("Paris") for _ in range(20)))
+    assert all(r == PARIS for r in results)
+    assert len(calls) == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    calls, clock = [], Clock()
+    client = WeatherClient(transport=stub(calls), ttl=10, stale_ttl=100, clock=clock)
+    await client.get("Paris")
+    clock.now = 50  # stale: served immediately, refreshed in the background
+    assert await client.get("Paris") == PARIS
+    await asyncio.sleep(0.01)
+    assert len(calls) == 2 and client.stats()["stale_hits"] == 1
+    clock.now = 500  # past the stale window: fetched again before answering
+    await client.get("Paris")
+    assert len(calls) == 3
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_errors():
+    calls = []
+    client = WeatherClient(transport=stub(calls, status=404))
+    for _ in range(2):
+        with pytest.raises(CityNotFound):
+            await client.get("Atlantis")
+    assert len(calls) == 1  # unknown cities are cached too
+    failing = WeatherClient(transport=stub(calls, status=500))
+    with pytest.raises(WeatherError):
+        await failing.get("Paris")
+    await client.aclose()
+    await failing.aclose()
@@ -0,0 +1,78 @@
+import json
+import random
+
+import pytest
+from wordcloud import WordCloud
+
+from tools import registry, ToolContext
+from word_counts import ConversationCloud, WordCounter, word_frequencies
+
+TEXTS = [
+    "hello world hello",
+    "New York is big. In new york the cats and dogs, Cats' toys; it's John's 42 cats, a cat, a dog, dogs, glass and glasses.",
+    "I don't know. 'Quoted' words, under_scores and numbers like 2024 or 3's. " * 5,
+    open(__file__).read(),
+]
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_matches_wordcloud_process_text(text):
+    expected = WordCloud().process_text(text)
+    # Same words, counts and order (ties in the layout are broken by order).
+    assert list(word_frequencies(text).items()) == list(expected.items())
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_fragments_count_like_the_whole_text(text):
+    rng = random.Random(len(text))
+    counter = WordCounter()
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, 12)
+        counter.update(text[i:i + n], final=False)
+        i += n
+    counter.flush()
+    assert list(counter.frequencies().items()) == list(WordCloud().process_text(text).items())
+
+
+def test_frequencies_are_cached_until_new_words_arrive():
+    counter = WordCounter().update("alpha beta alpha")
+    first = counter.frequencies()
+    assert counter.frequencies() is first
+    counter.update(" gamma", final=False)
+    assert counter.frequencies() is first
+    counter.flush()
+    assert counter.frequencies() == {"alpha": 2, "beta": 1, "gamma": 1}
+
+
+def test_conversation_keeps_interleaved_speakers_apart():
+    conversation = ConversationCloud()
+    conversation.add("Gemini", "Photo")
+    conversation.add("User", " I enjoy rain")
+    conversation.add("Gemini", "synthesis needs light")
+    conversation.add("User", "bows", finished=True)
+    conversation.add("Gemini", "", finished=True)
+    assert conversation.frequencies("Gemini") == {"Photosynthesis": 1, "needs": 1, "light": 1}
+    assert conversation.frequencies("User") == {"enjoy": 1, "rainbows": 1}
+    assert conversation.frequencies()["Photosynthesis"] == 1
+    assert conversation.frequencies("nobody") == {}
+
+
+@pytest.mark.asyncio
+async def test_conversation_wordcloud_tool():
+    ws = FakeWebSocket()
+    conversation = ConversationCloud()
+    ctx = ToolContext(ws, conversation=conversation)
+    assert await registry.dispatch(ctx, "show me a conversation word cloud")
+    assert json.loads(ws.sent[-1]) == {"text": "Nothing has been said yet to make a word cloud of."}
+    conversation.add("Gemini", "Rainbows appear when sunlight meets rain", finished=True)
+    assert await registry.dispatch(ctx, "show me a conversation word cloud")
+    assert json.loads(ws.sent[-1])["wordcloud"].startswith("iVBOR")
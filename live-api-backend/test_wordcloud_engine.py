@@ -0,0 +1,28 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from wordcloud_engine import WordCloudEngine, WORDCLOUD_SIZE
+
+
+def test_renders_png_at_cloud_size_and_reuses_instances():
+    engine = WordCloudEngine()
+    png = engine.render({"hello": 3, "world": 1})
+    assert Image.open(io.BytesIO(png)).size == WORDCLOUD_SIZE
+    idle = engine._idle.get_nowait()
+    engine._idle.put(idle)
+    engine.render({"again": 1})
+    assert engine._idle.get_nowait() is idle
+
+
+def test_mask_sets_the_shape(tmp_path):
+    mask = np.full((120, 240), 255, dtype=np.uint8)
+    mask[20:100, 40:200] = 0
+    path = tmp_path / "mask.png"
+    Image.fromarray(mask).save(path)
+    png = WordCloudEngine(mask_path=str(path)).render({"inside": 2, "only": 1})
+    image = np.array(Image.open(io.BytesIO(png)).convert("L"))
+    assert image.shape == (120, 240)
+    # Nothing is drawn on the masked-out (white) border.
+    assert (image[:20] == 255).all()
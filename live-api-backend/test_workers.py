@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+import websockets
+from workers import drain
+
+
+async def hold_open(websocket):
+    async for message in websocket:
+        await websocket.send(message)
+
+
+@pytest.mark.asyncio
+async def test_drain_stops_accepting_then_closes_with_service_restart():
+    server = await websockets.serve(hold_open, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = await websockets.connect(f"ws://127.0.0.1:{port}")
+    await client.send("hi")
+    assert await client.recv() == "hi"
+    drained = asyncio.create_task(drain(server, timeout=0.5))
+    await asyncio.sleep(0.1)
+    with pytest.raises(OSError):
+        await websockets.connect(f"ws://127.0.0.1:{port}")
+    # the open session keeps working until the drain timeout
+    await client.send("still here")
+    assert await client.recv() == "still here"
+    await drained
+    with pytest.raises(websockets.exceptions.ConnectionClosed):
+        await client.recv()
+    assert client.close_code == 1012
+
+@pytest.mark.asyncio
+async def test_workers_can_share_a_port():
+    first = await websockets.serve(hold_open, "127.0.0.1", 0, reuse_port=True)
+    port = first.sockets[0].getsockname()[1]
+    second = await websockets.serve(hold_open, "127.0.0.1", port, reuse_port=True)
+    for server in (first, second):
+        server.close()
+        await server.wait_closed()
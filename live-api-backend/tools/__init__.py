@@ -0,0 +1,4 @@
+from tools.registry import Tool, ToolContext, ToolRegistry, registry
+
+# Importing the tool modules registers their tools.
+from tools import info, memory_tools, ui, visual  # noqa: F401
@@ -0,0 +1,88 @@
+import datetime
+
+from tools.registry import registry
+from weather_client import weather_client, WeatherError
+
+# --- Tool: Current Time ---
+def current_time_tool():
+    now = datetime.datetime.now()
+    return now.strftime('%Y-%m-%d %I:%M:%S %p')
+
+# --- Tool: Weather Information ---
+DEFAULT_WEATHER_CITY = "London"
+
+async def weather_info_tool(city=DEFAULT_WEATHER_CITY):
+    # Cached, coalesced and non-blocking: see weather_client.py
+    try:
+        data = await weather_client.get(city)
+    except WeatherError as e:
+        return str(e)
+    except Exception as e:
+        return f"Error fetching weather: {e}"
+    desc = data["weather"][0]["description"].capitalize()
+    temp = data["main"]["temp"]
+    feels_like = data["main"]["feels_like"]
+    humidity = data["main"]["humidity"]
+    return f"Weather in {city}: {desc}, Temp: {temp}°C (feels like {feels_like}°C), Humidity: {humidity}%"
+
+# --- Tool: Calculator ---
+async def calculator_tool(expr):
+    # Whitelisted, bounded and cached; heavy expressions run in a worker (see calculator.py).
+    # NumPy loads on first use (imports= below).
+    from calculator import CalculatorError, INVALID, calculator as calculator_engine, format_result
+    try:
+        result = await calculator_engine.calculate(expr)
+    except CalculatorError as e:
+        if str(e) == INVALID:
+            return INVALID
+        return f"Error evaluating expression: {e}"
+    return f"Result: {format_result(result)}"
+
+
+# --- Registrations ---
+@registry.tool(
+    "current_time",
+    description="Returns the current date and time.",
+    keywords=["time"],
+    reply=lambda result: {"text": f"The current time is: {result}"},
+)
+def current_time(ctx):
+    return current_time_tool()
+
+
+@registry.tool(
+    "weather",
+    description="Returns the current weather for a city.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {"city": {"type": "STRING", "description": "City name, e.g. Paris."}},
+    },
+    # e.g. 'weather in Paris'
+    keywords=["weather"],
+    pattern=r"weather(?: in ([a-zA-Z\s]+))?",
+    extract=lambda groups, text: {"city": groups[0].strip().title()} if groups[0] else {},
+    reply=lambda result: {"text": result},
+)
+async def weather(ctx, city=DEFAULT_WEATHER_CITY):
+    return await weather_info_tool(city)
+
+
+@registry.tool(
+    "calculator",
+    description="Evaluates a math expression such as 2+2, sqrt(2)*pi, mean([3, 5, 10]) or 'r = 2; pi * r**2'.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {"expression": {"type": "STRING", "description": "The expression: numbers, + - * / // % **, "
+                                      "math functions, [lists] as vectors, and ';'-separated assignments."}},
+        "required": ["expression"],
+    },
+    # The expression after 'calculate', or the whole message if it looks like math
+    keywords=["calculate"],
+    pattern=r"calculate(?: (.+))?",
+    message_pattern=r"\s*\d+[\d\s\+\-\*\/\(\)\.]*",
+    extract=lambda groups, text: {"expression": groups[0] if groups and groups[0] else text},
+    reply=lambda result: {"text": result},
+    imports=("calculator",),
+)
+async def calculator(ctx, expression):
+    return await calculator_tool(expression)
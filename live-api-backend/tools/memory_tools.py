@@ -0,0 +1,71 @@
+import asyncio
+
+from memory import DEFAULT_NAMESPACE, forget, is_memory_enabled, recall, remember, set_preference
+from tools.registry import registry
+
+# --- Long-term memory tools (function calling only; memory commands from the UI go
+# through the "memory" messages in live_api.py). Nothing is stored or recalled unless
+# the user enabled memory. Store/index work runs in a thread, off the event loop. ---
+
+MEMORY_DISABLED = "Long-term memory is turned off for this user."
+
+
+def _namespace(ctx):
+    return ctx.namespace or DEFAULT_NAMESPACE
+
+
+@registry.tool(
+    "remember",
+    description="Saves a fact about the user to long-term memory, e.g. key 'favorite color', value 'green'.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {
+            "key": {"type": "STRING", "description": "Short name of the fact."},
+            "value": {"type": "STRING", "description": "The fact itself."},
+            "preference": {"type": "BOOLEAN", "description": "True for a user preference (e.g. units, language)."},
+        },
+        "required": ["key", "value"],
+    },
+)
+async def remember_tool(ctx, key, value, preference=False):
+    namespace = _namespace(ctx)
+    if not await asyncio.to_thread(is_memory_enabled, namespace):
+        return MEMORY_DISABLED
+    if preference:
+        await asyncio.to_thread(set_preference, key, value, namespace)
+    else:
+        await asyncio.to_thread(remember, "knowledge", key, value, namespace)
+    return f"Remembered {key}."
+
+
+@registry.tool(
+    "recall",
+    description="Searches long-term memory for facts about the user related to a query.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {"query": {"type": "STRING"}},
+        "required": ["query"],
+    },
+    imports=("memory_index",),
+)
+async def recall_tool(ctx, query):
+    namespace = _namespace(ctx)
+    if not await asyncio.to_thread(is_memory_enabled, namespace):
+        return MEMORY_DISABLED
+    memories = await asyncio.to_thread(recall, query, None, namespace)
+    return [{"key": m["key"], "value": m["value"]} for m in memories] or "Nothing relevant is remembered."
+
+
+@registry.tool(
+    "forget",
+    description="Removes a fact from long-term memory.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {"key": {"type": "STRING"}},
+        "required": ["key"],
+    },
+)
+async def forget_tool(ctx, key):
+    namespace = _namespace(ctx)
+    await asyncio.to_thread(forget, "knowledge", key, namespace)
+    return f"Forgot {key}."
@@ -0,0 +1,213 @@
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import os
+import re
+
+from metrics import TOOL_LATENCY
+
+logger = logging.getLogger(__name__)
+
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", 10))
+
+# Tool registry and text-intent router.
+# Each tool declares its trigger keywords, an optional argument pattern, an argument
+# extractor and a handler. All keywords are compiled into one alternation regex with
+# no capture groups, which lets the regex engine skip ahead on the keywords' first
+# characters, so routing a message is a single scan instead of a chain of substring
+# checks and re.search calls. The leftmost keyword in the message wins (matched on
+# word boundaries, so "sometimes" or "feedback" no longer trigger a tool), and the
+# matched keyword maps straight to its tool. The same registry produces the Gemini
+# FunctionDeclaration list and answers Gemini's function calls (call()): the calls of
+# one tool_call message run concurrently, each bounded by its tool's timeout, and
+# their FunctionResponses go back together.
+
+
+class ToolContext:
+    """What a handler needs to talk to the client that triggered it."""
+
+    def __init__(self, websocket, binary=False, namespace=None, conversation=None):
+        self.websocket = websocket
+        self.binary = binary
+        # Memory namespace of the connected user (see memory_sqlite.namespace_for)
+        self.namespace = namespace
+        # Word counts of the session so far (see word_counts.ConversationCloud)
+        self.conversation = conversation
+
+    async def send_json(self, payload):
+        await self.websocket.send(json.dumps(payload))
+
+    async def send_bytes(self, frame):
+        await self.websocket.send(frame)
+
+
+class Tool:
+    def __init__(self, name, handler, description="", parameters=None, keywords=(), pattern=None,
+                 message_pattern=None, extract=None, reply=None, timeout=TOOL_TIMEOUT, imports=()):
+        self.name = name
+        self.handler = handler
+        self.description = description
+        # JSON schema of the handler's keyword arguments, used for the FunctionDeclaration
+        self.parameters = parameters
+        # Literal words or phrases that trigger the tool
+        self.keywords = list(keywords)
+        # Regex matched at the keyword's position to capture arguments; the trigger
+        # only counts if it matches
+        self.pattern = re.compile(pattern) if pattern else None
+        # Regex that triggers the tool when it matches the whole message (no keyword)
+        self.message_pattern = re.compile(message_pattern) if message_pattern else None
+        # extract(groups, text) -> handler kwargs, where groups are the capture groups
+        # of pattern (or message_pattern)
+        self.extract = extract
+        # reply(result) -> message sent to the client when triggered from text
+        self.reply = reply
+        # Seconds a function call from Gemini may take before it is answered with an error
+        self.timeout = timeout
+        # Heavy modules the handler imports: loaded in a thread before its first run (or by
+        # prewarm), so neither startup nor the event loop pays for them
+        self.imports = tuple(imports)
+        self._loaded = not self.imports
+
+    async def load(self):
+        if not self._loaded:
+            for module in self.imports:
+                await asyncio.to_thread(importlib.import_module, module)
+            self._loaded = True
+
+    async def run(self, ctx, **kwargs):
+        await self.load()
+        with TOOL_LATENCY.time(tool=self.name):
+            result = self.handler(ctx, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+        return result
+
+
+class ToolRegistry:
+    def __init__(self):
+        self.tools = {}
+        self._matcher = None
+        self._keywords = {}
+        self._message_tools = []
+        self._gemini_tool = None
+
+    def register(self, tool):
+        if tool.name in self.tools:
+            raise ValueError(f"Tool {tool.name!r} is already registered")
+        self.tools[tool.name] = tool
+        self._matcher = None
+        self._gemini_tool = None
+        return tool
+
+    def tool(self, name, **options):
+        """Decorator form of register()."""
+        def decorator(handler):
+            self.register(Tool(name, handler, **options))
+            return handler
+        return decorator
+
+    def _compile(self):
+        keywords = {}
+        for tool in self.tools.values():
+            for keyword in tool.keywords:
+                if keyword in keywords:
+                    raise ValueError(f"Keyword {keyword!r} is used by {keywords[keyword].name!r} and {tool.name!r}")
+                keywords[keyword] = tool
+        # Longest first, so "go to next" wins over "next" at the same position.
+        ordered = sorted(keywords, key=len, reverse=True)
+        self._keywords = keywords
+        self._message_tools = [t for t in self.tools.values() if t.message_pattern]
+        self._matcher = re.compile("|".join(re.escape(k) for k in ordered) or r"(?!)")
+
+    def route(self, text):
+        """Return (tool, kwargs) for the first trigger found in text, or None."""
+        if self._matcher is None:
+            self._compile()
+        for tool in self._message_tools:
+            match = tool.message_pattern.fullmatch(text)
+            if match:
+                return tool, tool.extract(match.groups(), text) if tool.extract else {}
+        pos = 0
+        while (match := self._matcher.search(text, pos)) is not None:
+            start, end = match.span()
+            pos = start + 1
+            if _is_word_char(text, start - 1) or _is_word_char(text, end):
+                continue
+            tool = self._keywords[match.group()]
+            groups = ()
+            if tool.pattern is not None:
+                args = tool.pattern.match(text, start)
+                if args is None:
+                    continue
+                groups = args.groups()
+            return tool, tool.extract(groups, text) if tool.extract else {}
+        return None
+
+    async def dispatch(self, ctx, text):
+        """Run the tool triggered by a text message. Returns False if none matched."""
+        routed = self.route(text)
+        if routed is None:
+            return False
+        tool, kwargs = routed
+        logger.info("Manual tool logic triggered for %s: %s", tool.name, text)
+        result = await tool.run(ctx, **kwargs)
+        if tool.reply:
+            await ctx.send_json(tool.reply(result))
+        return True
+
+    async def call(self, ctx, function_calls):
+        """Run Gemini function calls concurrently. Returns their FunctionResponses, in call order."""
+        return list(await asyncio.gather(*(self._call_one(ctx, call) for call in function_calls)))
+
+    async def _call_one(self, ctx, call):
+        from google.genai.types import FunctionResponse
+        tool = self.tools.get(call.name)
+        if tool is None:
+            response = {"error": f"Unknown tool {call.name!r}"}
+        else:
+            try:
+                result = await asyncio.wait_for(tool.run(ctx, **(call.args or {})), tool.timeout)
+                response = {"result": result}
+            except asyncio.TimeoutError:
+                logger.warning("Tool %s timed out after %.0fs", call.name, tool.timeout)
+                response = {"error": f"{call.name} timed out"}
+            except Exception as e:
+                logger.warning("Tool %s failed: %s", call.name, e)
+                response = {"error": str(e)}
+        return FunctionResponse(id=call.id, name=call.name, response=response)
+
+    def function_declarations(self, names=None):
+        from google.genai.types import FunctionDeclaration
+        declarations = []
+        for tool in self.tools.values():
+            if names is not None and tool.name not in names:
+                continue
+            declarations.append(FunctionDeclaration(
+                name=tool.name,
+                description=tool.description,
+                parameters=tool.parameters,
+            ))
+        return declarations
+
+    def gemini_tool(self, names=None):
+        from google.genai.types import Tool as GeminiTool
+        if names is not None:
+            return GeminiTool(function_declarations=self.function_declarations(names))
+        # Every session declares all tools: build that once.
+        if self._gemini_tool is None:
+            self._gemini_tool = GeminiTool(function_declarations=self.function_declarations())
+        return self._gemini_tool
+
+    async def load_all(self):
+        """Import every tool's modules now instead of on first use."""
+        for tool in self.tools.values():
+            await tool.load()
+
+
+def _is_word_char(text, index):
+    return 0 <= index < len(text) and (text[index].isalnum() or text[index] == "_")
+
+
+registry = ToolRegistry()
@@ -0,0 +1,39 @@
+from tools.registry import registry
+
+# --- Frontend interaction tools: carousel navigation and button control ---
+
+@registry.tool(
+    "carousel",
+    description="Moves the carousel on the user's screen to the next or previous slide.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {"direction": {"type": "STRING", "enum": ["next", "prev"]}},
+        "required": ["direction"],
+    },
+    keywords=["go to next", "next", "forward", "go to previous", "previous", "prev", "back"],
+    pattern=r"(go to next|next|forward)|(go to previous|previous|prev|back)",
+    extract=lambda groups, text: {"direction": "next" if groups[0] else "prev"},
+)
+async def carousel(ctx, direction):
+    await ctx.send_json({"carousel": direction})
+    return f"Carousel moved {direction}."
+
+
+@registry.tool(
+    "button",
+    description="Turns a device button on the user's screen on or off.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {
+            "name": {"type": "STRING", "enum": ["Light 1", "Light 2", "Fan"]},
+            "state": {"type": "STRING", "enum": ["on", "off"]},
+        },
+        "required": ["name", "state"],
+    },
+    keywords=["turn"],
+    pattern=r"turn (on|off) (light 1|light 2|fan)",
+    extract=lambda groups, text: {"name": groups[1].title(), "state": groups[0]},
+)
+async def button(ctx, name, state):
+    await ctx.send_json({"button": {"name": name, "state": state}})
+    return f"{name} turned {state}."
@@ -0,0 +1,163 @@
+import asyncio
+import base64
+import logging
+import time
+
+from metrics import RENDER_LATENCY
+from protocol import IMAGE_FRAMES, encode_frame
+from render_cache import render_cache
+from render_pool import render_pool, RenderPoolError
+from tools.registry import registry
+
+logger = logging.getLogger(__name__)
+
+CHART_IMPORTS = ("charts",)
+
+# --- Data visualization tools: word cloud and charts (cached, rendered off the event loop) ---
+
+async def render_tool_image(ctx, kind, arg, failure_text):
+    # matplotlib and wordcloud load on first use (the tools declare imports=CHART_IMPORTS)
+    from charts import prepare_render
+    try:
+        # Parsing and hashing are linear in the input, and the cache may read from disk,
+        # so both run in a thread.
+        job = await asyncio.to_thread(prepare_render, kind, arg)
+    except Exception:
+        job = None
+    if job is None:
+        await ctx.send_json({"text": failure_text})
+        return failure_text
+    cache_key, render_fn, render_args = job
+    started = time.perf_counter()
+    png = await asyncio.to_thread(render_cache.get, cache_key)
+    if png is not None:
+        RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind, source="cache")
+    else:
+        try:
+            png = await render_pool.submit(render_fn, *render_args)
+            RENDER_LATENCY.observe(time.perf_counter() - started, kind=kind, source="render")
+        except RenderPoolError as e:
+            await ctx.send_json({"error": kind, "text": str(e)})
+            return str(e)
+        except Exception as e:
+            logger.warning("Error rendering %s: %s", kind, e)
+            png = None
+        if png:
+            await asyncio.to_thread(render_cache.put, cache_key, png)
+    if png and ctx.binary:
+        await ctx.send_bytes(encode_frame(IMAGE_FRAMES[kind], png))
+    elif png:
+        await ctx.send_json({kind: base64.b64encode(png).decode("utf-8")})
+    else:
+        await ctx.send_json({"text": failure_text})
+        return failure_text
+    return f"The {kind} is now shown on the user's screen."
+
+
+def _numbers(groups, text):
+    return {"numbers": groups[0].replace(' ', '').split(',') if groups[0] else []}
+
+
+_NUMBERS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "numbers": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+        "labels": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "Category label of each number."},
+        "series": {
+            "type": "ARRAY",
+            "description": "Several named series to compare, instead of numbers.",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"name": {"type": "STRING"}, "values": {"type": "ARRAY", "items": {"type": "NUMBER"}}},
+            },
+        },
+    },
+}
+
+_PIE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {key: _NUMBERS_SCHEMA["properties"][key] for key in ("numbers", "labels")},
+    "required": ["numbers"],
+}
+
+
+def _chart_input(numbers, labels, series):
+    if labels or series:
+        return {"numbers": numbers, "labels": labels, "series": series}
+    return numbers
+
+
+@registry.tool(
+    "wordcloud",
+    description="Shows a word cloud of the given text on the user's screen.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {"text": {"type": "STRING"}},
+        "required": ["text"],
+    },
+    # Text after 'word cloud' / 'generate word cloud', or the whole message
+    keywords=["word cloud"],
+    pattern=r"word cloud(?: for|:)?\s*(.*)",
+    extract=lambda groups, text: {"text": groups[0] or text},
+    imports=CHART_IMPORTS,
+)
+async def wordcloud(ctx, text):
+    return await render_tool_image(ctx, "wordcloud", text, "Failed to generate word cloud.")
+
+
+@registry.tool(
+    "conversation_wordcloud",
+    description="Shows a word cloud of what has been said so far in this conversation on the user's screen.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {
+            "speaker": {"type": "STRING", "enum": ["User", "Gemini"], "description": "Only this speaker's words."},
+        },
+    },
+    keywords=["conversation word cloud"],
+    imports=CHART_IMPORTS,
+)
+async def conversation_wordcloud(ctx, speaker=None):
+    # The session's counts are kept up to date as transcriptions arrive, so this only
+    # reads the current frequencies.
+    frequencies = ctx.conversation.frequencies(speaker) if ctx.conversation else {}
+    return await render_tool_image(ctx, "wordcloud", frequencies, "Nothing has been said yet to make a word cloud of.")
+
+
+@registry.tool(
+    "barchart",
+    description="Shows a bar chart of the given numbers on the user's screen.",
+    parameters=_NUMBERS_SCHEMA,
+    keywords=["bar chart"],
+    pattern=r"bar chart(?:[:\s]+([\d,\s\.]+))?",
+    extract=_numbers,
+    imports=CHART_IMPORTS,
+)
+async def barchart(ctx, numbers=None, labels=None, series=None):
+    return await render_tool_image(ctx, "barchart", _chart_input(numbers, labels, series), "Failed to generate bar chart.")
+
+
+@registry.tool(
+    "linechart",
+    description="Shows a line chart of the given numbers on the user's screen.",
+    parameters=_NUMBERS_SCHEMA,
+    keywords=["line chart"],
+    pattern=r"line chart(?:[:\s]+([\d,\s\.]+))?",
+    extract=_numbers,
+    imports=CHART_IMPORTS,
+)
+async def linechart(ctx, numbers=None, labels=None, series=None):
+    return await render_tool_image(ctx, "linechart", _chart_input(numbers, labels, series), "Failed to generate line chart.")
+
+
+@registry.tool(
+    "piechart",
+    description="Shows a pie chart of the given numbers on the user's screen.",
+    parameters=_PIE_SCHEMA,
+    keywords=["pie chart"],
+    pattern=r"pie chart(?:[:\s]+([\d,\s\.]+))?",
+    extract=_numbers,
+    imports=CHART_IMPORTS,
+)
+async def piechart(ctx, numbers=None, labels=None):
+    return await render_tool_image(ctx, "piechart", _chart_input(numbers, labels, None), "Failed to generate pie chart.")
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import httpx
+
+# Async OpenWeather client shared by every session.
+# One pooled keep-alive httpx.AsyncClient serves all lookups. Results are cached per
+# normalised city for WEATHER_TTL seconds; after that, for up to WEATHER_STALE_TTL
+# more seconds, the stale result is returned at once while a single background
+# refresh runs. Concurrent lookups for a city that is not cached share one in-flight
+# request. The transport and base URL are injectable so tests can run against a stub.
+
+OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "e26b55f010b0d7ed5529668276e57d20")
+OPENWEATHER_URL = os.environ.get("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+WEATHER_TTL = float(os.environ.get("WEATHER_TTL", 600))
+WEATHER_STALE_TTL = float(os.environ.get("WEATHER_STALE_TTL", 1800))
+# Unknown cities are remembered for a shorter time.
+WEATHER_NOT_FOUND_TTL = float(os.environ.get("WEATHER_NOT_FOUND_TTL", 60))
+WEATHER_CACHE_SIZE = int(os.environ.get("WEATHER_CACHE_SIZE", 1024))
+WEATHER_TIMEOUT = float(os.environ.get("WEATHER_TIMEOUT", 5))
+
+
+class WeatherError(Exception):
+    pass
+
+
+class CityNotFound(WeatherError):
+    pass
+
+
+def normalize_city(city):
+    return " ".join(city.split()).casefold()
+
+
+class WeatherClient:
+    def __init__(self, api_key=OPENWEATHER_API_KEY, url=OPENWEATHER_URL, transport=None,
+                 ttl=WEATHER_TTL, stale_ttl=WEATHER_STALE_TTL, not_found_ttl=WEATHER_NOT_FOUND_TTL,
+                 max_entries=WEATHER_CACHE_SIZE, timeout=WEATHER_TIMEOUT, clock=time.monotonic):
+        self.api_key = api_key
+        self.url = url
+        self.transport = transport
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.not_found_ttl = not_found_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.clock = clock
+        self._http = None
+        # city -> (fetched_at, ttl, result or CityNotFound)
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+
+    def _client(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                transport=self.transport,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=60),
+            )
+        return self._http
+
+    async def get(self, city):
+        """Current weather for city as OpenWeather's JSON dict.
+
+        Raises CityNotFound for unknown cities and WeatherError when the lookup fails.
+        """
+        key = normalize_city(city)
+        entry = self._cache.get(key)
+        if entry is not None:
+            fetched_at, ttl, result = entry
+            age = self.clock() - fetched_at
+            if age < ttl:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._result(result)
+            if age < ttl + self.stale_ttl and not isinstance(result, CityNotFound):
+                self.stale_hits += 1
+                self._refresh(key, city)
+                return result
+        self.misses += 1
+        # Callers awaiting a shared fetch must not cancel it for the others.
+        return self._result(await asyncio.shield(self._refresh(key, city)))
+
+    @staticmethod
+    def _result(result):
+        if isinstance(result, CityNotFound):
+            raise result
+        return result
+
+    def _refresh(self, key, city):
+        """The in-flight fetch for key, starting one if there is none."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, city))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # a failed background refresh is not an unhandled error
+
+    async def _fetch(self, key, city):
+        self.upstream_calls += 1
+        try:
+            response = await self._client().get(
+                self.url, params={"q": city, "appid": self.api_key, "units": "metric"})
+        except httpx.HTTPError as e:
+            raise WeatherError(f"Could not reach the weather service: {e}") from e
+        if response.status_code == 404:
+            result = CityNotFound(f"Could not fetch weather data for {city}.")
+            self._store(key, self.not_found_ttl, result)
+            return result
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if response.status_code != 200 or not isinstance(data, dict) or "weather" not in data:
+            raise WeatherError(f"Could not fetch weather data for {city}.")
+        self._store(key, self.ttl, data)
+        return data
+
+    def _store(self, key, ttl, result):
+        self._cache[key] = (self.clock(), ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def stats(self):
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "upstream_calls": self.upstream_calls,
+        }
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+weather_client = WeatherClient()
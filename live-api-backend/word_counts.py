@@ -0,0 +1,231 @@
+import os
+import re
+from collections import Counter, defaultdict
+from functools import cache
+from importlib.util import find_spec
+from math import log
+from operator import itemgetter
+
+# Streaming word counts for word clouds.
+# WordCloud.process_text() needs the whole text at once and builds several full word
+# lists from it, so a long transcript costs memory proportional to its length and
+# every new fragment means tokenizing the whole history again. WordCounter consumes
+# text in pieces and keeps only the unigram and bigram counts (bounded by the
+# vocabulary); frequencies() turns them into exactly what process_text() returns
+# for the concatenated text. The module only needs the standard library, so
+# live_api.py can keep a conversation's counts without importing wordcloud.
+
+WORD_PATTERN = re.compile(r"\w[\w']*")
+COLLOCATION_THRESHOLD = 30
+_UNSEEN = object()
+
+
+def _split_tail(text):
+    """(text, word at its very end) -- the tail is "" if text ends between words."""
+    i = len(text)
+    while i and (text[i - 1].isalnum() or text[i - 1] in "_'"):
+        i -= 1
+    # The tail's word starts at its first word character (leading quotes belong to no word).
+    while i < len(text) and text[i] == "'":
+        i += 1
+    return text[:i], text[i:]
+
+
+@cache
+def default_stopwords():
+    # wordcloud's STOPWORDS, read from its data file without importing the package
+    # (which would load matplotlib, NumPy and PIL).
+    spec = find_spec("wordcloud")
+    if spec is None or spec.origin is None:
+        return frozenset()
+    with open(os.path.join(os.path.dirname(spec.origin), "stopwords")) as f:
+        return frozenset(line.strip().lower() for line in f)
+
+
+def _log_likelihood(k, n, x):
+    return log(max(x, 1e-10)) * k + log(max(1 - x, 1e-10)) * (n - k)
+
+
+def collocation_score(count_bigram, count1, count2, n_words):
+    """Dunning's likelihood ratio, as wordcloud.tokenization.score."""
+    if n_words <= count1 or n_words <= count2:
+        return 0
+    p = count2 / n_words
+    p1 = count_bigram / count1
+    p2 = (count2 - count_bigram) / (n_words - count1)
+    score = (_log_likelihood(count_bigram, count1, p) + _log_likelihood(count2 - count_bigram, n_words - count1, p)
+             - _log_likelihood(count_bigram, count1, p1) - _log_likelihood(count2 - count_bigram, n_words - count1, p2))
+    return -2 * score
+
+
+def fuse_counts(counts, normalize_plurals=True):
+    """wordcloud.tokenization.process_tokens over {word: count} instead of a word list.
+
+    Returns ({word in its most common case: count}, {lowercase word: standard case}).
+    """
+    cases = defaultdict(dict)
+    for word, count in counts.items():
+        case_counts = cases[word.lower()]
+        case_counts[word] = case_counts.get(word, 0) + count
+    merged_plurals = {}
+    if normalize_plurals:
+        # "cats" is merged into "cat" when both occur ("glass" is left alone)
+        for key in list(cases):
+            if key.endswith("s") and not key.endswith("ss") and key[:-1] in cases:
+                singular_counts = cases[key[:-1]]
+                for word, count in cases.pop(key).items():
+                    singular_counts[word[:-1]] = singular_counts.get(word[:-1], 0) + count
+                merged_plurals[key] = key[:-1]
+    fused = {}
+    standard = {}
+    for key, case_counts in cases.items():
+        first = max(case_counts.items(), key=itemgetter(1))[0]
+        fused[first] = sum(case_counts.values())
+        standard[key] = first
+    for plural, singular in merged_plurals.items():
+        standard[plural] = standard[singular]
+    return fused, standard
+
+
+class WordCounter:
+    """Incremental equivalent of WordCloud(...).process_text() with the default settings."""
+
+    def __init__(self, stopwords=None, collocations=True, normalize_plurals=True,
+                 collocation_threshold=COLLOCATION_THRESHOLD):
+        self.stopwords = default_stopwords() if stopwords is None else frozenset(w.lower() for w in stopwords)
+        self.collocations = collocations
+        self.normalize_plurals = normalize_plurals
+        self.collocation_threshold = collocation_threshold
+        self.unigrams = Counter()
+        self.bigrams = Counter()
+        self.words = 0
+        # Raw token -> counted form: the word, None for a stopword, "" for a number
+        self._forms = {}
+        # Last word seen, for bigrams across update() calls (None after a stopword)
+        self._previous = None
+        # Unfinished word at the end of a non-final update()
+        self._pending = ""
+        self._version = 0
+        self._cached = (-1, None)
+
+    def update(self, text, final=True):
+        """Count the words of text, which continues the text seen so far.
+
+        With final=False a word at the very end is held back, because it may continue
+        in the next piece (transcription fragments can split a word). Large texts can
+        be fed in pieces this way with memory bounded by the piece size.
+        """
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+        if not final:
+            text, self._pending = _split_tail(text)
+        self._count(WORD_PATTERN.findall(text))
+        return self
+
+    def flush(self):
+        """Count a held-back word (the text is complete)."""
+        if self._pending:
+            tail, self._pending = self._pending, ""
+            self._count([tail])
+        return self
+
+    def _form(self, token):
+        word = token[:-2] if token.lower().endswith("'s") else token
+        if word.isdigit():
+            form = ""
+        elif word.lower() in self.stopwords:
+            form = None
+        else:
+            form = word
+        self._forms[token] = form
+        return form
+
+    def _count(self, tokens):
+        if not tokens:
+            return
+        forms = self._forms
+        # Words in order with None for stopwords (they break bigrams); numbers are skipped
+        sequence = [self._previous]
+        for token in tokens:
+            form = forms.get(token, _UNSEEN)
+            if form is _UNSEEN:
+                form = self._form(token)
+            if form != "":
+                sequence.append(form)
+        words = [word for word in sequence[1:] if word]
+        self.unigrams.update(words)
+        self.words += len(words)
+        if self.collocations:
+            self.bigrams.update([f"{a} {b}" for a, b in zip(sequence, sequence[1:]) if a and b])
+        self._previous = sequence[-1]
+        self._version += 1
+
+    def merge(self, other):
+        """Add another counter's counts (bigrams do not span the two texts)."""
+        self.unigrams.update(other.unigrams)
+        self.bigrams.update(other.bigrams)
+        self.words += other.words
+        self._version += 1
+        return self
+
+    def frequencies(self):
+        """{word or collocation: count}, as WordCloud.process_text() for the text so far.
+
+        Held-back words are not included. The result is cached until the counts change.
+        """
+        version, cached = self._cached
+        if version == self._version:
+            return cached
+        counts, standard = fuse_counts(self.unigrams, self.normalize_plurals)
+        if self.collocations:
+            # Bigrams that are collocations replace (part of) their two words' counts.
+            original = counts.copy()
+            bigram_counts, _ = fuse_counts(self.bigrams, self.normalize_plurals)
+            for bigram, count in bigram_counts.items():
+                first, second = bigram.split(" ")
+                word1, word2 = standard[first.lower()], standard[second.lower()]
+                if collocation_score(count, original[word1], original[word2], self.words) > self.collocation_threshold:
+                    counts[word1] -= count
+                    counts[word2] -= count
+                    counts[bigram] = count
+            counts = {word: count for word, count in counts.items() if count > 0}
+        self._cached = (self._version, counts)
+        return counts
+
+
+def word_frequencies(text):
+    return WordCounter().update(text).frequencies()
+
+
+class ConversationCloud:
+    """Word counts of a live conversation, per speaker.
+
+    Transcription fragments are added as they arrive, so drawing the conversation
+    never re-reads its history. Each speaker has its own counter because the input
+    and output transcriptions interleave mid-word.
+    """
+
+    def __init__(self):
+        self.speakers = {}
+
+    def add(self, speaker, text, finished=False):
+        counter = self.speakers.get(speaker)
+        if counter is None:
+            counter = self.speakers[speaker] = WordCounter()
+        counter.update(text or "", final=False)
+        if finished:
+            counter.flush()
+
+    def frequencies(self, speaker=None):
+        """Word frequencies of one speaker, or of everyone when speaker is None."""
+        if speaker is not None:
+            counter = self.speakers.get(speaker)
+            return counter.frequencies() if counter else {}
+        total = WordCounter()
+        for counter in self.speakers.values():
+            total.merge(counter)
+        return total.frequencies()
+
+    def stats(self):
+        return {speaker: {"words": c.words, "distinct": len(c.unigrams)} for speaker, c in self.speakers.items()}
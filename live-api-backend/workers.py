@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+# Multi-process serving.
+# One asyncio process tops out at one core, so with LIVE_API_WORKERS > 1 the
+# supervisor starts that many worker processes, each listening on the same port with
+# SO_REUSEPORT so the kernel spreads new connections across them. Workers share
+# state only through local SQLite files (session_store.py, memory_sqlite.py). A worker
+# that crashes is restarted. On SIGTERM/SIGINT every worker stops accepting, lets open
+# sessions finish for up to DRAIN_TIMEOUT seconds and then closes the rest with 1012
+# (service restart) so clients reconnect and resume elsewhere.
+
+logger = logging.getLogger(__name__)
+
+LIVE_API_WORKERS = int(os.environ.get("LIVE_API_WORKERS", 1))
+DRAIN_TIMEOUT = float(os.environ.get("DRAIN_TIMEOUT", 30))
+RESTART_BACKOFF = 1.0
+
+
+async def drain(server, timeout=DRAIN_TIMEOUT):
+    """Stop accepting connections, wait for open ones to finish, then close the rest."""
+    loop = asyncio.get_running_loop()
+    server.server.close()
+    deadline = loop.time() + timeout
+    if server.connections:
+        logger.info("Draining %d session(s) for up to %.0fs...", len(server.connections), timeout)
+    while server.connections and loop.time() < deadline:
+        await asyncio.sleep(0.2)
+    server.close(code=1012, reason="server restarting")
+    await server.wait_closed()
+
+
+def install_stop_handlers(stop):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+
+def run_workers(target, count=LIVE_API_WORKERS, drain_timeout=DRAIN_TIMEOUT):
+    """Run target(worker_id) in count processes until SIGTERM/SIGINT, restarting crashed ones."""
+    ctx = multiprocessing.get_context("spawn")
+    stopping = False
+    processes = {}
+
+    def start(worker_id):
+        process = ctx.Process(target=target, args=(worker_id,), name=f"live-api-worker-{worker_id}")
+        process.start()
+        logger.info("Started worker %d (pid %d)", worker_id, process.pid)
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if not stopping:
+            stopping = True
+            logger.info("Stopping %d worker(s)...", len(processes))
+            for process in processes.values():
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker_id in range(count):
+        processes[worker_id] = start(worker_id)
+    stop_deadline = None
+    while processes:
+        for worker_id, process in list(processes.items()):
+            process.join(timeout=0.2)
+            if process.is_alive():
+                continue
+            del processes[worker_id]
+            if not stopping:
+                logger.warning("Worker %d exited with code %s, restarting", worker_id, process.exitcode)
+                time.sleep(RESTART_BACKOFF)
+                processes[worker_id] = start(worker_id)
+        if stopping:
+            stop_deadline = stop_deadline or time.monotonic() + drain_timeout + 5
+            if time.monotonic() > stop_deadline:
+                for process in processes.values():
+                    process.kill()